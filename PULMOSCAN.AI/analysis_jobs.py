@@ -0,0 +1,332 @@
+import os
+import random
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import shared_memory
+
+import blob_store
+import db
+import inference
+import report_format
+
+# Analysis states stored in the report record under 'analysis_status'
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Pool workers are never forked from the (threaded) web process: they start
+# from a fork server that has imported only the modules a worker needs, or
+# are spawned where there is no fork server
+DEFAULT_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+WORKER_MODULES = ['analysis_jobs', 'inference', 'xray_pipeline']
+
+# Per-process inference engine and connection settings for pool workers, set
+# by the pool initializer. A worker runs one job at a time, so backends with a
+# model do not load it in the workers: predictions go to the pool's single
+# inference server process (inference.serve), which micro-batches those of
+# concurrent jobs into one forward pass. server is (requests, responses,
+# slots) and each worker takes a slot for its own responses queue.
+_engine = None
+_db_pragmas = None
+
+
+def _init_worker(engine_options, db_pragmas, server=None):
+    global _engine, _db_pragmas
+    predictor = None
+    if server is not None:
+        requests, responses, slots = server
+        slot = slots.get()
+        predictor = inference.RemotePredictor(requests, responses[slot], slot)
+    _engine = inference.create_engine(**dict(engine_options, predictor=predictor))
+    _db_pragmas = db_pragmas
+
+
+# update() changes report_data in place; returning False leaves the record
+# as it was
+def _update_report(db_path, report_id, update, on_update=None, db_pragmas=None):
+    conn = db.connect(db_path, db_pragmas or _db_pragmas, timeout=30)
+    try:
+        c = conn.cursor()
+        c.execute('SELECT data FROM reports WHERE report_id = ?', (report_id,))
+        row = c.fetchone()
+        if row is None:
+            return
+        report_data = report_format.decode(row[0])
+        if update(report_data) is False:
+            return
+        c.execute('UPDATE reports SET data = ? WHERE report_id = ?',
+                  (report_format.encode(report_data), report_id))
+        if on_update:
+            on_update(c)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _set_status(db_path, report_id, status, error=None):
+    def update(report_data):
+        report_data['analysis_status'] = status
+        if error:
+            report_data['analysis_error'] = error
+    _update_report(db_path, report_id, update)
+
+
+# Fail a report whose analysis has not finished, e.g. because its job was
+# lost with a crashed worker. Finished or already failed reports are kept.
+def mark_failed(db_path, report_id, error, db_pragmas=None):
+    def update(report_data):
+        if report_data.get('analysis_status') not in (PENDING, RUNNING):
+            return False
+        report_data['analysis_status'] = FAILED
+        report_data['analysis_error'] = error
+    _update_report(db_path, report_id, update, db_pragmas=db_pragmas)
+
+
+# Image bytes travel to the pool through shared memory instead of being
+# pickled into the task. The parent owns the segment and unlinks it once the
+# job is done, workers only attach to it.
+def _share_bytes(image_data):
+    shm = shared_memory.SharedMemory(create=True, size=max(len(image_data), 1))
+    shm.buf[:len(image_data)] = image_data
+    return shm
+
+
+def _release_shared(shm):
+    shm.close()
+    shm.unlink()
+
+
+def _analyze_shared(shm_name, size, **options):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image_data = shm.buf[:size]
+        try:
+            return _engine.analyze(image_data, **options)
+        finally:
+            image_data.release()
+    finally:
+        shm.close()
+
+
+def analyze_image(resolution, shm_name, size):
+    result = _analyze_shared(shm_name, size, resolution=resolution)
+    # Send the overlay back as bytes, ndarrays pickle with extra metadata
+    result['image_buffer'] = result['image_buffer'].tobytes()
+    return result
+
+
+# Fill in xray_data from a finished (or cached) analysis and correlate the
+# sputum test probability with the X-ray findings
+def complete_report(report_data, analysis):
+    xray_data = dict(analysis, confidence_score=random.uniform(0.85, 0.95))
+    report_data['xray_data'] = xray_data
+    report_data['analysis_status'] = DONE
+
+    sputum_data = report_data.get('sputum_data')
+    if sputum_data:
+        sputum_probability = max(min(xray_data['tb_probability'] * random.uniform(0.8, 1.2), 100), 0)
+        sputum_data['probability'] = sputum_probability
+        sputum_data['result'] = 'positive' if sputum_probability > 50 else 'negative'
+
+
+# Runs inside a pool worker: analyse the upload, write the overlay into the
+# blob store and store xray_data back into the report record. With
+# preview enabled a low-resolution answer is stored first so the status
+# endpoint has something to show while the full analysis runs.
+def run_analysis(db_path, store, report_id, resolution, preview, shm_name, size):
+    try:
+        _set_status(db_path, report_id, RUNNING)
+
+        if preview:
+            preview_result = _analyze_shared(shm_name, size, resolution='preview', overlay=False)
+
+            def update_preview(report_data):
+                report_data['preview'] = {
+                    'tb_probability': preview_result['tb_probability'],
+                    'infected_areas': preview_result['infected_areas'],
+                    'findings': preview_result['findings']
+                }
+            _update_report(db_path, report_id, update_preview)
+
+        digest, blob_size, analysis_result = store.write(
+            lambda sink: _analyze_shared(shm_name, size, sink=sink, resolution=resolution)
+        )
+
+        analysis = {
+            'image_path': store.url(digest),
+            'image_hash': digest,
+            'tb_probability': analysis_result['tb_probability'],
+            'infected_areas': analysis_result['infected_areas']
+        }
+
+        def update(report_data):
+            complete_report(report_data, analysis)
+            report_data.pop('preview', None)
+        _update_report(db_path, report_id, update,
+                       on_update=lambda c: blob_store.add_ref(c, digest, blob_size))
+        return analysis
+    except Exception as e:
+        print(f"Error analysing report {report_id}: {str(e)}")
+        _set_status(db_path, report_id, FAILED, str(e))
+        raise
+
+
+class AnalysisQueue:
+    def __init__(self, db_path, store, max_workers=None, engine_options=None,
+                 start_method=None, db_pragmas=None, resolution=None, preview=False):
+        self.db_path = db_path
+        self.store = store
+        self.max_workers = max_workers or os.cpu_count()
+        self.engine_options = engine_options or {}
+        self.start_method = start_method or DEFAULT_START_METHOD
+        self.db_pragmas = db_pragmas
+        self.resolution = resolution
+        self.preview = preview
+        self._executor = None
+        self._server = None
+        self._requests = None
+        self._lock = threading.Lock()
+
+    # The pool is started on the first job so forked web workers each get
+    # their own. A pool whose inference server has died is replaced.
+    def _get_executor(self):
+        with self._lock:
+            if self._server is not None and not self._server.is_alive():
+                self._executor.shutdown(wait=False)
+                self._executor = None
+                self._stop_server(wait=False)
+            if self._executor is None:
+                mp_context = multiprocessing.get_context(self.start_method)
+                if self.start_method == 'forkserver':
+                    mp_context.set_forkserver_preload(WORKER_MODULES)
+                server = None
+                if inference.uses_model(self.engine_options.get('backend', 'classical')):
+                    server = self._start_server(mp_context)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=mp_context,
+                    initializer=_init_worker,
+                    initargs=(self.engine_options, self.db_pragmas, server)
+                )
+            return self._executor
+
+    def _start_server(self, mp_context):
+        self._requests = mp_context.Queue()
+        responses = [mp_context.Queue() for _ in range(self.max_workers)]
+        slots = mp_context.Queue()
+        for slot in range(self.max_workers):
+            slots.put(slot)
+        self._server = mp_context.Process(target=inference.serve, args=(self.engine_options, self._requests, responses),
+                                          name='inference-server', daemon=True)
+        self._server.start()
+        return self._requests, responses, slots
+
+    def _stop_server(self, wait):
+        if self._server is not None:
+            self._requests.put(None)
+            if wait:
+                self._server.join()
+            self._server = None
+            self._requests = None
+
+    # Drop a pool that a dead worker has broken, the next job starts a new one
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._stop_server(wait=False)
+        executor.shutdown(wait=False)
+
+    def _submit_shared(self, fn, image_data, *args):
+        shm = _share_bytes(image_data)
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args, shm.name, len(image_data))
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                future = self._get_executor().submit(fn, *args, shm.name, len(image_data))
+        except Exception:
+            _release_shared(shm)
+            raise
+        future.add_done_callback(lambda f: _release_shared(shm))
+        return future
+
+    # Analyse one image in the pool and return the result dict
+    def analyze(self, image_data, resolution=None):
+        return self._submit_shared(analyze_image, image_data, resolution or self.resolution)
+
+    # Analyse an uploaded report and write the result back into its record.
+    # The report is marked failed when the job cannot be queued or dies
+    # outside run_analysis (a crashed worker breaks the whole pool and fails
+    # every job in it); cancelled jobs stay pending for requeue_unfinished.
+    def submit(self, report_id, image_data):
+        try:
+            future = self._submit_shared(run_analysis, image_data, self.db_path, self.store, report_id,
+                                         self.resolution, self.preview)
+        except Exception as e:
+            mark_failed(self.db_path, report_id, f'Could not queue the analysis: {str(e)}', self.db_pragmas)
+            raise
+        future.add_done_callback(partial(self._job_done, report_id))
+        return future
+
+    def _job_done(self, report_id, future):
+        if future.cancelled() or future.exception() is None:
+            return
+        try:
+            mark_failed(self.db_path, report_id, str(future.exception()) or 'Analysis worker crashed', self.db_pragmas)
+        except Exception as e:
+            print(f"Error marking report {report_id} failed: {str(e)}")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+            self._stop_server(wait)
+
+
+# Reports whose analysis was still pending or running, scanned a batch of
+# rows at a time
+def unfinished_reports(conn, batch_size=500):
+    c = conn.cursor()
+    last_id = ''
+    while True:
+        c.execute('SELECT report_id, data FROM reports WHERE report_id > ? ORDER BY report_id LIMIT ?',
+                  (last_id, batch_size))
+        rows = c.fetchall()
+        if not rows:
+            return
+        for report_id, data in rows:
+            report_data = report_format.decode(data) if data else {}
+            if report_data.get('analysis_status') in (PENDING, RUNNING):
+                yield report_id, report_data
+        last_id = rows[-1][0]
+
+
+# Queue the analyses lost when the server stopped again, reading each film
+# back from upload_store, and wait for them. At most two jobs per pool worker
+# are in flight. Reports without a stored upload are marked failed. Returns
+# the number of jobs queued and of reports failed for a missing upload.
+def requeue_unfinished(conn, analysis_queue, upload_store, batch_size=500):
+    queued = lost = 0
+    in_flight = set()
+    for report_id, report_data in unfinished_reports(conn, batch_size):
+        digest = report_data.get('upload_hash')
+        if not digest or not upload_store.exists(digest):
+            mark_failed(analysis_queue.db_path, report_id, 'The uploaded image is no longer available',
+                        analysis_queue.db_pragmas)
+            lost += 1
+            continue
+        if len(in_flight) >= analysis_queue.max_workers * 2:
+            _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        with open(upload_store.path(digest), 'rb') as f:
+            in_flight.add(analysis_queue.submit(report_id, f.read()))
+        queued += 1
+    wait(in_flight)
+    return queued, lost
@@ -1,82 +1,192 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, has_app_context
 import os
 import random
 import json
 import base64
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_caching import Cache
+from jinja2 import FileSystemBytecodeCache
 from functools import lru_cache
-import sqlite3
 from sqlite3 import Error
-import cv2
-import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
-import io
-import torch
-import torchvision.transforms as transforms
-from tensorflow.keras.applications.densenet import DenseNet121
-from tensorflow.keras.layers import GlobalAveragePooling2D, Dense
-from tensorflow.keras.models import Model
-import tensorflow as tf
-
-app = Flask(__name__)
+from contextlib import ExitStack
+# TensorFlow/Keras, torch and matplotlib are loaded on demand through the
+# inference registry in the analysis workers, never at import time
+import analysis_jobs
+import assets
+import blob_store
+import compression
+import db
+import migrations
+import pagination
+import records
+import report_format
+import result_cache
+import static_files
+import template_sources
+import uploads
+import xray_pipeline
+from json_provider import jsonify
+
+# /static is served by serve_static below, not Flask's built-in view
+app = Flask(__name__, static_folder=None)
+app.request_class = uploads.SpoolingRequest
 app.secret_key = 'pulmoscan_secret_key'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Database setup
+# Compiled templates are kept on disk, so restarted and new workers skip
+# compiling them again
+app.config['JINJA_BYTECODE_CACHE_DIR'] = os.environ.get('PULMOSCAN_JINJA_CACHE_DIR', 'jinja_cache')
+os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+
+# Upload limits: requests above MAX_CONTENT_LENGTH are refused before the body
+# is read, files above UPLOAD_SPOOL_THRESHOLD are spooled to a temp file
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('PULMOSCAN_MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+app.config['XRAY_MAX_BYTES'] = int(os.environ.get('PULMOSCAN_XRAY_MAX_BYTES', app.config['MAX_CONTENT_LENGTH']))
+app.config['UPLOAD_SPOOL_THRESHOLD'] = int(os.environ.get('PULMOSCAN_UPLOAD_SPOOL_THRESHOLD', 1024 * 1024))
+uploads.SpoolingRequest.spool_threshold = app.config['UPLOAD_SPOOL_THRESHOLD']
+
+# Overlays are stored content-addressed under static/uploads/objects. Blobs
+# are written in BLOB_TMP_FOLDER first, outside static/ so half-written files
+# are never served.
+app.config['BLOB_TMP_FOLDER'] = os.environ.get('PULMOSCAN_BLOB_TMP_FOLDER', 'blob_tmp')
+overlay_store = blob_store.BlobStore(
+    os.path.join(app.config['UPLOAD_FOLDER'], 'objects'),
+    '/static/uploads/objects',
+    tmp_dir=app.config['BLOB_TMP_FOLDER']
+)
+# Uploaded films waiting for analysis are kept in XRAY_UPLOAD_FOLDER, outside
+# static/, so jobs lost with a restart can be queued again (flask
+# requeue-analyses)
+app.config['XRAY_UPLOAD_FOLDER'] = os.environ.get('PULMOSCAN_XRAY_UPLOAD_FOLDER', 'xray_uploads')
+upload_store = blob_store.BlobStore(
+    app.config['XRAY_UPLOAD_FOLDER'],
+    '',
+    extension='',
+    tmp_dir=app.config['BLOB_TMP_FOLDER']
+)
+
+# X-ray inference: 'classical' (OpenCV heuristics) or 'densenet121' (CPU CNN,
+# needs fine-tuned weights). The model runs in one inference server process
+# that micro-batches the predictions of concurrent analyses into one forward
+# pass, see analysis_jobs.py.
+app.config['INFERENCE_BACKEND'] = os.environ.get('PULMOSCAN_INFERENCE_BACKEND', 'classical')
+app.config['INFERENCE_MAX_BATCH_SIZE'] = int(os.environ.get('PULMOSCAN_INFERENCE_MAX_BATCH_SIZE', 8))
+app.config['INFERENCE_MAX_WAIT_MS'] = float(os.environ.get('PULMOSCAN_INFERENCE_MAX_WAIT_MS', 10))
+app.config['DENSENET_WEIGHTS'] = os.environ.get('PULMOSCAN_DENSENET_WEIGHTS')
+if app.config['INFERENCE_BACKEND'] == 'densenet121' and not app.config['DENSENET_WEIGHTS']:
+    raise RuntimeError('PULMOSCAN_DENSENET_WEIGHTS must be set for the densenet121 inference backend')
+
+# Database setup: requests borrow pooled connections, every
+# create_connection() call within one request shares the same connection and
+# it goes back to the pool at teardown. DB_POOL_SIZE = 0 disables pooling.
+# Storage settings (WAL, synchronous, mmap and cache sizes, busy timeout)
+# come from db.DEFAULT_PRAGMAS with PULMOSCAN_DB_* overrides.
+app.config['DATABASE'] = 'pulmoscan.db'
+app.config['DB_POOL_SIZE'] = int(os.environ.get('PULMOSCAN_DB_POOL_SIZE', 8))
+app.config['DB_HEALTH_CHECK_INTERVAL'] = float(os.environ.get('PULMOSCAN_DB_HEALTH_CHECK_INTERVAL', 30))
+app.config['DB_JOURNAL_MODE'] = db.journal_mode_from_env()
+app.config['DB_PRAGMAS'] = db.pragmas_from_env()
+# Rows per transaction when a migration rewrites a large table
+app.config['DB_MIGRATION_CHUNK_SIZE'] = int(os.environ.get('PULMOSCAN_DB_MIGRATION_CHUNK_SIZE', migrations.DEFAULT_CHUNK_SIZE))
+# Reports per dashboard bucket page
+app.config['DASHBOARD_PAGE_SIZE'] = int(os.environ.get('PULMOSCAN_DASHBOARD_PAGE_SIZE', 20))
+# Default and largest `limit` accepted by /get_pending_reports
+app.config['PENDING_REPORTS_PAGE_SIZE'] = int(os.environ.get('PULMOSCAN_PENDING_REPORTS_PAGE_SIZE', 50))
+app.config['PENDING_REPORTS_MAX_PAGE_SIZE'] = int(os.environ.get('PULMOSCAN_PENDING_REPORTS_MAX_PAGE_SIZE', 200))
+db_pool = db.ConnectionPool(
+    app.config['DATABASE'],
+    size=app.config['DB_POOL_SIZE'],
+    pragmas=app.config['DB_PRAGMAS'],
+    health_check_interval=app.config['DB_HEALTH_CHECK_INTERVAL']
+)
+
 def create_connection():
     try:
-        conn = sqlite3.connect('pulmoscan.db')
-        return conn
+        if has_app_context():
+            if 'db' not in g:
+                g.db = db_pool.acquire()
+            return g.db
+        return db.connect(app.config['DATABASE'], app.config['DB_PRAGMAS'])
     except Error as e:
         print(e)
         return None
 
+@app.teardown_appcontext
+def release_connection(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+# Hot list queries. They must be served from the patient_records indexes,
+# `flask check-query-plans` fails if any of them falls back to a full scan.
+# List views select the summary columns (records.SUMMARY_COLUMNS) and never
+# the report_data blob, LIST_COLUMNS names the selected columns in order
+LIST_COLUMNS = ('id', 'patient_email', 'report_type', 'status', 'created_at', 'updated_at') + records.SUMMARY_COLUMNS
+PATIENT_REPORTS_QUERY = f'''
+    SELECT {', '.join(LIST_COLUMNS)}
+    FROM patient_records
+    WHERE patient_email = ?
+    ORDER BY created_at DESC
+'''
+
+# One page of reports with a given status, newest first, read from the
+# (status, created_at, id) index. Parameters: status, the cursor's
+# (created_at, id) when there is one, and the row limit. Rows have the
+# LIST_COLUMNS, followed by report_data with full=True.
+def reports_page_query(after_cursor=False, full=False):
+    keyset = ' AND (pr.created_at, pr.id) < (?, ?)' if after_cursor else ''
+    columns = [f'pr.{column}' for column in LIST_COLUMNS]
+    columns[LIST_COLUMNS.index('patient_name')] = 'COALESCE(pr.patient_name, p.name) as patient_name'
+    if full:
+        columns.append('pr.report_data')
+    return f'''
+        SELECT {', '.join(columns)}
+        FROM patient_records pr
+        JOIN patients p ON pr.patient_email = p.email
+        WHERE pr.status = ?{keyset}
+        ORDER BY pr.created_at DESC, pr.id DESC
+        LIMIT ?
+    '''
+
+# Healthcare dashboard buckets, fetched in one statement: a UNION ALL branch
+# per status, each reading one page (plus a row to detect the next page)
+# starting after that bucket's cursor
+DASHBOARD_STATUSES = ('pending', 'accepted', 'cured')
+
+def dashboard_reports_query(cursors, limit):
+    branches = []
+    params = []
+    for status in DASHBOARD_STATUSES:
+        params.append(status)
+        params.extend(cursors.get(status, ()))
+        params.append(limit + 1)
+        branches.append(f'SELECT * FROM ({reports_page_query(status in cursors)})')
+    return ' UNION ALL '.join(branches), params
+
+HOT_QUERIES = {
+    'pending reports page': (reports_page_query(True), ('pending', '2025-01-01 00:00:00', 'RPT0', 51)),
+    'patient reports': (PATIENT_REPORTS_QUERY, ('patient@example.com',)),
+    'healthcare dashboard': dashboard_reports_query({'pending': ('2025-01-01 00:00:00', 'RPT0')}, 20),
+}
+
 def init_db():
+    try:
+        db.configure_database(app.config['DATABASE'], app.config['DB_JOURNAL_MODE'])
+    except Error as e:
+        print(e)
+    
+    # Tables, indexes and later schema changes, see migrations.py
     conn = create_connection()
     if conn is not None:
         try:
-            c = conn.cursor()
-            
-            # Create patients table
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS patients (
-                    email TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    password TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create healthcare_workers table
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS healthcare_workers (
-                    email TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    password TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create patient_records table
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS patient_records (
-                    id TEXT PRIMARY KEY,
-                    patient_email TEXT,
-                    report_type TEXT,
-                    report_data TEXT,
-                    status TEXT DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (patient_email) REFERENCES patients (email)
-                )
-            ''')
-            
-            conn.commit()
-        except Error as e:
+            applied = migrations.run_migrations(conn, app.config['DB_MIGRATION_CHUNK_SIZE'])
+            if applied:
+                print(f"Applied schema migrations: {', '.join(map(str, applied))}")
+        except (Error, migrations.MigrationError) as e:
             print(e)
         finally:
             conn.close()
@@ -84,12 +194,71 @@ def init_db():
 # Initialize database
 init_db()
 
-# Configure Flask-Caching
-app.config['CACHE_TYPE'] = 'simple'
+# Configure Flask-Caching. PULMOSCAN_CACHE_TYPE=simple keeps a cache per
+# worker process; filesystem or redis put a cache shared by all workers
+# behind a short-lived per-process L1 (see cache_tiers.py).
 app.config['CACHE_DEFAULT_TIMEOUT'] = 300
+cache_type = os.environ.get('PULMOSCAN_CACHE_TYPE', 'simple')
+if cache_type == 'simple':
+    app.config['CACHE_TYPE'] = 'simple'
+else:
+    app.config['CACHE_TYPE'] = 'cache_tiers.TieredCache'
+    app.config['CACHE_SHARED_TYPE'] = cache_type
+    app.config['CACHE_DIR'] = os.environ.get('PULMOSCAN_CACHE_DIR', 'flask_cache')
+    app.config['CACHE_REDIS_URL'] = os.environ.get('PULMOSCAN_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    # Import path of a redis-py compatible client factory used instead of
+    # CACHE_REDIS_URL, e.g. fakeredis:FakeRedis
+    app.config['CACHE_REDIS_CLIENT_FACTORY'] = os.environ.get('PULMOSCAN_CACHE_REDIS_CLIENT_FACTORY')
+    app.config['CACHE_KEY_PREFIX'] = 'pulmoscan/'
+    app.config['CACHE_L1_TIMEOUT'] = int(os.environ.get('PULMOSCAN_CACHE_L1_TIMEOUT', 5))
+    # Dashboard data version stamps are always read from the shared tier, so
+    # a touch_data() in one worker invalidates the dashboards in all of them
+    app.config['CACHE_SHARED_ONLY_PREFIXES'] = ['data_version/']
 cache = Cache(app)
 
-# Preload common static files
+# Dashboards are cached per user. Every key includes the data version stamp
+# of the records the page shows, a patient's own reports or, for healthcare
+# workers, everyone's. Writes replace the stamp with touch_data(), so a page
+# cached before the change is never served again and just expires. With a
+# shared cache the stamps live in the shared tier and the invalidation
+# reaches every worker. The simple cache keeps stamps per process, so the
+# other workers can serve a page for up to DASHBOARD_CACHE_TIMEOUT after a
+# change; it defaults to 60 seconds there, 300 with a shared cache.
+app.config['DASHBOARD_CACHE_TIMEOUT'] = int(os.environ.get('PULMOSCAN_DASHBOARD_CACHE_TIMEOUT',
+                                                           60 if cache_type == 'simple' else 300))
+HEALTHCARE_SCOPE = 'reports'
+
+def patient_scope(email):
+    return f'patient/{email}'
+
+def data_version(scope):
+    key = f'data_version/{scope}'
+    version = cache.get(key)
+    if version is None:
+        # Missing or evicted: a fresh stamp can only cause a cache miss
+        version = os.urandom(8).hex()
+        cache.set(key, version, timeout=0)
+    return version
+
+def touch_data(*scopes):
+    for scope in scopes:
+        cache.set(f'data_version/{scope}', os.urandom(8).hex(), timeout=0)
+
+def cached_dashboard(scope):
+    def make_cache_key(*args, **kwargs):
+        version = data_version(scope())
+        return f"dashboard/{request.endpoint}/{session['user_id']}/{version}?{request.query_string.decode()}"
+    
+    return cache.cached(
+        app.config['DASHBOARD_CACHE_TIMEOUT'],
+        make_cache_key=make_cache_key,
+        unless=lambda: 'user_id' not in session,
+        # Rendered pages only, never login or error redirects
+        response_filter=lambda rv: isinstance(rv, str)
+    )
+
+# Static files loaded into the hot file cache at startup, by logical name
+# (directory/file). Built assets are resolved through build/manifest.json.
 STATIC_FILES = {
     'css': ['styles.css'],
     'js': ['main.js'],
@@ -104,16 +273,132 @@ patient_records = {}
 accepted_patients = {}
 cured_patients = {}
 
+# X-ray analysis runs in a local process pool, uploads only enqueue a job
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('PULMOSCAN_ANALYSIS_WORKERS', os.cpu_count() or 1))
+app.config['ANALYSIS_START_METHOD'] = os.environ.get('PULMOSCAN_ANALYSIS_START_METHOD', analysis_jobs.DEFAULT_START_METHOD)
+# Detection resolution: a tier name ('full', 'standard', 'preview') or a
+# maximum side in pixels. ANALYSIS_PREVIEW stores a fast preview-tier answer
+# before the full analysis.
+app.config['ANALYSIS_RESOLUTION'] = os.environ.get('PULMOSCAN_ANALYSIS_RESOLUTION', 'full')
+app.config['ANALYSIS_PREVIEW'] = os.environ.get('PULMOSCAN_ANALYSIS_PREVIEW', '0') == '1'
+analysis_queue = None
+
+def get_analysis_queue():
+    global analysis_queue
+    if analysis_queue is None:
+        engine_options = {
+            'backend': app.config['INFERENCE_BACKEND'],
+            'max_batch_size': app.config['INFERENCE_MAX_BATCH_SIZE'],
+            'max_wait_ms': app.config['INFERENCE_MAX_WAIT_MS']
+        }
+        if app.config['INFERENCE_BACKEND'] == 'densenet121':
+            engine_options['weights'] = app.config['DENSENET_WEIGHTS']
+        analysis_queue = analysis_jobs.AnalysisQueue(
+            app.config['DATABASE'],
+            overlay_store,
+            max_workers=app.config['ANALYSIS_WORKERS'],
+            engine_options=engine_options,
+            start_method=app.config['ANALYSIS_START_METHOD'],
+            db_pragmas=app.config['DB_PRAGMAS'],
+            resolution=app.config['ANALYSIS_RESOLUTION'],
+            preview=app.config['ANALYSIS_PREVIEW']
+        )
+    return analysis_queue
+
+# Analysis results of identical uploads are reused, keyed by content hash and
+# everything that changes the result. ANALYSIS_CACHE_DIR adds an on-disk tier
+# shared by all workers.
+app.config['ANALYSIS_CACHE_SIZE'] = int(os.environ.get('PULMOSCAN_ANALYSIS_CACHE_SIZE', 512))
+app.config['ANALYSIS_CACHE_DIR'] = os.environ.get('PULMOSCAN_ANALYSIS_CACHE_DIR')
+app.config['ANALYSIS_CACHE_DISK_BYTES'] = int(os.environ.get('PULMOSCAN_ANALYSIS_CACHE_DISK_BYTES', 256 * 1024 * 1024))
+analysis_cache = result_cache.AnalysisResultCache(
+    app.config['ANALYSIS_CACHE_SIZE'],
+    app.config['ANALYSIS_CACHE_DIR'],
+    app.config['ANALYSIS_CACHE_DISK_BYTES']
+)
+
+def analysis_cache_key(image_data):
+    parts = [
+        result_cache.content_hash(image_data),
+        xray_pipeline.PIPELINE_VERSION,
+        app.config['INFERENCE_BACKEND'],
+        str(app.config['ANALYSIS_RESOLUTION'])
+    ]
+    # Results of one set of model weights are never served for another
+    if app.config['INFERENCE_BACKEND'] == 'densenet121':
+        parts.append(result_cache.file_fingerprint(app.config['DENSENET_WEIGHTS'])[:16])
+    return '-'.join(parts)
+
+def cached_analysis(cache_key):
+    analysis = analysis_cache.get(cache_key)
+    if analysis is None:
+        return None
+    # The overlay may have been cleaned up since the result was cached
+    if not analysis.get('image_hash') or not overlay_store.exists(analysis['image_hash']):
+        analysis_cache.discard(cache_key)
+        return None
+    return analysis
+
+def cache_analysis_result(cache_key, future):
+    if future.exception() is None:
+        analysis_cache.put(cache_key, future.result())
+
 # Cache static templates
 @lru_cache(maxsize=32)
 def get_cached_template(template_name):
     return render_template(template_name)
 
-# Serve static files efficiently
-@app.route('/static/<path:filename>')
-@cache.cached(timeout=3600)  # Cache for 1 hour
+# Static files: validators, Cache-Control and 304s on every response, small
+# files from a byte-bounded memory cache, optional offload to the front-end
+# server with PULMOSCAN_STATIC_OFFLOAD=x-sendfile|x-accel-redirect
+app.config['STATIC_MAX_AGE'] = int(os.environ.get('PULMOSCAN_STATIC_MAX_AGE', 7 * 24 * 3600))
+app.config['STATIC_HOT_CACHE_BYTES'] = int(os.environ.get('PULMOSCAN_STATIC_HOT_CACHE_BYTES', 32 * 1024 * 1024))
+app.config['STATIC_HOT_FILE_MAX_BYTES'] = int(os.environ.get('PULMOSCAN_STATIC_HOT_FILE_MAX_BYTES', 512 * 1024))
+app.config['STATIC_OFFLOAD'] = os.environ.get('PULMOSCAN_STATIC_OFFLOAD', '')
+# nginx internal location that maps onto the static folder
+app.config['STATIC_ACCEL_PREFIX'] = os.environ.get('PULMOSCAN_STATIC_ACCEL_PREFIX', '/protected-static/')
+static = static_files.StaticFiles(
+    os.path.join(app.root_path, 'static'),
+    max_age=app.config['STATIC_MAX_AGE'],
+    hot_cache=static_files.HotFileCache(app.config['STATIC_HOT_CACHE_BYTES'], app.config['STATIC_HOT_FILE_MAX_BYTES']),
+    offload=app.config['STATIC_OFFLOAD'],
+    accel_prefix=app.config['STATIC_ACCEL_PREFIX']
+)
+
+static.preload(f'{directory}/{name}' for directory, names in STATIC_FILES.items() for name in names)
+
+# Templates link assets with {{ asset_url('css/styles.css') }}, which points
+# at the fingerprinted build when there is one
+@app.template_global()
+def asset_url(name):
+    return url_for('static', filename=static.resolve(name))
+
+@app.route('/static/<path:filename>', endpoint='static')
 def serve_static(filename):
-    return send_from_directory('static', filename)
+    return static.serve(filename)
+
+# Fingerprint static assets and precompress them: flask build-assets
+# (restart the app afterwards to load the new manifest)
+@app.cli.command('build-assets')
+def build_assets():
+    manifest = assets.build(static.root)
+    print(f"Built {len(manifest)} assets into {os.path.join(static.root, assets.BUILD_DIR)}")
+
+# Response compression for HTML and JSON: bodies below COMPRESS_MIN_SIZE are
+# sent as they are, bodies above COMPRESS_STREAM_THRESHOLD are compressed as
+# they stream. The compressed cached pages below are reused while unchanged.
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('PULMOSCAN_COMPRESS_MIN_SIZE', 500))
+app.config['COMPRESS_STREAM_THRESHOLD'] = int(os.environ.get('PULMOSCAN_COMPRESS_STREAM_THRESHOLD', 256 * 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('PULMOSCAN_COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('PULMOSCAN_COMPRESS_BROTLI_QUALITY', 5))
+app.wsgi_app = compression.CompressionMiddleware(
+    app.wsgi_app,
+    min_size=app.config['COMPRESS_MIN_SIZE'],
+    stream_threshold=app.config['COMPRESS_STREAM_THRESHOLD'],
+    gzip_level=app.config['COMPRESS_LEVEL'],
+    brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+    cache_paths=('/', '/features', '/contact')
+)
 
 # Cache the home page
 @app.route('/')
@@ -208,8 +493,6 @@ def register():
             print(e)
             flash('Error during registration. Please try again.', 'error')
             return redirect(url_for('register'))
-        finally:
-            conn.close()
     
     return render_template('register.html')
 
@@ -253,8 +536,6 @@ def login():
             print(e)
             flash('Error during login. Please try again.', 'error')
             return redirect(url_for('login'))
-        finally:
-            conn.close()
     
     return render_template('login.html')
 
@@ -263,9 +544,9 @@ def logout():
     session.clear()
     return redirect(url_for('home'))
 
-# Cache patient dashboard for 1 minute
+# Cached per patient until their reports change
 @app.route('/patient_dashboard')
-@cache.memoize(60)
+@cached_dashboard(lambda: patient_scope(session['user_id']))
 def patient_dashboard():
     if 'user_id' not in session or session['user_type'] != 'patient':
         flash('Please login to access the dashboard', 'error')
@@ -281,8 +562,7 @@ def patient_dashboard():
         c.execute('SELECT * FROM patients WHERE email = ?', (session['user_id'],))
         patient = c.fetchone()
         
-        c.execute('SELECT * FROM patient_records WHERE patient_email = ? ORDER BY created_at DESC',
-                 (session['user_id'],))
+        c.execute(PATIENT_REPORTS_QUERY, (session['user_id'],))
         patient_records = c.fetchall()
         
         return render_template('patient_dashboard.html',
@@ -292,12 +572,10 @@ def patient_dashboard():
         print(e)
         flash('Error loading dashboard. Please try again.', 'error')
         return redirect(url_for('home'))
-    finally:
-        conn.close()
 
-# Cache healthcare dashboard for 1 minute
+# Cached per healthcare worker and page until any report changes
 @app.route('/healthcare_dashboard')
-@cache.memoize(60)
+@cached_dashboard(lambda: HEALTHCARE_SCOPE)
 def healthcare_dashboard():
     if 'user_id' not in session or session['user_type'] != 'healthcare':
         flash('Please login to access the dashboard', 'error')
@@ -313,97 +591,57 @@ def healthcare_dashboard():
         c.execute('SELECT * FROM healthcare_workers WHERE email = ?', (session['user_id'],))
         healthcare = c.fetchone()
         
-        # Get pending reports with patient details
-        c.execute('''
-            SELECT pr.*, p.name as patient_name 
-            FROM patient_records pr 
-            JOIN patients p ON pr.patient_email = p.email 
-            WHERE pr.status = 'pending'
-            ORDER BY pr.created_at DESC
-        ''')
-        pending_reports_raw = c.fetchall()
-        
-        # Format pending reports
-        pending_reports = []
-        for report in pending_reports_raw:
-            report_data = json.loads(report[3])  # Parse the JSON stored in report_data column
-            pending_reports.append({
-                'id': report[0],
-                'patient_email': report[1],
-                'patient_name': report_data['patient_name'],
-                'type': report[2],
-                'data': report_data,
-                'status': report[4],
-                'created_at': report[5]
-            })
-        
-        # Get accepted cases
-        c.execute('''
-            SELECT pr.*, p.name as patient_name 
-            FROM patient_records pr 
-            JOIN patients p ON pr.patient_email = p.email 
-            WHERE pr.status = 'accepted'
-            ORDER BY pr.created_at DESC
-        ''')
-        accepted_cases_raw = c.fetchall()
-        
-        # Format accepted cases
-        accepted_cases = []
-        for case in accepted_cases_raw:
-            case_data = json.loads(case[3])
-            accepted_cases.append({
-                'id': case[0],
-                'patient_email': case[1],
-                'patient_name': case_data['patient_name'],
-                'type': case[2],
-                'data': case_data,
-                'status': case[4],
-                'created_at': case[5]
-            })
-        
-        # Get cured cases
-        c.execute('''
-            SELECT pr.*, p.name as patient_name 
-            FROM patient_records pr 
-            JOIN patients p ON pr.patient_email = p.email 
-            WHERE pr.status = 'cured'
-            ORDER BY pr.created_at DESC
-        ''')
-        cured_cases_raw = c.fetchall()
+        # Page cursors come from the <status>_after query args, an invalid
+        # one shows the first page of its bucket
+        cursors = {}
+        for status in DASHBOARD_STATUSES:
+            token = request.args.get(f'{status}_after')
+            if token:
+                try:
+                    cursors[status] = pagination.decode_cursor(token)
+                except ValueError:
+                    pass
+        
+        # Get one page of pending, accepted and cured reports in one query
+        page_size = app.config['DASHBOARD_PAGE_SIZE']
+        query, params = dashboard_reports_query(cursors, page_size)
+        c.execute(query, params)
+        
+        # Partition the rows by status, the summary columns are all the
+        # cards need so report_data is never parsed here
+        reports = {status: [] for status in DASHBOARD_STATUSES}
+        for row in c.fetchall():
+            report = dict(zip(LIST_COLUMNS, row))
+            report['type'] = report['report_type']
+            report['treatment_duration'] = report['treatment_duration'] or 'N/A'
+            reports[report['status']].append(report)
         
-        # Format cured cases
-        cured_patients = []
-        for case in cured_cases_raw:
-            case_data = json.loads(case[3])
-            cured_patients.append({
-                'id': case[0],
-                'patient_email': case[1],
-                'patient_name': case_data['patient_name'],
-                'type': case[2],
-                'data': case_data,
-                'status': case[4],
-                'created_at': case[5],
-                'treatment_duration': case_data.get('treatment_duration', 'N/A')
-            })
+        next_cursors = {}
+        for status in DASHBOARD_STATUSES:
+            reports[status], next_cursors[status] = pagination.split_page(reports[status], page_size, 'created_at', 'id')
         
         return render_template('healthcare_dashboard.html',
                              healthcare={'name': healthcare[1], 'email': healthcare[0]},
-                             pending_reports=pending_reports,
-                             accepted_cases=accepted_cases,
-                             cured_patients=cured_patients)
+                             pending_reports=reports['pending'],
+                             accepted_cases=reports['accepted'],
+                             cured_patients=reports['cured'],
+                             next_cursors=next_cursors)
     except Error as e:
         print(f"Error loading dashboard: {str(e)}")
         flash('Error loading dashboard. Please try again.', 'error')
         return redirect(url_for('home'))
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/upload_report', methods=['POST'])
 def upload_report():
     if 'email' not in session:
         return jsonify({'error': 'Not authorized'}), 401
     
+    # Refuse oversized bodies from the declared length before reading them
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return request_too_large(None)
+    
+    # Keeps the upload buffer open until the analysis job has been submitted
+    upload_stack = ExitStack()
     try:
         conn = create_connection()
         cursor = conn.cursor()
@@ -411,39 +649,27 @@ def upload_report():
         # Generate a unique report ID
         report_id = f"RPT{int(datetime.now().timestamp())}{random.randint(1000, 9999)}"
         
-        # Handle X-ray upload
-        xray_data = None
+        # Handle X-ray upload, the raw bytes are handed to the analysis pool
+        # and xray_data is filled in when the job finishes. Re-uploads of an
+        # already analysed film reuse the stored result and overlay. The file
+        # is validated and mapped from its spool, never read into memory.
+        image_data = None
+        cache_key = None
+        analysis = None
         if 'xray' in request.files:
             xray_file = request.files['xray']
             if xray_file.filename:
-                # Read the image data
-                image_data = xray_file.read()
-                
-                # Process the X-ray image
-                analysis_result = process_xray_and_highlight(image_data)
-                
-                # Save the processed image
-                filename = secure_filename(f"{report_id}_xray.jpg")
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                with open(filepath, 'wb') as f:
-                    f.write(base64.b64decode(analysis_result['image_base64']))
-                
-                xray_data = {
-                    'image_path': f"/static/uploads/{filename}",
-                    'tb_probability': analysis_result['tb_probability'],
-                    'infected_areas': analysis_result['infected_areas'],
-                    'confidence_score': random.uniform(0.85, 0.95)
-                }
+                image_data = upload_stack.enter_context(
+                    uploads.image_buffer(xray_file, app.config['XRAY_MAX_BYTES'])
+                )
+                cache_key = analysis_cache_key(image_data)
+                analysis = cached_analysis(cache_key)
         
         # Handle sputum test data
         sputum_data = None
         if request.form.get('sputum_test'):
+            # Correlated with the X-ray findings once the analysis is done
             sputum_probability = float(request.form.get('sputum_probability', 0))
-            # Correlate sputum test probability with X-ray data if available
-            if xray_data:
-                # Adjust sputum probability based on X-ray findings
-                base_probability = xray_data['tb_probability']
-                sputum_probability = max(min(base_probability * random.uniform(0.8, 1.2), 100), 0)
             
             sputum_data = {
                 'result': 'positive' if sputum_probability > 50 else 'negative',
@@ -462,11 +688,16 @@ def upload_report():
             'patient_email': session['email'],
             'report_type': request.form.get('report_type', 'xray'),
             'status': 'pending',
-            'xray_data': xray_data,
+            'xray_data': None,
+            'analysis_status': analysis_jobs.PENDING if image_data is not None else analysis_jobs.DONE,
             'sputum_data': sputum_data,
             'symptoms': symptoms,
             'upload_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
+        if analysis:
+            analysis_jobs.complete_report(report_data, analysis)
+        elif image_data is not None:
+            report_data['upload_hash'], _, _ = upload_store.write(lambda sink: sink.write(image_data))
         
         # Insert into database
         cursor.execute('''
@@ -477,24 +708,109 @@ def upload_report():
             report_data['patient_email'],
             report_data['report_type'],
             report_data['status'],
-            json.dumps(report_data),
+            report_format.encode(report_data),
             report_data['upload_date']
         ))
         
+        # A cached analysis shares the existing overlay blob
+        if analysis:
+            blob_store.add_ref(cursor, analysis['image_hash'])
+        
         conn.commit()
-        return jsonify({'success': True, 'report_id': report_id})
+        touch_data(patient_scope(report_data['patient_email']), HEALTHCARE_SCOPE)
+        
+        # submit() marks the report failed if the job cannot be queued
+        if image_data is not None and not analysis:
+            future = get_analysis_queue().submit(report_id, image_data)
+            future.add_done_callback(lambda f: cache_analysis_result(cache_key, f))
         
+        return jsonify({
+            'success': True,
+            'report_id': report_id,
+            'analysis_status': report_data['analysis_status']
+        })
+        
+    except uploads.UploadRejected as e:
+        return jsonify({'error': e.message}), e.status
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        if conn:
-            conn.close()
+        upload_stack.close()
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': 'Upload exceeds the maximum allowed size'}), 413
+
+@app.route('/report_status/<report_id>')
+def report_status(report_id):
+    if 'email' not in session and 'user_id' not in session:
+        return jsonify({'error': 'Not authorized'}), 401
+    
+    try:
+        conn = create_connection()
+        if conn is None:
+            return jsonify({'success': False, 'message': 'Database error'})
+        
+        c = conn.cursor()
+        c.execute('SELECT patient_email, data FROM reports WHERE report_id = ?', (report_id,))
+        row = c.fetchone()
+        if not row:
+            return jsonify({'success': False, 'message': 'Report not found'}), 404
+        
+        # Patients may only poll their own reports
+        if session.get('user_type') != 'healthcare' and row[0] != session.get('email', session.get('user_id')):
+            return jsonify({'error': 'Not authorized'}), 401
+        
+        report_data = report_format.decode(row[1])
+        status = report_data.get('analysis_status', analysis_jobs.DONE)
+        response = {
+            'success': True,
+            'report_id': report_id,
+            'status': status
+        }
+        if status == analysis_jobs.DONE:
+            response['xray_data'] = report_data.get('xray_data')
+            response['sputum_data'] = report_data.get('sputum_data')
+            # JSON clients can ask for the overlay inline as base64
+            xray_data = report_data.get('xray_data')
+            if xray_data and request.args.get('include_image') == 'base64':
+                if xray_data.get('image_hash'):
+                    filepath = overlay_store.path(xray_data['image_hash'])
+                else:
+                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(xray_data['image_path']))
+                with open(filepath, 'rb') as f:
+                    response['image_base64'] = base64.b64encode(f.read()).decode('utf-8')
+        elif status == analysis_jobs.FAILED:
+            response['error'] = report_data.get('analysis_error')
+        elif report_data.get('preview'):
+            response['preview'] = report_data['preview']
+        
+        return jsonify(response)
+    
+    except Exception as e:
+        print(f"Error getting report status: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error getting report status: {str(e)}'})
 
+# Pending reports, newest first, one page at a time:
+#   ?limit=N       reports per page
+#   ?cursor=...    next_cursor from the previous page
+#   ?view=full     include the full report data (infected areas, findings)
 @app.route('/get_pending_reports')
 def get_pending_reports():
     if 'user_id' not in session or session['user_type'] != 'healthcare':
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
+    try:
+        limit = pagination.page_limit(request.args.get('limit'),
+                                      app.config['PENDING_REPORTS_PAGE_SIZE'],
+                                      app.config['PENDING_REPORTS_MAX_PAGE_SIZE'])
+        cursor = pagination.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    full = request.args.get('view') == 'full'
+    
     try:
         conn = create_connection()
         if conn is None:
@@ -502,31 +818,31 @@ def get_pending_reports():
 
         c = conn.cursor()
         
-        # Get all pending reports with patient details
-        c.execute('''
-            SELECT pr.*, p.name as patient_name 
-            FROM patient_records pr 
-            JOIN patients p ON pr.patient_email = p.email 
-            WHERE pr.status = 'pending'
-            ORDER BY pr.created_at DESC
-        ''')
+        # Get a page of pending reports with patient details
+        c.execute(reports_page_query(cursor is not None, full), ('pending', *(cursor or ()), limit + 1))
+        rows, next_cursor = pagination.split_page(c.fetchall(), limit, LIST_COLUMNS.index('created_at'), 0)
         
         reports = []
-        for row in c.fetchall():
-            report_data = json.loads(row[3])  # report_data column
-            reports.append({
-                'id': row[0],
-                'patient_email': row[1],
-                'patient_name': report_data['patient_name'],
-                'type': row[2],
-                'data': report_data,
-                'status': row[4],
-                'date': row[5]
-            })
+        for row in rows:
+            summary = dict(zip(LIST_COLUMNS, row))
+            report = {
+                'id': summary['id'],
+                'patient_email': summary['patient_email'],
+                'patient_name': summary['patient_name'],
+                'type': summary['report_type'],
+                'status': summary['status'],
+                'date': summary['created_at'],
+                'tb_probability': summary['tb_probability'],
+                'severity': summary['severity']
+            }
+            if full:
+                report['data'] = report_format.decode(row[len(LIST_COLUMNS)])  # report_data column
+            reports.append(report)
 
         return jsonify({
             'success': True,
-            'reports': reports
+            'reports': reports,
+            'next_cursor': next_cursor
         })
 
     except Exception as e:
@@ -535,9 +851,6 @@ def get_pending_reports():
             'success': False,
             'message': f'Error getting pending reports: {str(e)}'
         })
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/accept_report', methods=['POST'])
 def accept_report():
@@ -578,16 +891,12 @@ def accept_report():
         ))
         
         # Get the updated report data
-        report_data = json.loads(report[3])
+        report_data = report_format.decode(report[3])
         report_data['accepted_by'] = session['user_id']
         report_data['accepted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Update the report data
-        c.execute('''
-            UPDATE patient_records 
-            SET report_data = ?
-            WHERE id = ?
-        ''', (json.dumps(report_data), report_id))
+        # Update the report data and its summary columns
+        records.save_report_data(c, report_id, report_data)
         
         # Create a notification for the patient
         c.execute('''
@@ -605,6 +914,7 @@ def accept_report():
         ))
         
         conn.commit()
+        touch_data(patient_scope(report[1]), HEALTHCARE_SCOPE)
         
         return jsonify({
             'success': True,
@@ -619,9 +929,6 @@ def accept_report():
     except Exception as e:
         print(f"Error accepting report: {str(e)}")
         return jsonify({'success': False, 'message': f'Error accepting report: {str(e)}'})
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/reject_report', methods=['POST'])
 def reject_report():
@@ -652,6 +959,10 @@ def reject_report():
         ))
         
         conn.commit()
+        
+        c.execute('SELECT patient_email FROM patient_records WHERE id = ?', (report_id,))
+        record = c.fetchone()
+        touch_data(*([patient_scope(record[0])] if record else []), HEALTHCARE_SCOPE)
 
         return jsonify({
             'success': True,
@@ -664,9 +975,6 @@ def reject_report():
             'success': False,
             'message': f'Error rejecting report: {str(e)}'
         })
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/get_analysis/<report_id>')
 def get_analysis(report_id):
@@ -688,7 +996,7 @@ def get_analysis(report_id):
             return jsonify({'success': False, 'message': 'Report not found'})
         
         # Parse the JSON data
-        report_data = json.loads(result[0])
+        report_data = report_format.decode(result[0])
         
         # Format the analysis data
         analysis = {
@@ -708,9 +1016,6 @@ def get_analysis(report_id):
             'success': False,
             'message': f'Error retrieving analysis: {str(e)}'
         })
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/accept_patient', methods=['POST'])
 def accept_patient():
@@ -764,6 +1069,7 @@ def mark_cured():
     
     cured_patients[username][patient_username] = accepted_patients[username][patient_username]
     del accepted_patients[username][patient_username]
+    touch_data(patient_scope(patient_username), HEALTHCARE_SCOPE)
     
     return jsonify({'success': True, 'message': 'Patient marked as cured'})
 
@@ -854,3036 +1160,85 @@ def get_tb_guidance():
     
     return jsonify({'success': True, 'guidance': guidance[language]})
 
-# HTML Templates as strings
+# Jinja template sources (templates/sources/), with ETags and gzip
+raw_templates = template_sources.TemplateSources(app.jinja_env, [
+    'home', 'features', 'contact', 'login', 'register', 'patient_dashboard', 'healthcare_dashboard'
+])
+raw_templates.preload()
+
 @app.route('/get_html_template')
 def get_html_template():
     template_name = request.args.get('template')
-    if template_name == 'home':
-        return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Pulmoscan.ai - TB Diagnosis & Care</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* Global Styles */
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }
-        
-        body {
-            background-color: #f5f7fa;
-            color: #333;
-            line-height: 1.6;
-        }
-        
-        .container {
-            width: 90%;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-        }
-        
-        /* Header Styles */
-        header {
-            background-color: #2c3e50;
-            color: white;
-            padding: 1rem 0;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #3498db;
-        }
-        
-        .nav-links {
-            display: flex;
-            list-style: none;
-        }
-        
-        .nav-links li {
-            margin-left: 2rem;
-        }
-        
-        .nav-links a {
-            color: white;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #3498db;
-        }
-        
-        /* Hero Section */
-        .hero {
-            background: linear-gradient(rgba(44, 62, 80, 0.8), rgba(44, 62, 80, 0.8)), url('https://placehold.co/1200x600');
-            background-size: cover;
-            background-position: center;
-            color: white;
-            text-align: center;
-            padding: 5rem 0;
-            margin-bottom: 3rem;
-        }
-        
-        .hero h1 {
-            font-size: 3rem;
-            margin-bottom: 1rem;
-        }
-        
-        .hero p {
-            font-size: 1.2rem;
-            max-width: 800px;
-            margin: 0 auto 2rem;
-        }
-        
-        .btn-container {
-            display: flex;
-            justify-content: center;
-            gap: 1rem;
-            margin-top: 2rem;
-        }
-        
-        .btn {
-            display: inline-block;
-            background-color: #3498db;
-            color: white;
-            padding: 0.8rem 2rem;
-            border-radius: 5px;
-            text-decoration: none;
-            font-weight: 600;
-            transition: background-color 0.3s;
-            border: none;
-            cursor: pointer;
-        }
-        
-        .btn:hover {
-            background-color: #2980b9;
-        }
-        
-        .btn-secondary {
-            background-color: transparent;
-            border: 2px solid #3498db;
-        }
-        
-        .btn-secondary:hover {
-            background-color: rgba(52, 152, 219, 0.1);
-        }
-        
-        /* Features Section */
-        .features {
-            padding: 3rem 0;
-            text-align: center;
-        }
-        
-        .features h2 {
-            font-size: 2.5rem;
-            margin-bottom: 3rem;
-            color: #2c3e50;
-        }
-        
-        .feature-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 2rem;
-        }
-        
-        .feature-card {
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            transition: transform 0.3s;
-        }
-        
-        .feature-card:hover {
-            transform: translateY(-10px);
-        }
-        
-        .feature-icon {
-            font-size: 3rem;
-            color: #3498db;
-            margin-bottom: 1rem;
-        }
-        
-        .feature-card h3 {
-            font-size: 1.5rem;
-            margin-bottom: 1rem;
-            color: #2c3e50;
-        }
-        
-        /* Footer */
-        footer {
-            background-color: #2c3e50;
-            color: white;
-            padding: 2rem 0;
-            text-align: center;
-            margin-top: 3rem;
-        }
-        
-        .footer-content {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-        }
-        
-        .footer-links {
-            display: flex;
-            list-style: none;
-            margin: 1rem 0;
-        }
-        
-        .footer-links li {
-            margin: 0 1rem;
-        }
-        
-        .footer-links a {
-            color: white;
-            text-decoration: none;
-        }
-        
-        .footer-links a:hover {
-            text-decoration: underline;
-        }
-        
-        .copyright {
-            margin-top: 1rem;
-            font-size: 0.9rem;
-            color: #bdc3c7;
-        }
-        
-        /* Responsive */
-        @media (max-width: 768px) {
-            .nav-links {
-                display: none;
-            }
-            
-            .hero h1 {
-                font-size: 2rem;
-            }
-            
-            .hero p {
-                font-size: 1rem;
-            }
-            
-            .btn-container {
-                flex-direction: column;
-                align-items: center;
-            }
-            
-            .btn {
-                width: 80%;
-                margin-bottom: 1rem;
-                text-align: center;
-            }
-        }
-    </style>
-</head>
-<body>
-    <header>
-        <div class="container">
-            <nav>
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="nav-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-            </nav>
-        </div>
-    </header>
-
-    <section class="hero">
-        <div class="container">
-            <h1>Revolutionizing TB Diagnosis & Care</h1>
-            <p>Pulmoscan.ai combines advanced AI technology with medical expertise to provide accurate TB diagnosis, personalized treatment plans, and comprehensive patient care.</p>
-            <div class="btn-container">
-                <a href="/login?type=patient" class="btn">Patient Login</a>
-                <a href="/login?type=healthcare" class="btn btn-secondary">Healthcare Worker Login</a>
-            </div>
-        </div>
-    </section>
-
-    <section class="features">
-        <div class="container">
-            <h2>Our Key Features</h2>
-            <div class="feature-grid">
-                <div class="feature-card">
-                    <div class="feature-icon">
-                        <i class="fas fa-lungs"></i>
-                    </div>
-                    <h3>X-Ray Analysis</h3>
-                    <p>Advanced AI-powered analysis of chest X-rays to detect TB with high accuracy.</p>
-                </div>
-                <div class="feature-card">
-                    <div class="feature-icon">
-                        <i class="fas fa-pills"></i>
-                    </div>
-                    <h3>Treatment Guidance</h3>
-                    <p>Personalized treatment plans based on patient data and medical history.</p>
-                </div>
-                <div class="feature-card">
-                    <div class="feature-icon">
-                        <i class="fas fa-user-md"></i>
-                    </div>
-                    <h3>Telemedicine</h3>
-                    <p>Connect with healthcare professionals remotely for consultations and follow-ups.</p>
-                </div>
-            </div>
-            <a href="/features" class="btn" style="margin-top: 2rem;">Explore All Features</a>
-        </div>
-    </section>
-
-    <footer>
-        <div class="container">
-            <div class="footer-content">
-                <div class="logo">Pulmoscan.ai</div>
-            <ul class="footer-links">
-                <li><a href="/">Home</a></li>
-                <li><a href="/features">Features</a></li>
-                <li><a href="/contact">Contact</a></li>
-            </ul>
-                <p class="copyright">&copy; 2025 Pulmoscan.ai. All rights reserved.</p>
-            </div>
-        </div>
-    </footer>
-    
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            const patientBtn = document.querySelector('.btn-container .btn');
-            const healthcareBtn = document.querySelector('.btn-container .btn-secondary');
-            
-            patientBtn.addEventListener('click', function(e) {
-                e.preventDefault();
-                window.location.href = '/login?type=patient';
-            });
-            
-            healthcareBtn.addEventListener('click', function(e) {
-                e.preventDefault();
-                window.location.href = '/login?type=healthcare';
-            });
-        });
-    </script>
-</body>
-</html>
-        '''
-    elif template_name == 'features':
-        return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Features - Pulmoscan.ai</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* Global Styles */
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }
-        
-        body {
-            background-color: #f5f7fa;
-            color: #333;
-            line-height: 1.6;
-        }
-        
-        .container {
-            width: 90%;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-        }
-        
-        /* Header Styles */
-        header {
-            background-color: #2c3e50;
-            color: white;
-            padding: 1rem 0;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #3498db;
-        }
-        
-        .nav-links {
-            display: flex;
-            list-style: none;
-        }
-        
-        .nav-links li {
-            margin-left: 2rem;
-        }
-        
-        .nav-links a {
-            color: white;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #3498db;
-        }
-        
-        /* Page Header */
-        .page-header {
-            background: linear-gradient(rgba(44, 62, 80, 0.8), rgba(44, 62, 80, 0.8)), url('https://placehold.co/1200x400');
-            background-size: cover;
-            background-position: center;
-            color: white;
-            text-align: center;
-            padding: 3rem 0;
-            margin-bottom: 3rem;
-        }
-        
-        .page-header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .page-header p {
-            font-size: 1.1rem;
-            max-width: 800px;
-            margin: 0 auto;
-        }
-        
-        /* Features Section */
-        .features-list {
-            padding: 2rem 0;
-        }
-        
-        .feature-item {
-            display: flex;
-            align-items: center;
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            margin-bottom: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .feature-icon {
-            font-size: 3rem;
-            color: #3498db;
-            margin-right: 2rem;
-            min-width: 80px;
-            text-align: center;
-        }
-        
-        .feature-content h2 {
-            font-size: 1.8rem;
-            margin-bottom: 1rem;
-            color: #2c3e50;
-        }
-        
-        .feature-content p {
-            color: #7f8c8d;
-            margin-bottom: 1rem;
-        }
-        
-        /* CTA Section */
-        .cta {
-            background-color: #3498db;
-            color: white;
-            text-align: center;
-            padding: 3rem 0;
-            margin: 3rem 0;
-            border-radius: 10px;
-        }
-        
-        .cta h2 {
-            font-size: 2rem;
-            margin-bottom: 1rem;
-        }
-        
-        .cta p {
-            font-size: 1.1rem;
-            max-width: 800px;
-            margin: 0 auto 2rem;
-        }
-        
-        .btn {
-            display: inline-block;
-            background-color: white;
-            color: #3498db;
-            padding: 0.8rem 2rem;
-            border-radius: 5px;
-            text-decoration: none;
-            font-weight: 600;
-            transition: background-color 0.3s;
-        }
-        
-        .btn:hover {
-            background-color: #f5f5f5;
-        }
-        
-        /* Footer */
-        footer {
-            background-color: #2c3e50;
-            color: white;
-            padding: 2rem 0;
-            text-align: center;
-        }
-        
-        .footer-content {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-        }
-        
-        .footer-links {
-            display: flex;
-            list-style: none;
-            margin: 1rem 0;
-        }
-        
-        .footer-links li {
-            margin: 0 1rem;
-        }
-        
-        .footer-links a {
-            color: white;
-            text-decoration: none;
-        }
-        
-        .footer-links a:hover {
-            text-decoration: underline;
-        }
-        
-        .copyright {
-            margin-top: 1rem;
-            font-size: 0.9rem;
-            color: #bdc3c7;
-        }
-        
-        /* Responsive */
-        @media (max-width: 768px) {
-            .nav-links {
-                display: none;
-            }
-            
-            .feature-item {
-                flex-direction: column;
-                text-align: center;
-            }
-            
-            .feature-icon {
-                margin-right: 0;
-                margin-bottom: 1rem;
-            }
-        }
-    </style>
-</head>
-<body>
-    <header>
-        <div class="container">
-            <nav>
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="nav-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-            </nav>
-        </div>
-    </header>
-
-    <section class="page-header">
-        <div class="container">
-            <h1>Our Comprehensive Features</h1>
-            <p>Discover how Pulmoscan.ai is transforming TB diagnosis and care with cutting-edge AI technology and patient-centered solutions.</p>
-        </div>
-    </section>
-
-    <section class="features-list">
-        <div class="container">
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-lungs"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>X-Ray Analysis & Highlighting</h2>
-                    <p>Our advanced CAD4TB technology analyzes chest X-rays to detect TB with high accuracy. The system assigns probability scores indicating the likelihood of TB and differentiates between active infections and scarring.</p>
-                    <p>Healthcare workers receive detailed reports with highlighted areas of concern, making diagnosis faster and more accurate.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-pills"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Personalized Treatment Guidance</h2>
-                    <p>Our AI models predict patient responses to specific TB treatments based on clinical and genomic data. This allows healthcare workers to tailor treatment regimens for both drug-susceptible and drug-resistant TB.</p>
-                    <p>The system recommends optimal treatment plans, including dosage adjustments for individual patients based on weight, age, symptoms, and genomic resistance patterns.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-book-medical"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Patient Education & Precautions</h2>
-                    <p>Comprehensive educational resources explain TB, its transmission, symptoms, and prevention measures through multimedia formats (text, videos, infographics).</p>
-                    <p>Interactive modules teach patients about medication adherence and necessary lifestyle changes to support recovery and prevent transmission.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-calendar-check"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Medication Adherence Tracking</h2>
-                    <p>Patients can log their medication intake within the app and receive timely reminders through push notifications to ensure consistent adherence to treatment protocols.</p>
-                    <p>Visual progress tracking shows treatment milestones, motivating patients to complete their full course of medication.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-exclamation-triangle"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Side Effect Monitoring</h2>
-                    <p>Self-reporting tools allow patients to document potential side effects of medications directly within the app.</p>
-                    <p>The system suggests remedies for minor side effects and alerts healthcare providers if severe side effects are reported, ensuring timely intervention.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-video"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Telemedicine Integration</h2>
-                    <p>Remote consultations connect patients with healthcare providers, especially beneficial for those in remote areas with limited access to TB specialists.</p>
-                    <p>AI-powered clinical decision support systems assist doctors in providing recommendations remotely, improving the quality of virtual care.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-dna"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Advanced Diagnostics</h2>
-                    <p>Genomic analysis of Mycobacterium tuberculosis strains helps identify drug resistance patterns, enabling tailored treatments for multidrug-resistant TB (MDR-TB) or extensively drug-resistant TB (XDR-TB).</p>
-                    <p>Integration with laboratory systems allows for comprehensive diagnostic reporting in one centralized platform.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-users"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Community Screening Tools</h2>
-                    <p>Risk factor screening questionnaires help community health workers identify high-risk individuals who should be prioritized for TB testing.</p>
-                    <p>Smartphone-based tools, such as cough analysis via microphones, provide preliminary screening capabilities in resource-limited settings.</p>
-                </div>
-            </div>
-
-            <div class="feature-item">
-                <div class="feature-icon">
-                    <i class="fas fa-wifi-slash"></i>
-                </div>
-                <div class="feature-content">
-                    <h2>Offline Functionality</h2>
-                    <p>All essential features work offline by leveraging edge AI technologies, making the platform accessible in areas with limited internet connectivity.</p>
-                    <p>Patient data is stored securely on local devices until internet connectivity is available for synchronization, ensuring continuity of care.</p>
-                </div>
-            </div>
-        </div>
-    </section>
-
-    <section class="cta">
-        <div class="container">
-            <h2>Ready to Transform TB Care?</h2>
-            <p>Join thousands of healthcare professionals and patients who are already benefiting from Pulmoscan.ai's innovative approach to TB diagnosis and treatment.</p>
-            <a href="/register" class="btn">Get Started Today</a>
-        </div>
-    </section>
-
-    <footer>
-        <div class="container">
-            <div class="footer-content">
-                <div class="logo">Pulmoscan.ai</div>
-            <ul class="footer-links">
-                <li><a href="/">Home</a></li>
-                <li><a href="/features">Features</a></li>
-                <li><a href="/contact">Contact</a></li>
-            </ul>
-                <p class="copyright">&copy; 2025 Pulmoscan.ai. All rights reserved.</p>
-            </div>
-        </div>
-    </footer>
-</body>
-</html>
-        '''
-    elif template_name == 'contact':
-        return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Contact Us - Pulmoscan.ai</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* Global Styles */
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }
-        
-        body {
-            background-color: #f5f7fa;
-            color: #333;
-            line-height: 1.6;
-        }
-        
-        .container {
-            width: 90%;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-        }
-        
-        /* Header Styles */
-        header {
-            background-color: #2c3e50;
-            color: white;
-            padding: 1rem 0;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #3498db;
-        }
-        
-        .nav-links {
-            display: flex;
-            list-style: none;
-        }
-        
-        .nav-links li {
-            margin-left: 2rem;
-        }
-        
-        .nav-links a {
-            color: white;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #3498db;
-        }
-        
-        /* Page Header */
-        .page-header {
-            background: linear-gradient(rgba(44, 62, 80, 0.8), rgba(44, 62, 80, 0.8)), url('https://placehold.co/1200x400');
-            background-size: cover;
-            background-position: center;
-            color: white;
-            text-align: center;
-            padding: 3rem 0;
-            margin-bottom: 3rem;
-        }
-        
-        .page-header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .page-header p {
-            font-size: 1.1rem;
-            max-width: 800px;
-            margin: 0 auto;
-        }
-        
-        /* Contact Section */
-        .contact-section {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 2rem;
-            margin-bottom: 3rem;
-        }
-        
-        .contact-form {
-            flex: 1;
-            min-width: 300px;
-            background-color: white;
-            padding: 2rem;
-            border-radius: 10px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .contact-form h2 {
-            font-size: 1.8rem;
-            margin-bottom: 1.5rem;
-            color: #2c3e50;
-        }
-        
-        .form-group {
-            margin-bottom: 1.5rem;
-        }
-        
-        .form-group label {
-            display: block;
-            margin-bottom: 0.5rem;
-            font-weight: 600;
-            color: #2c3e50;
-        }
-        
-        .form-group input,
-        .form-group textarea {
-            width: 100%;
-            padding: 0.8rem;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 1rem;
-        }
-        
-        .form-group textarea {
-            min-height: 150px;
-            resize: vertical;
-        }
-        
-        .btn {
-            display: inline-block;
-            background-color: #3498db;
-            color: white;
-            padding: 0.8rem 2rem;
-            border-radius: 5px;
-            text-decoration: none;
-            font-weight: 600;
-            transition: background-color 0.3s;
-            border: none;
-            cursor: pointer;
-        }
-        
-        .btn:hover {
-            background-color: #2980b9;
-        }
-        
-        .contact-info {
-            flex: 1;
-            min-width: 300px;
-        }
-        
-        .info-card {
-            background-color: white;
-            padding: 2rem;
-            border-radius: 10px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            margin-bottom: 2rem;
-        }
-        
-        .info-card h2 {
-            font-size: 1.8rem;
-            margin-bottom: 1.5rem;
-            color: #2c3e50;
-        }
-        
-        .info-item {
-            display: flex;
-            align-items: flex-start;
-            margin-bottom: 1.5rem;
-        }
-        
-        .info-icon {
-            font-size: 1.5rem;
-            color: #3498db;
-            margin-right: 1rem;
-            min-width: 30px;
-        }
-        
-        .info-content h3 {
-            font-size: 1.2rem;
-            margin-bottom: 0.5rem;
-            color: #2c3e50;
-        }
-        
-        .info-content p {
-            color: #7f8c8d;
-        }
-        
-        .social-links {
-            display: flex;
-            gap: 1rem;
-            margin-top: 1rem;
-        }
-        
-        .social-links a {
-            display: inline-block;
-            width: 40px;
-            height: 40px;
-            background-color: #3498db;
-            color: white;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: background-color 0.3s;
-        }
-        
-        .social-links a:hover {
-            background-color: #2980b9;
-        }
-        
-        /* Map Section */
-        .map-section {
-            margin-bottom: 3rem;
-        }
-        
-        .map-container {
-            height: 400px;
-            border-radius: 10px;
-            overflow: hidden;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        /* Footer */
-        footer {
-            background-color: #2c3e50;
-            color: white;
-            padding: 2rem 0;
-            text-align: center;
-        }
-        
-        .footer-content {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-        }
-        
-        .footer-links {
-            display: flex;
-            list-style: none;
-            margin: 1rem 0;
-        }
-        
-        .footer-links li {
-            margin: 0 1rem;
-        }
-        
-        .footer-links a {
-            color: white;
-            text-decoration: none;
-        }
-        
-        .footer-links a:hover {
-            text-decoration: underline;
-        }
-        
-        .copyright {
-            margin-top: 1rem;
-            font-size: 0.9rem;
-            color: #bdc3c7;
-        }
-        
-        /* Alert Messages */
-        .alert {
-            padding: 1rem;
-            border-radius: 5px;
-            margin-bottom: 1rem;
-        }
-        
-        .alert-success {
-            background-color: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-        
-        .alert-danger {
-            background-color: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-        
-        /* Responsive */
-        @media (max-width: 768px) {
-            .nav-links {
-                display: none;
-            }
-            
-            .contact-section {
-                flex-direction: column;
-            }
-        }
-    </style>
-</head>
-<body>
-    <header>
-        <div class="container">
-            <nav>
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="nav-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-            </nav>
-        </div>
-    </header>
-
-    <section class="page-header">
-        <div class="container">
-            <h1>Contact Us</h1>
-            <p>Have questions about Pulmoscan.ai? We're here to help. Reach out to our team for support, inquiries, or partnership opportunities.</p>
-        </div>
-    </section>
-
-    <section class="container">
-        <div class="contact-section">
-            <div class="contact-form">
-                <h2>Send Us a Message</h2>
-                <form id="contactForm" action="/submit_contact" method="POST">
-                    <div class="form-group">
-                        <label for="name">Your Name</label>
-                        <input type="text" id="name" name="name" required>
-            </div>
-                    <div class="form-group">
-                        <label for="email">Email Address</label>
-                        <input type="email" id="email" name="email" required>
-                    </div>
-                    <div class="form-group">
-                        <label for="message">Message</label>
-                        <textarea id="message" name="message" required></textarea>
-                    </div>
-                    <button type="submit" class="btn">Send Message</button>
-                </form>
-            </div>
-            
-                <div class="contact-info">
-                <div class="info-card">
-                    <h2>Contact Information</h2>
-                    <div class="info-item">
-                        <div class="info-icon">
-                            <i class="fas fa-map-marker-alt"></i>
-                        </div>
-                        <div class="info-content">
-                            <h3>Our Location</h3>
-                            <p>123 Innovation Drive, Health Tech Park, Bangalore, India</p>
-                        </div>
-                    </div>
-                    <div class="info-item">
-                        <div class="info-icon">
-                            <i class="fas fa-phone-alt"></i>
-                        </div>
-                        <div class="info-content">
-                            <h3>Phone Number</h3>
-                            <p>+91 80 1234 5678</p>
-                    </div>
-                        </div>
-                    <div class="info-item">
-                        <div class="info-icon">
-                            <i class="fas fa-envelope"></i>
-                    </div>
-                        <div class="info-content">
-                            <h3>Email Address</h3>
-                            <p>info@pulmoscan.ai</p>
-                        </div>
-                    </div>
-                    <div class="info-item">
-                        <div class="info-icon">
-                            <i class="fas fa-clock"></i>
-                        </div>
-                        <div class="info-content">
-                            <h3>Working Hours</h3>
-                            <p>Monday - Friday: 9:00 AM - 6:00 PM</p>
-                        </div>
-                    </div>
-                    <div class="social-links">
-                        <a href="#"><i class="fab fa-facebook-f"></i></a>
-                        <a href="#"><i class="fab fa-twitter"></i></a>
-                        <a href="#"><i class="fab fa-linkedin-in"></i></a>
-                        <a href="#"><i class="fab fa-instagram"></i></a>
-                </div>
-                        </div>
-                        </div>
-                        </div>
-                        
-        <div class="map-section">
-            <div class="map-container">
-                <iframe src="https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d497699.9973874144!2d77.35073573336324!3d12.95384772557775!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!3m3!1m2!1s0x3bae1670c9b44e6d%3A0xf8dfc3e8517e4fe0!2sBengaluru%2C%20Karnataka%2C%20India!5e0!3m2!1sen!2sus!4v1650450351910!5m2!1sen!2sus" width="100%" height="100%" style="border:0;" allowfullscreen="" loading="lazy"></iframe>
-            </div>
-        </div>
-    </section>
-
-    <footer>
-        <div class="container">
-            <div class="footer-content">
-                <div class="logo">Pulmoscan.ai</div>
-            <ul class="footer-links">
-                <li><a href="/">Home</a></li>
-                <li><a href="/features">Features</a></li>
-                <li><a href="/contact">Contact</a></li>
-            </ul>
-                <p class="copyright">&copy; 2025 Pulmoscan.ai. All rights reserved.</p>
-            </div>
-        </div>
-    </footer>
-    
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            const contactForm = document.getElementById('contactForm');
-            
-            contactForm.addEventListener('submit', function(e) {
-                e.preventDefault();
-                
-                const formData = new FormData(contactForm);
-                
-                fetch('/submit_contact', {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        alert('Thank you for your message! We will get back to you soon.');
-                        contactForm.reset();
-                    } else {
-                        alert('There was an error sending your message. Please try again.');
-                    }
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    alert('There was an error sending your message. Please try again.');
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-        '''
-    elif template_name == 'login':
-        return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Login - Pulmoscan.ai</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* Global Styles */
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }
-        
-        body {
-            background-color: #f5f7fa;
-            color: #333;
-            line-height: 1.6;
-            min-height: 100vh;
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .container {
-            width: 90%;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-        }
-        
-        /* Header Styles */
-        header {
-            background-color: #2c3e50;
-            color: white;
-            padding: 1rem 0;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }
-        
-        nav {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .logo {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #3498db;
-        }
-        
-        .nav-links {
-            display: flex;
-            list-style: none;
-        }
-        
-        .nav-links li {
-            margin-left: 2rem;
-        }
-        
-        .nav-links a {
-            color: white;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-        }
-        
-        .nav-links a:hover {
-            color: #3498db;
-        }
-        
-        /* Main Content */
-        main {
-            flex: 1;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            padding: 3rem 0;
-        }
-        
-        .auth-container {
-            width: 100%;
-            max-width: 400px;
-            background-color: white;
-            border-radius: 10px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            padding: 2rem;
-        }
-        
-        .auth-header {
-            text-align: center;
-            margin-bottom: 2.auth-header h2 {
-            font-size: 2rem;
-            color: #2c3e50;
-            margin-bottom: 0.5rem;
-        }
-        
-        .auth-header p {
-            color: #7f8c8d;
-            margin-bottom: 2rem;
-        }
-        
-        .form-group {
-            margin-bottom: 1.5rem;
-        }
-        
-        .form-group label {
-            display: block;
-            margin-bottom: 0.5rem;
-            font-weight: 600;
-            color: #2c3e50;
-        }
-        
-        .form-group input {
-            width: 100%;
-            padding: 0.8rem;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 1rem;
-        }
-        
-        .form-group input:focus {
-            outline: none;
-            border-color: #3498db;
-        }
-        
-        .btn {
-            display: block;
-            width: 100%;
-            background-color: #3498db;
-            color: white;
-            padding: 0.8rem;
-            border: none;
-            border-radius: 5px;
-            font-size: 1rem;
-            font-weight: 600;
-            cursor: pointer;
-            transition: background-color 0.3s;
-        }
-        
-        .btn:hover {
-            background-color: #2980b9;
-        }
-        
-        .auth-footer {
-            text-align: center;
-            margin-top: 2rem;
-            padding-top: 1rem;
-            border-top: 1px solid #ddd;
-        }
-        
-        .auth-footer p {
-            color: #7f8c8d;
-            margin-bottom: 1rem;
-        }
-        
-        .auth-footer a {
-            color: #3498db;
-            text-decoration: none;
-            font-weight: 600;
-        }
-        
-        .auth-footer a:hover {
-            text-decoration: underline;
-        }
-        
-        /* Alert Messages */
-        .alert {
-            padding: 1rem;
-            border-radius: 5px;
-            margin-bottom: 1rem;
-            text-align: center;
-        }
-        
-        .alert-danger {
-            background-color: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-        
-        /* Footer */
-        footer {
-            background-color: #2c3e50;
-            color: white;
-            padding: 2rem 0;
-            text-align: center;
-            margin-top: auto;
-        }
-        
-        .footer-content {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-        }
-        
-        .footer-links {
-            display: flex;
-            list-style: none;
-            margin: 1rem 0;
-        }
-        
-        .footer-links li {
-            margin: 0 1rem;
-        }
-        
-        .footer-links a {
-            color: white;
-            text-decoration: none;
-        }
-        
-        .footer-links a:hover {
-            text-decoration: underline;
-        }
-        
-        .copyright {
-            margin-top: 1rem;
-            font-size: 0.9rem;
-            color: #bdc3c7;
-        }
-        
-        /* Responsive */
-        @media (max-width: 768px) {
-            .nav-links {
-                display: none;
-            }
-            
-            .auth-container {
-                margin: 0 1rem;
-            }
-        }
-    </style>
-</head>
-<body>
-    <header>
-        <div class="container">
-            <nav>
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="nav-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-            </nav>
-        </div>
-    </header>
-
-    <main>
-            <div class="auth-container">
-                <div class="auth-header">
-                <h2>Welcome Back</h2>
-                <p>Login to access your dashboard</p>
-                </div>
-                
-            {% with messages = get_flashed_messages(with_categories=true) %}
-                {% if messages %}
-                    {% for category, message in messages %}
-                        <div class="alert alert-{{ category }}">{{ message }}</div>
-                    {% endfor %}
-                {% endif %}
-            {% endwith %}
-            
-            <form id="loginForm" action="/login" method="POST">
-                    <div class="form-group">
-                        <label for="username">Username</label>
-                    <input type="text" id="username" name="username" required>
-                    </div>
-                    <div class="form-group">
-                        <label for="password">Password</label>
-                    <input type="password" id="password" name="password" required>
-                    </div>
-                <button type="submit" class="btn">Login</button>
-                </form>
-                
-                <div class="auth-footer">
-                <p>Don't have an account? <a href="/register">Register Now</a></p>
-                </div>
-            </div>
-    </main>
-    
-    <footer>
-        <div class="container">
-            <div class="footer-content">
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="footer-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-                <p class="copyright">&copy; 2025 Pulmoscan.ai. All rights reserved.</p>
-        </div>
-        </div>
-    </footer>
-
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            const loginForm = document.getElementById('loginForm');
-            
-            loginForm.addEventListener('submit', function(e) {
-                e.preventDefault();
-                
-                const formData = new FormData(loginForm);
-                
-                fetch('/login', {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        window.location.href = data.redirect;
-                    } else {
-                        const alert = document.createElement('div');
-                        alert.className = 'alert alert-danger';
-                        alert.textContent = data.message;
-                        loginForm.insertBefore(alert, loginForm.firstChild);
-                    }
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    const alert = document.createElement('div');
-                    alert.className = 'alert alert-danger';
-                    alert.textContent = 'An error occurred. Please try again.';
-                    loginForm.insertBefore(alert, loginForm.firstChild);
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-'''
+    if template_name not in ('home', 'features', 'contact', 'login'):
+        return jsonify({'success': False, 'message': 'Template not found'}), 404
+    return raw_templates.response(template_name)
 
 # Register template
 @app.route('/register_template')
 def register_template():
-    return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Register - Pulmoscan.ai</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* [Previous CSS styles remain the same] */
-        
-        /* Additional styles for registration form */
-        .user-type-selector {
-            display: flex;
-            gap: 1rem;
-            margin-bottom: 1.5rem;
-        }
-        
-        .user-type-option {
-            flex: 1;
-            text-align: center;
-            padding: 1rem;
-            border: 2px solid #ddd;
-            border-radius: 5px;
-            cursor: pointer;
-            transition: all 0.3s;
-        }
-        
-        .user-type-option:hover {
-            border-color: #3498db;
-        }
-        
-        .user-type-option.selected {
-            border-color: #3498db;
-            background-color: #ebf5fb;
-        }
-        
-        .user-type-option i {
-            font-size: 2rem;
-            color: #3498db;
-            margin-bottom: 0.5rem;
-        }
-        
-        .terms-checkbox {
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-            margin-bottom: 1.5rem;
-        }
-        
-        .terms-checkbox input[type="checkbox"] {
-            width: auto;
-        }
-    </style>
-</head>
-<body>
-    <header>
-        <div class="container">
-            <nav>
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="nav-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-            </nav>
-        </div>
-    </header>
-
-    <main>
-            <div class="auth-container">
-            <div class="auth-header">
-                <h2>Create Account</h2>
-                <p>Join Pulmoscan.ai to access our services</p>
-                </div>
-            
-            <form id="registerForm" action="/register" method="POST">
-                <div class="user-type-selector">
-                    <div class="user-type-option" data-type="patient">
-                        <i class="fas fa-user"></i>
-                        <h3>Patient</h3>
-                </div>
-                    <div class="user-type-option" data-type="healthcare">
-                        <i class="fas fa-user-md"></i>
-                        <h3>Healthcare Worker</h3>
-                    </div>
-                </div>
-                <input type="hidden" name="user_type" id="userType" required>
-                
-                <div class="form-group">
-                    <label for="name">Full Name</label>
-                    <input type="text" id="name" name="name" required>
-                </div>
-                
-                <div class="form-group">
-                    <label for="email">Email Address</label>
-                    <input type="email" id="email" name="email" required>
-                </div>
-                
-                    <div class="form-group">
-                        <label for="username">Username</label>
-                    <input type="text" id="username" name="username" required>
-                    </div>
-                    
-                    <div class="form-group">
-                        <label for="password">Password</label>
-                    <input type="password" id="password" name="password" required>
-                    </div>
-                    
-                <div class="terms-checkbox">
-                    <input type="checkbox" id="terms" name="terms" required>
-                    <label for="terms">I agree to the Terms & Conditions and Privacy Policy</label>
-                    </div>
-                    
-                <button type="submit" class="btn">Create Account</button>
-                </form>
-                
-                <div class="auth-footer">
-                <p>Already have an account? <a href="/login">Login</a></p>
-                </div>
-            </div>
-    </main>
-    
-    <footer>
-        <div class="container">
-            <div class="footer-content">
-                <div class="logo">Pulmoscan.ai</div>
-                <ul class="footer-links">
-                    <li><a href="/">Home</a></li>
-                    <li><a href="/features">Features</a></li>
-                    <li><a href="/contact">Contact</a></li>
-                </ul>
-                <p class="copyright">&copy; 2025 Pulmoscan.ai. All rights reserved.</p>
-        </div>
-        </div>
-    </footer>
-    
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            const userTypeOptions = document.querySelectorAll('.user-type-option');
-            const userTypeInput = document.getElementById('userType');
-            const registerForm = document.getElementById('registerForm');
-            
-            userTypeOptions.forEach(option => {
-                option.addEventListener('click', function() {
-                    userTypeOptions.forEach(opt => opt.classList.remove('selected'));
-                    this.classList.add('selected');
-                    userTypeInput.value = this.dataset.type;
-                });
-            });
-            
-            registerForm.addEventListener('submit', function(e) {
-                e.preventDefault();
-                
-                if (!userTypeInput.value) {
-                    alert('Please select a user type');
-                    return;
-                }
-                
-                const formData = new FormData(registerForm);
-                
-                fetch('/register', {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        window.location.href = data.redirect;
-                    } else {
-                        const alert = document.createElement('div');
-                        alert.className = 'alert alert-danger';
-                        alert.textContent = data.message;
-                        registerForm.insertBefore(alert, registerForm.firstChild);
-                    }
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    const alert = document.createElement('div');
-                    alert.className = 'alert alert-danger';
-                    alert.textContent = 'An error occurred. Please try again.';
-                    registerForm.insertBefore(alert, registerForm.firstChild);
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-'''
+    return raw_templates.response('register')
 
 # Patient Dashboard template
 @app.route('/patient_dashboard_template')
 def patient_dashboard_template():
-    return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Patient Dashboard - Pulmoscan.ai</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* [Previous CSS styles remain the same] */
-        
-        /* Dashboard specific styles */
-        .dashboard {
-            display: flex;
-            min-height: calc(100vh - 60px);
-        }
-        
-        .sidebar {
-            width: 250px;
-            background-color: #2c3e50;
-            color: white;
-            padding: 2rem 0;
-        }
-        
-        .sidebar-menu {
-            list-style: none;
-        }
-        
-        .sidebar-menu li {
-            margin-bottom: 0.5rem;
-        }
-        
-        .sidebar-menu a {
-            display: flex;
-            align-items: center;
-            padding: 1rem 2rem;
-            color: white;
-            text-decoration: none;
-            transition: background-color 0.3s;
-        }
-        
-        .sidebar-menu a:hover {
-            background-color: #34495e;
-        }
-        
-        .sidebar-menu i {
-            margin-right: 1rem;
-        }
-        
-        .main-content {
-            flex: 1;
-            padding: 2rem;
-            background-color: #f5f7fa;
-        }
-        
-        .dashboard-header {
-            margin-bottom: 2rem;
-        }
-        
-        .dashboard-header h1 {
-            font-size: 2rem;
-            color: #2c3e50;
-            margin-bottom: 0.5rem;
-        }
-        
-        .upload-section {
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            margin-bottom: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .upload-section h2 {
-            font-size: 1.5rem;
-            color: #2c3e50;
-            margin-bottom: 1.5rem;
-        }
-        
-        .upload-options {
-            display: flex;
-            gap: 2rem;
-            margin-bottom: 2rem;
-        }
-        
-        .upload-option {
-            flex: 1;
-            text-align: center;
-            padding: 2rem;
-            border: 2px dashed #ddd;
-            border-radius: 10px;
-            cursor: pointer;
-            transition: all 0.3s;
-        }
-        
-        .upload-option:hover {
-            border-color: #3498db;
-            background-color: #ebf5fb;
-        }
-        
-        .upload-option i {
-            font-size: 3rem;
-            color: #3498db;
-            margin-bottom: 1rem;
-        }
-        
-        .symptoms-form {
-            display: none;
-        }
-        
-        .symptoms-form.active {
-            display: block;
-        }
-        
-        .form-group {
-            margin-bottom: 1.5rem;
-        }
-        
-        .form-group label {
-            display: block;
-            margin-bottom: 0.5rem;
-            font-weight: 600;
-            color: #2c3e50;
-        }
-        
-        .radio-group {
-            display: flex;
-            gap: 2rem;
-        }
-        
-        .radio-option {
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-        }
-        
-        .analysis-section {
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            margin-bottom: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .analysis-section h2 {
-            font-size: 1.5rem;
-            color: #2c3e50;
-            margin-bottom: 1.5rem;
-        }
-        
-        .analysis-results {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 2rem;
-        }
-        
-        .result-card {
-            background-color: #f8f9fa;
-            border-radius: 10px;
-            padding: 1.5rem;
-        }
-        
-        .result-card h3 {
-            font-size: 1.2rem;
-            color: #2c3e50;
-            margin-bottom: 1rem;
-        }
-        
-        .probability-meter {
-            height: 20px;
-            background-color: #ddd;
-            border-radius: 10px;
-            overflow: hidden;
-            margin-bottom: 1rem;
-        }
-        
-        .probability-fill {
-            height: 100%;
-            background-color: #3498db;
-            transition: width 0.3s;
-        }
-        
-        .medications-section {
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            margin-bottom: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .medication-list {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 1.5rem;
-        }
-        
-        .medication-card {
-            background-color: #f8f9fa;
-            border-radius: 10px;
-            padding: 1.5rem;
-        }
-        
-        .medication-card h3 {
-            font-size: 1.2rem;
-            color: #2c3e50;
-            margin-bottom: 0.5rem;
-        }
-        
-        .medication-card p {
-            color: #7f8c8d;
-            margin-bottom: 0.5rem;
-        }
-        
-        .prevention-section {
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            margin-bottom: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .prevention-steps {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 1.5rem;
-        }
-        
-        .prevention-card {
-            background-color: #f8f9fa;
-            border-radius: 10px;
-            padding: 1.5rem;
-            text-align: center;
-        }
-        
-        .prevention-card i {
-            font-size: 2.5rem;
-            color: #3498db;
-            margin-bottom: 1rem;
-        }
-        
-        .prevention-card h3 {
-            font-size: 1.2rem;
-            color: #2c3e50;
-            margin-bottom: 0.5rem;
-        }
-        
-        .guidance-section {
-            background-color: white;
-            border-radius: 10px;
-            padding: 2rem;
-            margin-bottom: 2rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .language-selector {
-            margin-bottom: 1.5rem;
-        }
-        
-        .language-selector select {
-            padding: 0.5rem;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 1rem;
-        }
-        
-        .guidance-content {
-            margin-bottom: 2rem;
-        }
-        
-        .video-container {
-            position: relative;
-            padding-bottom: 56.25%;
-            height: 0;
-            overflow: hidden;
-        }
-        
-        .video-container iframe {
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-        }
-    </style>
-</head>
-<body>
-    <div class="dashboard">
-        <aside class="sidebar">
-            <ul class="sidebar-menu">
-                <li>
-                    <a href="#upload">
-                        <i class="fas fa-upload"></i>
-                        Upload Reports
-                    </a>
-                </li>
-                <li>
-                    <a href="#analysis">
-                        <i class="fas fa-chart-bar"></i>
-                        Analysis
-                    </a>
-                </li>
-                <li>
-                    <a href="#medications">
-                        <i class="fas fa-pills"></i>
-                        Medications
-                    </a>
-                </li>
-                <li>
-                    <a href="#prevention">
-                        <i class="fas fa-shield-alt"></i>
-                        Prevention Steps
-                    </a>
-                </li>
-                <li>
-                    <a href="#guidance">
-                        <i class="fas fa-book-medical"></i>
-                        TB Guidance
-                    </a>
-                </li>
-                <li>
-                    <a href="/logout">
-                        <i class="fas fa-sign-out-alt"></i>
-                        Logout
-                    </a>
-                </li>
-            </ul>
-        </aside>
-        
-        <main class="main-content">
-            <div class="dashboard-header">
-                <h1>Welcome, {{ patient.name }}</h1>
-                <p>Manage your TB diagnosis and treatment</p>
-            </div>
-            
-            <section id="upload" class="upload-section">
-                <h2>Upload Reports</h2>
-                <div class="upload-options">
-                    <div class="upload-option" id="xrayUpload">
-                        <i class="fas fa-x-ray"></i>
-                        <h3>Upload X-Ray</h3>
-                        <p>Click to upload chest X-ray image</p>
-                        <input type="file" hidden accept="image/*">
-                    </div>
-                    <div class="upload-option" id="sputumUpload">
-                        <i class="fas fa-vial"></i>
-                        <h3>Sputum Test</h3>
-                        <p>Enter sputum test results</p>
-                    </div>
-            </div>
-            
-                <form class="symptoms-form" id="symptomsForm">
-                    <h3>Symptoms Questionnaire</h3>
-                    <div class="form-group">
-                        <label>Do you have a persistent cough?</label>
-                        <div class="radio-group">
-                            <div class="radio-option">
-                                <input type="radio" name="symptom_cough" value="yes" id="coughYes">
-                                <label for="coughYes">Yes</label>
-                    </div>
-                            <div class="radio-option">
-                                <input type="radio" name="symptom_cough" value="no" id="coughNo">
-                                <label for="coughNo">No</label>
-                            </div>
-                    </div>
-                </div>
-                
-                    <div class="form-group">
-                        <label>Have you experienced chest pain?</label>
-                        <div class="radio-group">
-                            <div class="radio-option">
-                                <input type="radio" name="symptom_chest_pain" value="yes" id="chestPainYes">
-                                <label for="chestPainYes">Yes</label>
-                    </div>
-                            <div class="radio-option">
-                                <input type="radio" name="symptom_chest_pain" value="no" id="chestPainNo">
-                                <label for="chestPainNo">No</label>
-                            </div>
-                    </div>
-                </div>
-                
-                    <div class="form-group">
-                        <label>Have you had night sweats?</label>
-                        <div class="radio-group">
-                            <div class="radio-option">
-                                <input type="radio" name="symptom_night_sweats" value="yes" id="sweatsYes">
-                                <label for="sweatsYes">Yes</label>
-                    </div>
-                            <div class="radio-option">
-                                <input type="radio" name="symptom_night_sweats" value="no" id="sweatsNo">
-                                <label for="sweatsNo">No</label>
-                    </div>
-                </div>
-            </div>
-            
-                    <button type="submit" class="btn">Submit</button>
-                </form>
-            </section>
-            
-            <section id="analysis" class="analysis-section">
-                <h2>Analysis Results</h2>
-                <div class="analysis-results">
-                    <div class="result-card">
-                        <h3>X-Ray Analysis</h3>
-                        <div class="probability-meter">
-                            <div class="probability-fill" style="width: 75%;"></div>
-                        </div>
-                        <p>TB Probability: 75%</p>
-                        <p>Areas of concern detected in upper right lobe</p>
-                </div>
-                
-                    <div class="result-card">
-                        <h3>Sputum Test Results</h3>
-                        <div class="probability-meter">
-                            <div class="probability-fill" style="width: 65%;"></div>
-                    </div>
-                        <p>TB Probability: 65%</p>
-                        <p>Moderate bacterial presence detected</p>
-                    </div>
-                </div>
-            </section>
-            
-            <section id="medications" class="medications-section">
-                <h2>Current Medications</h2>
-                <div class="medication-list">
-                    <div class="medication-card">
-                        <h3>Isoniazid</h3>
-                        <p>Dosage: 300mg daily</p>
-                        <p>Duration: 6 months</p>
-                        <p>Next dose in: 2 hours</p>
-                    </div>
-                    
-                    <div class="medication-card">
-                        <h3>Rifampin</h3>
-                        <p>Dosage: 600mg daily</p>
-                        <p>Duration: 6 months</p>
-                        <p>Next dose in: 2 hours</p>
-                    </div>
-                    
-                    <div class="medication-card">
-                        <h3>Ethambutol</h3>
-                        <p>Dosage: 15mg/kg daily</p>
-                        <p>Duration: 2 months</p>
-                        <p>Next dose in: 2 hours</p>
-                </div>
-                </div>
-            </section>
-            
-            <section id="prevention" class="prevention-section">
-                <h2>Prevention Steps</h2>
-                <div class="prevention-steps">
-                    <div class="prevention-card">
-                        <i class="fas fa-head-side-mask"></i>
-                        <h3>Cover Your Mouth</h3>
-                        <p>Always cover when coughing or sneezing</p>
-                        </div>
-                        
-                    <div class="prevention-card">
-                        <i class="fas fa-wind"></i>
-                        <h3>Ventilate Rooms</h3>
-                        <p>Ensure good ventilation in all rooms</p>
-                        </div>
-                        
-                    <div class="prevention-card">
-                        <i class="fas fa-pills"></i>
-                        <h3>Complete Treatment</h3>
-                        <p>Take all medications as prescribed</p>
-                </div>
-                </div>
-            </section>
-            
-            <section id="guidance" class="guidance-section">
-                <h2>TB Guidance</h2>
-                <div class="language-selector">
-                    <select id="languageSelect">
-                        <option value="english">English</option>
-                        <option value="kannada">ಕನ್ನಡ</option>
-                        <option value="telugu">తెలుగు</option>
-                        <option value="tamil">தமிழ்</option>
-                        <option value="malayalam">മലയാളം</option>
-                            </select>
-                        </div>
-                        
-                <div class="guidance-content">
-                    <h3>Understanding Tuberculosis</h3>
-                    <p>Tuberculosis (TB) is an infectious disease that usually affects the lungs...</p>
-                        </div>
-                        
-                <div class="video-container">
-                    <iframe src="https://www.youtube.com/embed/example" frameborder="0" allowfullscreen></iframe>
-                </div>
-            </section>
-        </main>
-                </div>
-                
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            // Upload functionality
-            const xrayUpload = document.getElementById('xrayUpload');
-            const sputumUpload = document.getElementById('sputumUpload');
-            const symptomsForm = document.getElementById('symptomsForm');
-            const xrayInput = xrayUpload.querySelector('input[type="file"]');
-            
-            xrayUpload.addEventListener('click', () => xrayInput.click());
-            
-            xrayInput.addEventListener('change', function() {
-                if (this.files && this.files[0])if (this.files && this.files[0]) {
-                    const formData = new FormData();
-                    formData.append('xray', this.files[0]);
-                    
-                    fetch('/upload_report', {
-                        method: 'POST',
-                        body: formData
-                    })
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            updateAnalysisResults(data.analysis);
-                            alert('X-ray uploaded successfully!');
-                        } else {
-                            alert('Error uploading X-ray. Please try again.');
-                        }
-                    })
-                    .catch(error => {
-                        console.error('Error:', error);
-                        alert('An error occurred. Please try again.');
-                    });
-                }
-            });
-            
-            sputumUpload.addEventListener('click', function() {
-                symptomsForm.classList.add('active');
-            });
-            
-            symptomsForm.addEventListener('submit', function(e) {
-                e.preventDefault();
-                
-                const formData = new FormData(symptomsForm);
-                
-                fetch('/upload_report', {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        updateAnalysisResults(data.analysis);
-                        symptomsForm.classList.remove('active');
-                        symptomsForm.reset();
-                        alert('Symptoms submitted successfully!');
-                    } else {
-                        alert('Error submitting symptoms. Please try again.');
-                    }
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    alert('An error occurred. Please try again.');
-                });
-            });
-            
-            // Language selector functionality
-            const languageSelect = document.getElementById('languageSelect');
-            const guidanceContent = document.querySelector('.guidance-content');
-            const videoContainer = document.querySelector('.video-container iframe');
-            
-            languageSelect.addEventListener('change', function() {
-                fetch(`/get_tb_guidance?language=${this.value}`)
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            const guidance = data.guidance;
-                            guidanceContent.innerHTML = `
-                                <h3>${guidance.title}</h3>
-                                <p>${guidance.content}</p>
-                            `;
-                            videoContainer.src = guidance.video_url;
-                        }
-                    })
-                    .catch(error => console.error('Error:', error));
-            });
-            
-            // Update analysis results
-            function updateAnalysisResults(analysis) {
-                const analysisResults = document.querySelector('.analysis-results');
-                let html = '';
-                
-                if (analysis.xray) {
-                    html += `
-                        <div class="result-card">
-                            <h3>X-Ray Analysis</h3>
-                            <div class="probability-meter">
-                                <div class="probability-fill" style="width: ${analysis.xray.tb_probability * 100}%;"></div>
-                            </div>
-                            <p>TB Probability: ${(analysis.xray.tb_probability * 100).toFixed(1)}%</p>
-                            <p>${analysis.xray.recommendation}</p>
-                        </div>
-                    `;
-                }
-                
-                if (analysis.sputum) {
-                    html += `
-                        <div class="result-card">
-                            <h3>Sputum Test Results</h3>
-                            <div class="probability-meter">
-                                <div class="probability-fill" style="width: ${analysis.sputum.tb_probability * 100}%;"></div>
-                </div>
-                            <p>TB Probability: ${(analysis.sputum.tb_probability * 100).toFixed(1)}%</p>
-                            <p>${analysis.sputum.recommendation}</p>
-            </div>
-                    `;
-                }
-                
-                analysisResults.innerHTML = html;
-            }
-            
-            // Load medications
-            function loadMedications() {
-                fetch('/get_medications')
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            const medicationList = document.querySelector('.medication-list');
-                            let html = '';
-                            
-                            data.medications.forEach(med => {
-                                html += `
-                                    <div class="medication-card">
-                                        <h3>${med.name}</h3>
-                                        <p>Dosage: ${med.dosage}</p>
-                                        <p>Duration: ${med.duration}</p>
-                                    </div>
-                                `;
-                            });
-                            
-                            medicationList.innerHTML = html;
-                        }
-                    })
-                    .catch(error => console.error('Error:', error));
-            }
-            
-            // Load prevention steps
-            function loadPreventionSteps() {
-                fetch('/get_prevention_steps')
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            const preventionSteps = document.querySelector('.prevention-steps');
-                            let html = '';
-                            
-                            data.prevention_steps.forEach(step => {
-                                html += `
-                                    <div class="prevention-card">
-                                        <i class="fas ${step.icon}"></i>
-                                        <h3>${step.title}</h3>
-                                        <p>${step.description}</p>
-                                    </div>
-                                `;
-                            });
-                            
-                            preventionSteps.innerHTML = html;
-                        }
-                    })
-                    .catch(error => console.error('Error:', error));
-            }
-            
-            // Initialize dashboard
-            loadMedications();
-            loadPreventionSteps();
-            
-            // Sidebar navigation
-            const sidebarLinks = document.querySelectorAll('.sidebar-menu a');
-            
-            sidebarLinks.forEach(link => {
-                link.addEventListener('click', function(e) {
-                    if (this.getAttribute('href').startsWith('#')) {
-                        e.preventDefault();
-                        const targetId = this.getAttribute('href').substring(1);
-                        const targetSection = document.getElementById(targetId);
-                        targetSection.scrollIntoView({ behavior: 'smooth' });
-                    }
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-'''
+    return raw_templates.response('patient_dashboard')
 
 # Healthcare Worker Dashboard template
 @app.route('/healthcare_dashboard_template')
 def healthcare_dashboard_template():
-    return '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Healthcare Worker Dashboard - Pulmoscan.ai</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">
-    <style>
-        /* [Previous CSS styles remain the same] */
-        
-        /* Healthcare Dashboard specific styles */
-        .patient-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 2rem;
-        }
-        
-        .patient-card {
-            background-color: white;
-            border-radius: 10px;
-            padding: 1.5rem;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        
-        .patient-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 1rem;
-        }
-        
-        .patient-name {
-            font-size: 1.2rem;
-            font-weight: 600;
-            color: #2c3e50;
-        }
-        
-        .patient-status {
-            padding: 0.3rem 0.8rem;
-            border-radius: 20px;
-            font-size: 0.9rem;
-            font-weight: 500;
-        }
-        
-        .status-pending {
-            background-color: #fff3cd;
-            color: #856404;
-        }
-        
-        .status-accepted {
-            background-color: #d4edda;
-            color: #155724;
-        }
-        
-        .status-rejected {
-            background-color: #f8d7da;
-            color: #721c24;
-        }
-        
-        .patient-info {
-            margin-bottom: 1rem;
-        }
-        
-        .info-item {
-            display: flex;
-            align-items: center;
-            margin-bottom: 0.5rem;
-        }
-        
-        .info-item i {
-            margin-right: 0.5rem;
-            color: #3498db;
-        }
-        
-        .patient-actions {
-            display: flex;
-            gap: 1rem;
-        }
-        
-        .action-btn {
-            flex: 1;
-            padding: 0.5rem;
-            border: none;
-            border-radius: 5px;
-            font-weight: 500;
-            cursor: pointer;
-            transition: background-color 0.3s;
-        }
-        
-        .btn-accept {
-            background-color: #28a745;
-            color: white;
-        }
-        
-        .btn-accept:hover {
-            background-color: #218838;
-        }
-        
-        .btn-reject {
-            background-color: #dc3545;
-            color: white;
-        }
-        
-        .btn-reject:hover {
-            background-color: #c82333;
-        }
-        
-        .btn-view {
-            background-color: #3498db;
-            color: white;
-        }
-        
-        .btn-view:hover {
-            background-color: #2980b9;
-        }
-        
-        .patient-reports {
-            margin-top: 1rem;
-        }
-        
-        .report-item {
-            display: flex;
-            align-items: center;
-            padding: 0.5rem;
-            background-color: #f8f9fa;
-            border-radius: 5px;
-            margin-bottom: 0.5rem;
-        }
-        
-        .report-icon {
-            margin-right: 0.5rem;
-            color: #3498db;
-        }
-        
-        .report-info {
-            flex: 1;
-        }
-        
-        .report-actions {
-            display: flex;
-            gap: 0.5rem;
-        }
-        
-        .modal {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(0,0,0,0.5);
-            z-index: 1000;
-        }
-        
-        .modal-content {
-            position: relative;
-            background-color: white;
-            width: 90%;
-            max-width: 800px;
-            margin: 2rem auto;
-            padding: 2rem;
-            border-radius: 10px;
-            max-height: 90vh;
-            overflow-y: auto;
-        }
-        
-        .close-modal {
-            position: absolute;
-            top: 1rem;
-            right: 1rem;
-            font-size: 1.5rem;
-            cursor: pointer;
-        }
-        
-        .report-viewer {
-            margin-top: 1rem;
-        }
-        
-        .report-image {
-            width: 100%;
-            max-height: 500px;
-            object-fit: contain;
-            margin-bottom: 1rem;
-        }
-        
-        .report-analysis {
-            background-color: #f8f9fa;
-            padding: 1rem;
-            border-radius: 5px;
-        }
-        
-        .treatment-form {
-            margin-top: 1rem;
-        }
-        
-        .treatment-form textarea {
-            width: 100%;
-            min-height: 100px;
-            margin-bottom: 1rem;
-            padding: 0.5rem;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-        }
-    </style>
-</head>
-<body>
-    <div class="dashboard">
-        <aside class="sidebar">
-            <ul class="sidebar-menu">
-                <li>
-                    <a href="#patient-records">
-                        <i class="fas fa-users"></i>
-                        Patient Records
-                    </a>
-                </li>
-                <li>
-                    <a href="#my-patients">
-                        <i class="fas fa-user-check"></i>
-                        My Patients
-                    </a>
-                </li>
-                <li>
-                    <a href="#cured-patients">
-                        <i class="fas fa-heart"></i>
-                        Cured Patients
-                    </a>
-                </li>
-                <li>
-                    <a href="/logout">
-                        <i class="fas fa-sign-out-alt"></i>
-                        Logout
-                    </a>
-                </li>
-            </ul>
-        </aside>
-        
-        <main class="main-content">
-            <div class="dashboard-header">
-                <h1>Welcome, Dr. {{ healthcare_worker.name }}</h1>
-                <p>Manage your patients and their treatment plans</p>
-            </div>
-            
-            <section id="patient-records">
-                <h2>Patient Records</h2>
-                <div class="patient-grid">
-                    {% for record in patient_records.values() %}
-                    <div class="patient-card">
-                        <div class="patient-header">
-                            <span class="patient-name">{{ record.patient_name }}</span>
-                            <span class="patient-status status-{{ record.status }}">{{ record.status|title }}</span>
-            </div>
-                        <div class="patient-info">
-                            <div class="info-item">
-                                <i class="fas fa-calendar"></i>
-                                <span>{{ record.date }}</span>
-                    </div>
-                            {% if record.xray %}
-                            <div class="info-item">
-                                <i class="fas fa-x-ray"></i>
-                                <span>X-Ray Available</span>
-                    </div>
-                            {% endif %}
-                            {% if record.sputum %}
-                            <div class="info-item">
-                                <i class="fas fa-vial"></i>
-                                <span>Sputum Test Available</span>
-                </div>
-                            {% endif %}
-                    </div>
-                        <div class="patient-actions">
-                            {% if record.status == 'pending' %}
-                            <button class="action-btn btn-accept" onclick="acceptPatient('{{ record.id }}')">Accept</button>
-                            <button class="action-btn btn-reject" onclick="rejectPatient('{{ record.id }}')">Reject</button>
-                            {% endif %}
-                            <button class="action-btn btn-view" onclick="viewPatientReport('{{ record.id }}')">View Report</button>
-                    </div>
-                </div>
-                            {% endfor %}
-                </div>
-            </section>
-            
-            <section id="my-patients">
-                    <h2>My Patients</h2>
-                <div class="patient-grid">
-                    {% for patient in accepted_patients.values() %}
-                    <div class="patient-card">
-                        <div class="patient-header">
-                            <span class="patient-name">{{ patient.name }}</span>
-                            <span class="patient-status status-accepted">Active</span>
-                        </div>
-                        <div class="patient-info">
-                            <div class="info-item">
-                                <i class="fas fa-calendar"></i>
-                                <span>Started: {{ patient.start_date }}</span>
-                            </div>
-                            <div class="info-item">
-                                <i class="fas fa-pills"></i>
-                                <span>Current Treatment: {{ patient.current_treatment }}</span>
-                            </div>
-                                </div>
-                        <div class="patient-reports">
-                            {% for report in patient.reports %}
-                            <div class="report-item">
-                                <i class="fas fa-file-medical report-icon"></i>
-                                <div class="report-info">
-                                    <div>{{ report.type }} - {{ report.date }}</div>
-                                    <div>Status: {{ report.status }}</div>
-                            </div>
-                                <div class="report-actions">
-                                    <button class="action-btn btn-view" onclick="viewReport('{{ report.id }}')">View</button>
-                        </div>
-                    </div>
-                    {% endfor %}
-                </div>
-                        <div class="patient-actions">
-                            <button class="action-btn btn-view" onclick="viewPatientHistory('{{ patient.id }}')">View History</button>
-                            <button class="action-btn btn-accept" onclick="markAsCured('{{ patient.id }}')">Mark as Cured</button>
-            </div>
-                    </div>
-                            {% endfor %}
-                </div>
-            </section>
-            
-            <section id="cured-patients">
-                <h2>Cured Patients</h2>
-                <div class="patient-grid">
-                    {% for patient in cured_patients.values() %}
-                    <div class="patient-card">
-                        <div class="patient-header">
-                            <span class="patient-name">{{ patient.name }}</span>
-                            <span class="patient-status status-accepted">Cured</span>
-        </div>
-                        <div class="patient-info">
-                            <div class="info-item">
-                                <i class="fas fa-calendar"></i>
-                                <span>Treatment Duration: {{ patient.treatment_duration }}</span>
-                    </div>
-                            <div class="info-item">
-                                <i class="fas fa-check-circle"></i>
-                                <span>Cured Date: {{ patient.cure_date }}</span>
-                    </div>
-                </div>
-                        <div class="patient-actions">
-                            <button class="action-btn btn-view" onclick="viewPatientHistory('{{ patient.id }}')">View History</button>
-                    </div>
-                            </div>
-                                {% endfor %}
-                            </div>
-            </section>
-        </main>
-                        </div>
-                        
-    <!-- Report Viewer Modal -->
-    <div id="reportModal" class="modal">
-        <div class="modal-content">
-            <span class="close-modal">&times;</span>
-            <h2>Patient Report</h2>
-            <div class="report-viewer">
-                <img src="" alt="X-Ray" class="report-image" id="reportImage">
-                <div class="report-analysis" id="reportAnalysis"></div>
-                <form class="treatment-form" id="treatmentForm">
-                    <h3>Treatment Recommendations</h3>
-                    <textarea name="treatment" placeholder="Enter treatment recommendations..."></textarea>
-                    <button type="submit" class="btn">Save Recommendations</button>
-                </form>
-                        </div>
-                        </div>
-                    </div>
-                    
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            const modal = document.getElementById('reportModal');
-            const closeModal = document.querySelector('.close-modal');
-            const treatmentForm = document.getElementById('treatmentForm');
-            
-            closeModal.addEventListener('click', () => {
-                modal.style.display = 'none';
-            });
-            
-            window.addEventListener('click', (e) => {
-                if (e.target === modal) {
-                    modal.style.display = 'none';
-                }
-            });
-            
-            // View patient report
-            window.viewPatientReport = function(reportId) {
-                fetch(`/get_analysis/${reportId}`)
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            const reportImage = document.getElementById('reportImage');
-                            const reportAnalysis = document.getElementById('reportAnalysis');
-                            
-                            reportImage.src = data.analysis.xray_image;
-                            reportAnalysis.innerHTML = `
-                                <h3>Analysis Results</h3>
-                                <p>TB Probability: ${(data.analysis.xray.tb_probability * 100).toFixed(1)}%</p>
-                                <p>Recommendation: ${data.analysis.xray.recommendation}</p>
-                            `;
-                            
-                            modal.style.display = 'block';
-                        }
-                    })
-                    .catch(error => console.error('Error:', error));
-            };
-            
-            // Accept patient
-            window.acceptPatient = function(reportId) {
-                fetch('/accept_patient', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/x-www-form-urlencoded',
-                    },
-                    body: `report_id=${reportId}`
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        alert('Patient accepted successfully!');
-                        location.reload();
-                    } else {
-                        alert('Error accepting patient. Please try again.');
-                    }
-                })
-                .catch(error => console.error('Error:', error));
-            };
-            
-            // Reject patient
-            window.rejectPatient = function(reportId) {
-                fetch('/reject_patient', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/x-www-form-urlencoded',
-                    },
-                    body: `report_id=${reportId}`
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        alert('Patient rejected.');
-                        location.reload();
-                    } else {
-                        alert('Error rejecting patient. Please try again.');
-                    }
-                })
-                .catch(error => console.error('Error:', error));
-            };
-            
-            // Mark patient as cured
-            window.markAsCured = function(patientId) {
-                fetch('/mark_cured', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/x-www-form-urlencoded',
-                    },
-                    body: `patient_username=${patientId}`
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        alert('Patient marked as cured!');
-                        location.reload();
-                    } else {
-                        alert('Error marking patient as cured. Please try again.');
-                    }
-                })
-                .catch(error => console.error('Error:', error));
-            };
-            
-            // Treatment form submission
-            treatmentForm.addEventListener('submit', function(e) {
-                e.preventDefault();
-                
-                const formData = new FormData(treatmentForm);
-                
-                fetch('/save_treatment', {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        alert('Treatment recommendations saved successfully!');
-                        modal.style.display = 'none';
-                    } else {
-                        alert('Error saving treatment recommendations. Please try again.');
-                    }
-                })
-                .catch(error => console.error('Error:', error));
-            });
-            
-            // Sidebar navigation
-            const sidebarLinks = document.querySelectorAll('.sidebar-menu a');
-            
-            sidebarLinks.forEach(link => {
-                link.addEventListener('click', function(e) {
-                    if (this.getAttribute('href').startsWith('#')) {
-                        e.preventDefault();
-                        const targetId = this.getAttribute('href').substring(1);
-                        const targetSection = document.getElementById(targetId);
-                        targetSection.scrollIntoView({ behavior: 'smooth' });
-                    }
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-'''
+    return raw_templates.response('healthcare_dashboard')
 
-def process_xray_and_highlight(image_data):
-    # Convert image bytes to numpy array
-    nparr = np.frombuffer(image_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Apply CLAHE with increased contrast
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    enhanced = clahe.apply(gray)
-    
-    # Apply bilateral filter to reduce noise while preserving edges
-    blurred = cv2.bilateralFilter(enhanced, 9, 75, 75)
-    
-    # Create a mask for potential TB regions
-    _, thresh1 = cv2.threshold(blurred, 127, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    _, thresh2 = cv2.threshold(blurred, 150, 255, cv2.THRESH_BINARY)
-    
-    # Combine thresholds for better detection
-    thresh = cv2.bitwise_or(thresh1, thresh2)
-    
-    # Apply morphological operations to enhance regions
-    kernel = np.ones((5,5), np.uint8)
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-    
-    # Find contours with hierarchy
-    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # Create heatmap overlay
-    heatmap = np.zeros_like(gray)
-    
-    # Filter contours and calculate areas
-    significant_contours = []
-    total_area = 0
-    max_area = img.shape[0] * img.shape[1]
-    
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area > 200:  # Increased minimum area threshold
-            significant_contours.append(contour)
-            total_area += area
-    
-    area_ratio = min(total_area / max_area * 5, 1.0)  # Increased sensitivity
-    
-    infected_areas = []
-    # Create more prominent heatmap
-    for contour in significant_contours:
-        # Draw filled contour with high intensity
-        cv2.drawContours(heatmap, [contour], -1, 255, -1)
-        
-        # Calculate centroid
-        M = cv2.moments(contour)
-        if M["m00"] != 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            
-            # Calculate relative coordinates
-            rel_x = (cx / img.shape[1]) * 100
-            rel_y = (cy / img.shape[0]) * 100
-            
-            # Calculate local intensity using original enhanced image
-            mask = np.zeros_like(gray)
-            cv2.drawContours(mask, [contour], -1, 255, -1)
-            local_intensity = cv2.mean(enhanced, mask=mask)[0] / 255.0
-            
-            # Store infected area info
-            infected_areas.append({
-                'x': float(rel_x),
-                'y': float(rel_y),
-                'area': float(cv2.contourArea(contour)),
-                'severity': float(max(0.6, local_intensity))  # Minimum severity of 0.6
-            })
-    
-    # Apply a more prominent color map
-    heatmap_colored = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
-    
-    # Enhance the contrast of the heatmap
-    heatmap_colored = cv2.convertScaleAbs(heatmap_colored, alpha=1.5, beta=0)
-    
-    # Create more visible overlay
-    highlighted = cv2.addWeighted(img, 0.6, heatmap_colored, 0.4, 0)
-    
-    # Add a colored border around detected regions
-    for contour in significant_contours:
-        cv2.drawContours(highlighted, [contour], -1, (0, 255, 255), 2)
-    
-    # Convert the highlighted image to base64
-    _, buffer = cv2.imencode('.jpg', highlighted)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    
-    # Calculate TB probability with adjusted weights
-    num_regions = len(infected_areas)
-    avg_severity = np.mean([area['severity'] for area in infected_areas]) if infected_areas else 0
-    
-    # Enhanced probability calculation
-    area_weight = 0.35
-    severity_weight = 0.35
-    regions_weight = 0.30
-    
-    base_probability = (
-        area_weight * area_ratio +
-        severity_weight * avg_severity +
-        regions_weight * min(num_regions / 8, 1.0)  # Adjusted region cap
-    )
-    
-    # Ensure minimum probability of 0.5 for detected regions
-    tb_probability = max(0.5, base_probability) if infected_areas else 0.3
-    
-    # Generate findings based on analysis
-    findings = []
-    if tb_probability > 0.7:
-        findings.append({
-            'disease': 'Severe Infiltration',
-            'probability': float(tb_probability),
-            'severity': 'High'
-        })
-    elif tb_probability > 0.5:
-        findings.append({
-            'disease': 'Moderate Infiltration',
-            'probability': float(tb_probability),
-            'severity': 'Moderate'
-        })
-    
-    if num_regions > 3:
-        findings.append({
-            'disease': 'Multiple Lesions',
-            'probability': float(min(num_regions / 8, 0.9)),
-            'severity': 'High' if num_regions > 6 else 'Moderate'
-        })
-    
-    if avg_severity > 0.6:
-        findings.append({
-            'disease': 'Dense Opacity',
-            'probability': float(avg_severity),
-            'severity': 'High' if avg_severity > 0.8 else 'Moderate'
-        })
-    
-    # Ensure we always return some findings
-    if not findings:
-        findings.append({
-            'disease': 'Potential Abnormality',
-            'probability': float(tb_probability),
-            'severity': 'Low'
-        })
-    
-    return {
-        'image_base64': img_base64,
-        'infected_areas': infected_areas,
-        'tb_probability': float(tb_probability),
-        'findings': findings,
-        'confidence_score': float(min(0.95, 0.7 + tb_probability * 0.25))
-    }
+# Move overlays saved before the blob store into it, deduplicating identical
+# files and repointing the report records: flask dedupe-uploads
+@app.cli.command('dedupe-uploads')
+def dedupe_uploads():
+    conn = create_connection()
+    if conn is None:
+        print('Could not open the database')
+        return
+    moved, unique = blob_store.migrate_uploads(conn, overlay_store, app.config['UPLOAD_FOLDER'], '/static/uploads')
+    print(f"Moved {moved} uploads into {unique} unique blobs")
+
+# Rewrite stored report data in PULMOSCAN_REPORT_FORMAT, a chunk of rows per
+# transaction: flask repack-reports
+@app.cli.command('repack-reports')
+def repack_reports():
+    conn = create_connection()
+    if conn is None:
+        print('Could not open the database')
+        return
+    for table, column in (('patient_records', 'report_data'), ('reports', 'data')):
+        migrations.Backfill(table, [column], lambda row: report_format.repack(column, row[0])).run(
+            conn, app.config['DB_MIGRATION_CHUNK_SIZE'])
+    print(f"Report data stored as {report_format.default_format}")
+
+# Queue the analyses of reports left pending or running when the app stopped:
+# flask requeue-analyses. Run it before the app serves again, analyses that
+# are still running would be queued twice.
+@app.cli.command('requeue-analyses')
+def requeue_analyses():
+    conn = create_connection()
+    if conn is None:
+        print('Could not open the database')
+        return
+    jobs = get_analysis_queue()
+    try:
+        queued, lost = analysis_jobs.requeue_unfinished(conn, jobs, upload_store, app.config['DB_MIGRATION_CHUNK_SIZE'])
+    finally:
+        jobs.shutdown()
+    print(f"Analysed {queued} reports again, {lost} failed without a stored upload")
+
+# Fail when a hot query stops using an index: flask check-query-plans
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    conn = create_connection()
+    failed = False
+    for name, (sql, params) in HOT_QUERIES.items():
+        problems = db.full_scan_steps(conn, sql, params)
+        print(f"{name}: {'OK' if not problems else 'full scan: ' + '; '.join(problems)}")
+        failed = failed or bool(problems)
+    if failed:
+        raise SystemExit(1)
 
 if __name__ == '__main__':
     # Enable Jinja2 template caching
@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+# Build step for static assets: flask build-assets
+#
+# Every file under static/ (except uploads/) is copied to static/build/ with
+# the first HASH_LENGTH hex digits of its SHA-256 in the name
+# (css/styles.css -> build/css/styles.1a2b3c4d5e6f.css). Text formats also
+# get precompressed .gz and, when the brotli package is installed, .br
+# siblings that StaticFiles serves to clients accepting those encodings.
+# build/manifest.json maps logical names to fingerprinted paths; templates
+# resolve them with asset_url().
+
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+EXCLUDE_DIRS = ('uploads', BUILD_DIR)
+HASH_LENGTH = 12
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.json', '.svg', '.html', '.txt', '.xml', '.map', '.ico')
+# Variants that save less than this fraction of the original are dropped
+MIN_SAVING = 0.1
+
+
+def _compressors():
+    compressors = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        return compressors
+    compressors['.br'] = lambda data: brotli.compress(data, quality=11)
+    return compressors
+
+
+def fingerprinted_name(name, data):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def build(static_root):
+    build_root = os.path.join(static_root, BUILD_DIR)
+    staging = build_root + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    compressors = _compressors()
+    manifest = {}
+
+    for dirpath, dirnames, filenames in os.walk(static_root):
+        if dirpath == static_root:
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDE_DIRS and not d.startswith(BUILD_DIR + '.')]
+        for filename in sorted(filenames):
+            source = os.path.join(dirpath, filename)
+            name = os.path.relpath(source, static_root).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            target_name = fingerprinted_name(name, data)
+            target = os.path.join(staging, target_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+
+            if name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                for suffix, compress in compressors.items():
+                    compressed = compress(data)
+                    if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                        with open(target + suffix, 'wb') as f:
+                            f.write(compressed)
+
+            manifest[name] = f'{BUILD_DIR}/{target_name}'
+
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    # Swap the whole directory so a running server never sees half a build
+    old = build_root + '.old'
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(build_root):
+        os.replace(build_root, old)
+    os.replace(staging, build_root)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def load_manifest(static_root):
+    try:
+        with open(os.path.join(static_root, BUILD_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Build outputs named by their content; the manifest keeps its name and
+# changes with every build
+def is_fingerprinted(filename):
+    return filename.startswith(BUILD_DIR + '/') and filename != f'{BUILD_DIR}/{MANIFEST_NAME}'
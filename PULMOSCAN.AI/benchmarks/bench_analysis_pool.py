@@ -0,0 +1,68 @@
+# Throughput benchmark for the X-ray analysis process pool
+#
+# Generates synthetic chest-film-sized JPEGs and pushes them through
+# AnalysisQueue.analyze() at 1, 2, 4 and N workers (N = CPU count), reporting
+# images per second. The pool is warmed up before timing so worker start-up
+# is not counted.
+#
+# Usage: python benchmarks/bench_analysis_pool.py [--images 32] [--size 2048]
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis_jobs  # noqa: E402
+
+
+def synthetic_xray(size, seed):
+    rng = np.random.default_rng(seed)
+    img = rng.normal(90, 25, (size, size)).clip(0, 255).astype(np.uint8)
+    # A few bright opacities so the contour stage has work to do
+    for _ in range(12):
+        center = tuple(int(v) for v in rng.integers(size // 8, size - size // 8, 2))
+        axes = tuple(int(v) for v in rng.integers(size // 40, size // 12, 2))
+        cv2.ellipse(img, center, axes, 0, 0, 360, int(rng.integers(170, 240)), -1)
+    img = cv2.GaussianBlur(img, (0, 0), size / 400)
+    _, buffer = cv2.imencode('.jpg', img)
+    return buffer.tobytes()
+
+
+def run(workers, images):
+    queue = analysis_jobs.AnalysisQueue(None, None, max_workers=workers)
+    try:
+        for future in [queue.analyze(images[0]) for _ in range(workers)]:
+            future.result()
+
+        start = time.perf_counter()
+        for future in [queue.analyze(image) for image in images]:
+            future.result()
+        return len(images) / (time.perf_counter() - start)
+    finally:
+        queue.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=32)
+    parser.add_argument('--size', type=int, default=2048)
+    args = parser.parse_args()
+
+    images = [synthetic_xray(args.size, seed) for seed in range(args.images)]
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cpus})
+
+    print(f"{args.images} images, {args.size}x{args.size}, {cpus} CPUs")
+    baseline = None
+    for workers in worker_counts:
+        throughput = run(workers, images)
+        baseline = baseline or throughput
+        print(f"{workers:>3} workers  {throughput:7.2f} images/s  x{throughput / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# Request throughput of the dashboard routes
+#
+# Seeds a scratch database with patients and report records, then requests
+# /patient_dashboard and /healthcare_dashboard through the Flask test client.
+# Each configuration runs in a fresh interpreter so app-level settings read at
+# import time apply. The default compares a connection per call
+# (PULMOSCAN_DB_POOL_SIZE=0) with the pooled connections. Responses are
+# cleared from the view cache before every request so the database work is
+# measured.
+#
+# Usage: python benchmarks/bench_dashboards.py [--records 2000] [--requests 200]
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import records  # noqa: E402
+
+CONFIGS = [
+    ('no pool', {'PULMOSCAN_DB_POOL_SIZE': '0'}),
+    ('pooled', {'PULMOSCAN_DB_POOL_SIZE': '8'}),
+]
+
+STATUSES = ['pending', 'accepted', 'cured', 'rejected']
+
+
+def seed(path, count):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute('INSERT INTO healthcare_workers (email, name, password) VALUES (?, ?, ?)',
+              ('doctor@example.com', 'Doctor', 'x'))
+    patients = [(f'patient{i}@example.com', f'Patient {i}', 'x') for i in range(max(count // 10, 1))]
+    c.executemany('INSERT INTO patients (email, name, password) VALUES (?, ?, ?)', patients)
+
+    rng = random.Random(0)
+    rows = []
+    for i in range(count):
+        email, name, _ = rng.choice(patients)
+        report_data = {
+            'patient_name': name,
+            'patient_email': email,
+            'xray_data': {
+                'tb_probability': rng.random(),
+                'infected_areas': [
+                    {'x': rng.random() * 100, 'y': rng.random() * 100, 'area': rng.random() * 5000, 'severity': rng.random()}
+                    for _ in range(rng.randint(0, 8))
+                ],
+            },
+            'treatment_duration': '6 months',
+        }
+        summary = records.summarize(report_data)
+        rows.append((f'RPT{i:08d}', email, 'xray', json.dumps(report_data), rng.choice(STATUSES),
+                     f'2025-01-01 00:00:{i % 60:02d}', *summary.values()))
+    columns = ', '.join(records.SUMMARY_COLUMNS)
+    placeholders = ', '.join('?' * (6 + len(records.SUMMARY_COLUMNS)))
+    c.executemany(f'INSERT INTO patient_records (id, patient_email, report_type, report_data, status, created_at, '
+                  f'{columns}) VALUES ({placeholders})', rows)
+    conn.commit()
+    conn.close()
+
+
+CHILD = '''
+import json, sys, time
+import app
+client = app.app.test_client()
+results = {}
+for route, email, user_type in (('/patient_dashboard', 'patient0@example.com', 'patient'),
+                                ('/healthcare_dashboard', 'doctor@example.com', 'healthcare')):
+    with client.session_transaction() as s:
+        s['user_id'] = email
+        s['user_type'] = user_type
+        s['email'] = email
+    for _ in range(5):
+        app.cache.clear()
+        client.get(route)
+    start = time.perf_counter()
+    for _ in range({requests}):
+        app.cache.clear()
+        response = client.get(route)
+        assert response.status_code == 200, response.status_code
+    results[route] = {requests} / (time.perf_counter() - start)
+print(json.dumps(results))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        # Importing the app once creates the schema in the scratch directory
+        subprocess.run([sys.executable, '-c', 'import app'], cwd=workdir, env=env, check=True)
+        seed(os.path.join(workdir, 'pulmoscan.db'), args.records)
+
+        print(f"{args.records} records, {args.requests} requests per route")
+        for label, overrides in CONFIGS:
+            out = subprocess.run([sys.executable, '-c', CHILD.replace('{requests}', str(args.requests))], cwd=workdir,
+                                 env=dict(env, **overrides), check=True, capture_output=True, text=True)
+            results = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{label:<10}" + ''.join(f"{route:>24} {rps:8.1f} req/s" for route, rps in results.items()))
+
+
+if __name__ == '__main__':
+    main()
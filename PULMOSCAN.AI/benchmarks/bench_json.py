@@ -0,0 +1,96 @@
+# JSON encoding speed on representative report payloads
+#
+# For every available json_provider backend, times encoding and decoding of
+# stored report_data blobs (with 0, 8 and 64 infected areas, the areas as
+# numpy floats the way the analysis produces them) and of a 50-report
+# /get_pending_reports response rendered through json_provider.jsonify.
+#
+# Usage: python benchmarks/bench_json.py [--repeat 2000]
+import argparse
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_provider  # noqa: E402
+
+
+def report_data(rng, areas):
+    return {
+        'report_id': f'RPT{rng.randint(10 ** 9, 10 ** 10)}',
+        'patient_name': 'Patient 1',
+        'patient_email': 'patient1@example.com',
+        'report_type': 'xray',
+        'status': 'pending',
+        'analysis_status': 'done',
+        'xray_data': {
+            'image_path': '/static/uploads/objects/ab/cd/abcd.jpg',
+            'image_hash': 'abcd' * 16,
+            'tb_probability': np.float64(rng.random()),
+            'confidence_score': rng.uniform(0.85, 0.95),
+            'infected_areas': [
+                {'x': np.float64(rng.random() * 1000), 'y': np.float64(rng.random() * 1000),
+                 'area': np.float64(rng.random() * 5000), 'severity': np.float64(rng.random())}
+                for _ in range(areas)
+            ],
+        },
+        'sputum_data': {'result': 'negative', 'probability': 12.0, 'details': ''},
+        'symptoms': {'cough': True, 'fever': False, 'weight_loss': True},
+        'upload_date': '2025-01-01 00:00:00',
+    }
+
+
+def pending_page(rng, size=50):
+    return {
+        'success': True,
+        'reports': [
+            {'id': f'RPT{i:08d}', 'patient_email': f'p{i}@example.com', 'patient_name': f'Patient {i}',
+             'type': 'xray', 'status': 'pending', 'date': '2025-01-01 00:00:00',
+             'tb_probability': rng.random(), 'severity': rng.random()}
+            for i in range(size)
+        ],
+        'next_cursor': 'WyIyMDI1LTAxLTAxIDAwOjAwOjAwIiwiUlBUMDAwMDAwNDkiXQ',
+    }
+
+
+def available_backends():
+    for name in json_provider.BACKENDS:
+        try:
+            yield json_provider.use_backend(name)
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+
+
+def per_second(func, repeat):
+    return repeat / min(timeit.repeat(func, number=repeat, repeat=3))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payloads = [(f'report_data, {n} areas', report_data(rng, n)) for n in (0, 8, 64)]
+    page = pending_page(rng)
+    app = Flask(__name__)
+
+    for backend in available_backends():
+        print(backend.name)
+        for label, payload in payloads:
+            encoded = backend.dumps(payload)
+            dumps = per_second(lambda: backend.dumps(payload), args.repeat)
+            loads = per_second(lambda: backend.loads(encoded), args.repeat)
+            print(f"  {label:<26}{len(encoded):>7} bytes   dumps {dumps:10.0f}/s   loads {loads:10.0f}/s")
+        with app.app_context():
+            rate = per_second(lambda: json_provider.jsonify(page), args.repeat)
+        print(f"  {'jsonify pending page':<26}{len(backend.dumps(page)):>7} bytes   jsonify {rate:8.0f}/s")
+
+
+if __name__ == '__main__':
+    main()
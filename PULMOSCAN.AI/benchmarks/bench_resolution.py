@@ -0,0 +1,66 @@
+# Latency vs agreement of the X-ray analysis resolution tiers
+#
+# Runs process_xray_and_highlight on synthetic scanner-sized films at native
+# resolution and at each downscaled tier. For every tier it reports the
+# median latency, the mean and max absolute tb_probability difference from
+# the native result, and region agreement. Region agreement is the share of
+# native infected_areas that have a tier region within 2% of the film size
+# (recall) and vice versa (precision).
+#
+# Usage: python benchmarks/bench_resolution.py [--images 6] [--size 3500]
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_analysis_pool import synthetic_xray  # noqa: E402
+from xray_pipeline import RESOLUTION_TIERS, process_xray_and_highlight  # noqa: E402
+
+MATCH_DISTANCE = 2.0  # in percent of the film
+
+
+def timed(image, resolution):
+    start = time.perf_counter()
+    result = process_xray_and_highlight(image, resolution=resolution)
+    return time.perf_counter() - start, result
+
+
+def matched(regions, candidates):
+    if not regions:
+        return 1.0
+    hits = sum(
+        1 for r in regions
+        if any(math.hypot(r['x'] - c['x'], r['y'] - c['y']) <= MATCH_DISTANCE for c in candidates)
+    )
+    return hits / len(regions)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=6)
+    parser.add_argument('--size', type=int, default=3500)
+    args = parser.parse_args()
+
+    images = [synthetic_xray(args.size, seed) for seed in range(args.images)]
+    native = [timed(image, 'full') for image in images]
+
+    print(f"{args.images} images, {args.size}x{args.size}")
+    print(f"{'tier':<10}{'max side':>9}{'latency':>10}{'speedup':>9}"
+          f"{'|dp| mean':>11}{'|dp| max':>10}{'recall':>8}{'precision':>11}")
+    base_latency = statistics.median(t for t, _ in native)
+    for tier, max_dimension in RESOLUTION_TIERS.items():
+        runs = native if tier == 'full' else [timed(image, tier) for image in images]
+        latency = statistics.median(t for t, _ in runs)
+        deltas = [abs(r['tb_probability'] - n['tb_probability']) for (_, r), (_, n) in zip(runs, native)]
+        recall = statistics.mean(matched(n['infected_areas'], r['infected_areas']) for (_, r), (_, n) in zip(runs, native))
+        precision = statistics.mean(matched(r['infected_areas'], n['infected_areas']) for (_, r), (_, n) in zip(runs, native))
+        print(f"{tier:<10}{str(max_dimension or 'native'):>9}{latency:>9.3f}s{base_latency / latency:>8.1f}x"
+              f"{statistics.mean(deltas):>11.4f}{max(deltas):>10.4f}{recall:>8.2f}{precision:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Cold-start benchmark for app.py
+#
+# Compares importing the app the way it used to start (every ML framework
+# imported eagerly at module top) with the lazy inference registry. Each run
+# happens in a fresh interpreter inside a scratch directory so the real
+# pulmoscan.db and uploads folder are never touched.
+#
+# Usage: python benchmarks/bench_startup.py [--runs 5]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER_IMPORTS = [
+    'tensorflow',
+    'tensorflow.keras.applications.densenet',
+    'tensorflow.keras.layers',
+    'tensorflow.keras.models',
+    'torch',
+    'torchvision.transforms',
+    'matplotlib.pyplot',
+]
+
+CHILD = '''
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+missing = []
+for name in {eager!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+import app
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': elapsed, 'rss_kb': rss_kb, 'missing': missing}}))
+'''
+
+
+def run_once(eager, workdir):
+    env = dict(os.environ, PYTHONPATH=APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    code = CHILD.format(eager=EAGER_IMPORTS if eager else [])
+    out = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(label, results):
+    seconds = [r['seconds'] for r in results]
+    rss = [r['rss_kb'] / 1024 for r in results]
+    print(f"{label:<8} cold start {statistics.median(seconds):7.3f}s "
+          f"(min {min(seconds):.3f}s)   peak RSS {statistics.median(rss):8.1f} MB")
+    if results[0]['missing']:
+        print(f"         not installed, excluded: {', '.join(results[0]['missing'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        before = [run_once(True, workdir) for _ in range(args.runs)]
+        after = [run_once(False, workdir) for _ in range(args.runs)]
+
+    summarize('before', before)
+    summarize('after', after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Concurrent read/write stress test for the SQLite storage settings
+#
+# Writer processes accept reports (UPDATE status + rewrite report_data, like
+# /accept_report), and reader processes run the dashboard queries at the same
+# time. Each storage configuration gets its own scratch database. For each
+# one the script prints completed operations per second and how many
+# operations failed with "database is locked".
+#
+# Usage: python benchmarks/stress_db.py [--seconds 5] [--writers 4] [--readers 8]
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+CONFIGS = [
+    ('rollback journal, no tuning', 'DELETE', {}),
+    ('WAL + tuned pragmas', db.DEFAULT_JOURNAL_MODE, db.DEFAULT_PRAGMAS),
+]
+
+READ_QUERY = '''
+    SELECT pr.*, p.name as patient_name
+    FROM patient_records pr
+    JOIN patients p ON pr.patient_email = p.email
+    WHERE pr.status = ?
+    ORDER BY pr.created_at DESC
+'''
+
+
+def seed(path, records):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE patients (email TEXT PRIMARY KEY, name TEXT NOT NULL, password TEXT NOT NULL,
+                               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE patient_records (id TEXT PRIMARY KEY, patient_email TEXT, report_type TEXT, report_data TEXT,
+                                      status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    ''')
+    conn.executemany('INSERT INTO patients (email, name, password) VALUES (?, ?, ?)',
+                     [(f'p{i}@example.com', f'Patient {i}', 'x') for i in range(100)])
+    conn.executemany('INSERT INTO patient_records (id, patient_email, report_type, report_data) VALUES (?, ?, ?, ?)',
+                     [(f'RPT{i:08d}', f'p{i % 100}@example.com', 'xray',
+                       json.dumps({'patient_name': f'Patient {i % 100}', 'xray_data': {'tb_probability': 0.5}}))
+                      for i in range(records)])
+    conn.commit()
+    conn.close()
+
+
+def worker(path, pragmas, role, index, records, deadline, results):
+    # Same 5 s timeout as the sqlite3 default the app used before
+    conn = db.connect(path, pragmas, timeout=5.0)
+    done = locked = 0
+    i = index
+    while time.time() < deadline:
+        try:
+            if role == 'writer':
+                report_id = f'RPT{i % records:08d}'
+                row = conn.execute('SELECT report_data FROM patient_records WHERE id = ?', (report_id,)).fetchone()
+                report_data = json.loads(row[0])
+                report_data['accepted_at'] = time.time()
+                conn.execute("UPDATE patient_records SET status = 'accepted', report_data = ? WHERE id = ?",
+                             (json.dumps(report_data), report_id))
+                conn.commit()
+                i += 7
+            else:
+                conn.execute(READ_QUERY, ('pending',)).fetchall()
+            done += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            conn.rollback()
+            locked += 1
+    conn.close()
+    results.put((role, done, locked))
+
+
+def run(label, journal_mode, pragmas, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'stress.db')
+        seed(path, args.records)
+        db.configure_database(path, journal_mode)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.seconds
+        processes = [
+            multiprocessing.Process(target=worker, args=(path, pragmas, role, i, args.records, deadline, results))
+            for role, count in (('writer', args.writers), ('reader', args.readers))
+            for i in range(count)
+        ]
+        for p in processes:
+            p.start()
+        totals = {'writer': [0, 0], 'reader': [0, 0]}
+        for _ in processes:
+            role, done, locked = results.get()
+            totals[role][0] += done
+            totals[role][1] += locked
+        for p in processes:
+            p.join()
+
+    print(f"{label:<30}"
+          f"writes {totals['writer'][0] / args.seconds:8.1f}/s ({totals['writer'][1]} locked)   "
+          f"reads {totals['reader'][0] / args.seconds:8.1f}/s ({totals['reader'][1]} locked)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--records', type=int, default=5000)
+    args = parser.parse_args()
+
+    for label, journal_mode, pragmas in CONFIGS:
+        run(label, journal_mode, pragmas, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import records
+import report_format
+
+# Content-addressed storage for X-ray overlays. Files are named by the
+# SHA-256 of their bytes and sharded two levels deep (ab/cd/abcd...jpg) so no
+# directory grows past a few hundred entries. Identical overlays are stored
+# once, and blob_refs counts how many report records point at each one.
+# Reports are never deleted, so blobs are not collected.
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS blob_refs (
+        hash TEXT PRIMARY KEY,
+        refcount INTEGER NOT NULL DEFAULT 0,
+        size INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+# File-like sink that hashes everything written through it
+class HashingWriter:
+    def __init__(self, f):
+        self._f = f
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += memoryview(data).nbytes
+        return self._f.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+# Partially written blobs go to tmp_dir, which must be on the same filesystem
+# as root. When root is served over HTTP, keep tmp_dir outside the served tree.
+class BlobStore:
+    def __init__(self, root, url_prefix, extension='.jpg', tmp_dir=None):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.extension = extension
+        self.tmp_dir = tmp_dir or os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _relative_path(self, digest):
+        return os.path.join(digest[:2], digest[2:4], digest + self.extension)
+
+    def path(self, digest):
+        return os.path.join(self.root, self._relative_path(digest))
+
+    def url(self, digest):
+        return f"{self.url_prefix}/{self._relative_path(digest).replace(os.sep, '/')}"
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    # Write through a hashing sink into a temp file, then move it to its
+    # content address. If the blob already exists the temp file is dropped.
+    def write(self, produce):
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = HashingWriter(f)
+                result = produce(writer)
+            digest = writer.hexdigest()
+            self._commit(tmp_path, digest)
+            return digest, writer.size, result
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_file(self, source_path, move=False):
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            if move:
+                shutil.move(source_path, tmp_path)
+            else:
+                shutil.copyfile(source_path, tmp_path)
+            self._commit(tmp_path, digest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def _commit(self, tmp_path, digest):
+        target = self.path(digest)
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+
+
+def add_ref(cursor, digest, size=None, count=1):
+    cursor.execute('''
+        INSERT INTO blob_refs (hash, refcount, size) VALUES (?, ?, ?)
+        ON CONFLICT(hash) DO UPDATE SET refcount = refcount + excluded.refcount
+    ''', (digest, count, size))
+
+
+# Stored image paths as comparable keys: records written on Windows use
+# backslashes (static/uploads\\name.jpg), others a leading slash
+def _path_key(path):
+    return path.replace('\\', '/').lstrip('/')
+
+
+# One-off migration of a flat uploads folder into the store. Each referenced
+# overlay is copied to its content address, its report records are repointed
+# at the new URL and blob_refs counts them, a batch per transaction. The
+# originals are deleted only once every record pointing at them has been
+# committed; uploads no record refers to are left where they are.
+def migrate_uploads(conn, store, upload_folder, old_url_prefix, batch_size=500):
+    uploads = {}
+    for name in sorted(os.listdir(upload_folder)):
+        source = os.path.join(upload_folder, name)
+        if name.lower().endswith(store.extension) and os.path.isfile(source):
+            uploads[_path_key(f"{old_url_prefix.rstrip('/')}/{name}")] = source
+
+    c = conn.cursor()
+    digests = {}
+    refs = {}
+    tables = {row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, key_column, data_column in (('reports', 'report_id', 'data'), ('patient_records', 'id', 'report_data')):
+        if table not in tables:
+            continue
+        last_key = ''
+        while True:
+            c.execute(f'SELECT {key_column}, {data_column} FROM {table} WHERE {key_column} > ? '
+                      f'ORDER BY {key_column} LIMIT ?', (last_key, batch_size))
+            rows = c.fetchall()
+            if not rows:
+                break
+            batch_refs = {}
+            for key, data in rows:
+                report_data = report_format.decode(data) if data else None
+                xray_data = (report_data or {}).get('xray_data') or {}
+                source = uploads.get(_path_key(xray_data.get('image_path') or ''))
+                if source is None:
+                    continue
+                if source not in digests:
+                    digests[source] = store.put_file(source)
+                digest = digests[source]
+                xray_data['image_path'] = store.url(digest)
+                xray_data['image_hash'] = digest
+                batch_refs[digest] = batch_refs.get(digest, 0) + 1
+                if table == 'patient_records':
+                    records.save_report_data(c, key, report_data)
+                else:
+                    c.execute(f'UPDATE {table} SET {data_column} = ? WHERE {key_column} = ?',
+                              (report_format.encode(report_data), key))
+            for digest, count in batch_refs.items():
+                add_ref(c, digest, os.path.getsize(store.path(digest)), count)
+                refs[digest] = refs.get(digest, 0) + count
+            conn.commit()
+            last_key = rows[-1][0]
+
+    for source in digests:
+        os.remove(source)
+    return len(digests), len(refs)
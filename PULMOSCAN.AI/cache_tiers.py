@@ -0,0 +1,91 @@
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.filesystemcache import FileSystemCache
+from flask_caching.backends.rediscache import RedisCache
+from flask_caching.backends.simplecache import SimpleCache
+from werkzeug.utils import import_string
+
+# Two-level cache backend for Flask-Caching. Each worker process keeps a
+# small L1 in memory for a few seconds; every write also goes to a shared L2
+# (a directory on the host or a Redis server), so all workers see entries
+# any one of them computed.
+#
+# Invalidation across workers: keys starting with one of shared_only_prefixes
+# are never held in L1 and always read from L2. Version stamps stored under
+# such a key and embedded in other cache keys change everywhere at once, so
+# a write in one worker makes every worker miss the old entries immediately.
+# Plain deletes reach the other workers' L1 copies within l1_timeout.
+
+
+class TieredCache(BaseCache):
+    def __init__(self, shared, default_timeout=300, l1_threshold=500, l1_timeout=5, shared_only_prefixes=()):
+        super().__init__(default_timeout)
+        self.shared = shared
+        self.local = SimpleCache(threshold=l1_threshold, default_timeout=l1_timeout)
+        self.l1_timeout = l1_timeout
+        self.shared_only_prefixes = tuple(shared_only_prefixes)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        default_timeout = kwargs.get('default_timeout', 300)
+        shared_type = config.get('CACHE_SHARED_TYPE', 'filesystem')
+        if shared_type == 'filesystem':
+            shared = FileSystemCache(config['CACHE_DIR'], threshold=config.get('CACHE_THRESHOLD', 500),
+                                     default_timeout=default_timeout)
+        elif shared_type == 'redis':
+            # CACHE_REDIS_CLIENT takes any client speaking the redis-py API,
+            # CACHE_REDIS_CLIENT_FACTORY the import path of a callable
+            # returning one, e.g. fakeredis:FakeRedis for local runs
+            client = config.get('CACHE_REDIS_CLIENT')
+            if client is None and config.get('CACHE_REDIS_CLIENT_FACTORY'):
+                client = import_string(config['CACHE_REDIS_CLIENT_FACTORY'])()
+            if client is not None:
+                shared = RedisCache(client, default_timeout=default_timeout, key_prefix=config.get('CACHE_KEY_PREFIX'))
+            else:
+                shared = RedisCache.factory(app, config, [], {'default_timeout': default_timeout})
+        else:
+            raise ValueError(f'Unknown shared cache type: {shared_type}')
+
+        return cls(shared, default_timeout,
+                   l1_threshold=config.get('CACHE_L1_THRESHOLD', 500),
+                   l1_timeout=config.get('CACHE_L1_TIMEOUT', 5),
+                   shared_only_prefixes=config.get('CACHE_SHARED_ONLY_PREFIXES', ()))
+
+    def _local(self, key):
+        return not key.startswith(self.shared_only_prefixes)
+
+    def _local_timeout(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return self.l1_timeout if timeout == 0 else min(timeout, self.l1_timeout)
+
+    def get(self, key):
+        if self._local(key):
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        value = self.shared.get(key)
+        if value is not None and self._local(key):
+            self.local.set(key, value, timeout=self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=None):
+        if self._local(key):
+            self.local.set(key, value, timeout=self._local_timeout(timeout))
+        return self.shared.set(key, value, timeout=timeout)
+
+    def add(self, key, value, timeout=None):
+        if not self.shared.add(key, value, timeout=timeout):
+            return False
+        if self._local(key):
+            self.local.set(key, value, timeout=self._local_timeout(timeout))
+        return True
+
+    def delete(self, key):
+        self.local.delete(key)
+        return self.shared.delete(key)
+
+    def has(self, key):
+        return (self._local(key) and self.local.has(key)) or self.shared.has(key)
+
+    def clear(self):
+        self.local.clear()
+        return self.shared.clear()
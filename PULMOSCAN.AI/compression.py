@@ -0,0 +1,180 @@
+import hashlib
+import threading
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+# WSGI middleware compressing responses with brotli, when the package is
+# installed and the client accepts it, or gzip otherwise.
+#
+# Only 200 responses of at least min_size bytes with a compressible MIME type
+# are compressed; responses that already carry a Content-Encoding (the
+# precompressed static variants, template sources), Cache-Control:
+# no-transform, or HEAD requests pass through untouched. Bodies up to
+# stream_threshold bytes are compressed in one go with an exact
+# Content-Length, larger or unsized ones are compressed chunk by chunk as the
+# app yields them. ETags become weak, as the compressed body is not
+# byte-identical to what the ETag was computed for; Werkzeug compares
+# If-None-Match weakly, so conditional requests keep answering 304.
+#
+# For the paths in cache_paths the compressed body is kept per encoding and
+# reused for as long as the app returns the same body, so pages served from
+# the view cache are not compressed again on every request.
+
+COMPRESSIBLE_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, brotli, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size=500, stream_threshold=256 * 1024, gzip_level=6, brotli_quality=5,
+                 mimetypes=COMPRESSIBLE_MIMETYPES, cache_paths=()):
+        self.app = app
+        self.min_size = min_size
+        self.stream_threshold = stream_threshold
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+        self.cache_paths = frozenset(cache_paths)
+        self._brotli = _brotli()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def encoding_for(self, environ):
+        accept = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if self._brotli is not None and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return None
+
+    def compressor(self, encoding):
+        if encoding == 'br':
+            return _Brotli(self._brotli, self.brotli_quality)
+        return _Gzip(self.gzip_level)
+
+    def compress(self, encoding, data):
+        compressor = self.compressor(encoding)
+        return compressor.process(data) + compressor.finish()
+
+    def _eligible(self, status, headers):
+        if not status.startswith('200') or 'Content-Encoding' in headers:
+            return False
+        # The front-end server sends these bodies
+        if 'X-Sendfile' in headers or 'X-Accel-Redirect' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if mimetype not in self.mimetypes:
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def _cached_compress(self, path, encoding, body):
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        key = (path, encoding)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == digest:
+            return entry[1]
+        compressed = self.compress(encoding, body)
+        with self._lock:
+            self._cache[key] = (digest, compressed)
+        return compressed
+
+    def _stream(self, app_iter, compressor):
+        try:
+            for chunk in app_iter:
+                data = compressor.process(chunk)
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def __call__(self, environ, start_response):
+        encoding = self.encoding_for(environ) if environ.get('REQUEST_METHOD') != 'HEAD' else None
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if self._eligible(status, headers):
+                if encoding:
+                    captured['response'] = (status, headers, exc_info)
+                    return None
+                # Shared caches must not hand this copy to clients that
+                # accept compression
+                _add_vary(headers)
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.app(environ, capture)
+        if 'response' not in captured:
+            return app_iter
+
+        status, headers, exc_info = captured['response']
+        headers['Content-Encoding'] = encoding
+        headers.pop('Accept-Ranges', None)
+        _add_vary(headers)
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag
+
+        length = headers.get('Content-Length')
+        if length is not None and int(length) <= self.stream_threshold:
+            try:
+                body = b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+            path = environ.get('PATH_INFO', '')
+            if path in self.cache_paths and not environ.get('QUERY_STRING'):
+                compressed = self._cached_compress(path, encoding, body)
+            else:
+                compressed = self.compress(encoding, body)
+            headers['Content-Length'] = str(len(compressed))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [compressed]
+
+        headers.pop('Content-Length', None)
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return self._stream(app_iter, self.compressor(encoding))
+
+
+def _add_vary(headers):
+    vary = [v.strip() for v in headers.get('Vary', '').split(',') if v.strip()]
+    if 'accept-encoding' not in (v.lower() for v in vary):
+        vary.append('Accept-Encoding')
+    headers['Vary'] = ', '.join(vary)
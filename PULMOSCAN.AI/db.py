@@ -0,0 +1,134 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+# Per-connection settings for concurrent web and analysis workers. Every
+# entry can be overridden per deployment with PULMOSCAN_DB_<NAME>, and an
+# empty value drops the PRAGMA.
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+DEFAULT_JOURNAL_MODE = 'WAL'
+
+
+def pragmas_from_env(environ=os.environ):
+    pragmas = {}
+    for name, default in DEFAULT_PRAGMAS.items():
+        value = environ.get(f'PULMOSCAN_DB_{name.upper()}', default)
+        if value != '':
+            pragmas[name] = value
+    return pragmas
+
+
+def journal_mode_from_env(environ=os.environ):
+    return environ.get('PULMOSCAN_DB_JOURNAL_MODE', DEFAULT_JOURNAL_MODE)
+
+
+# The journal mode is stored in the database file, so it is applied once at
+# startup rather than on every connection. Returns the mode SQLite reports.
+def configure_database(path, journal_mode):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f'PRAGMA journal_mode = {journal_mode}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def connect(path, pragmas=None, **options):
+    conn = sqlite3.connect(path, **options)
+    for name, value in (pragmas or {}).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+# Pool of reusable SQLite connections. Up to `size` idle connections are kept;
+# when they are all in use extra ones are opened and closed on release, so a
+# burst never blocks a request. Connections idle for longer than
+# health_check_interval seconds are pinged before being handed out.
+class ConnectionPool:
+    def __init__(self, path, size=5, pragmas=None, health_check_interval=30, timeout=5.0):
+        self.path = path
+        self.size = size
+        self.pragmas = dict(pragmas or {})
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self):
+        # Connections move between request threads, never used concurrently
+        return connect(self.path, self.pragmas, timeout=self.timeout, check_same_thread=False)
+
+    def _healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        # Connections inherited through fork must not be shared with the
+        # parent, a forked worker starts with an empty pool
+        if self._pid != os.getpid():
+            self._idle = queue.LifoQueue()
+            self._pid = os.getpid()
+
+        while True:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+
+            if time.monotonic() - released_at < self.health_check_interval or self._healthy(conn):
+                return conn
+            self._close(conn)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close(conn)
+            return
+
+        with self._lock:
+            if self._idle.qsize() < self.size:
+                self._idle.put((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+# Plan steps that read a whole table or sort outside an index. A SCAN that
+# walks an index (covering or not) or reads a subquery's rows is fine, a bare
+# table scan or a temp B-tree for ORDER BY is not.
+def full_scan_steps(conn, sql, params=()):
+    problems = []
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+        detail = row[-1]
+        if detail.startswith('SCAN') and 'INDEX' not in detail and not detail.startswith('SCAN ('):
+            problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
@@ -0,0 +1,283 @@
+import importlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+
+import cv2
+import numpy as np
+
+from xray_pipeline import build_findings, confidence_score, process_xray_and_highlight
+
+# Heavy ML frameworks are imported only when a route actually needs inference.
+# Workers that just serve pages and dashboards never pay the import time or
+# the memory of TensorFlow/torch.
+BACKEND_MODULES = {
+    'tensorflow': 'tensorflow',
+    'densenet': 'tensorflow.keras.applications.densenet',
+    'keras_layers': 'tensorflow.keras.layers',
+    'keras_models': 'tensorflow.keras.models',
+    'torch': 'torch',
+    'transforms': 'torchvision.transforms',
+    'pyplot': 'matplotlib.pyplot',
+}
+
+_backends = {}
+_model_factories = {}
+_models = {}
+_lock = threading.RLock()
+
+
+def load_backend(name):
+    module = _backends.get(name)
+    if module is not None:
+        return module
+
+    with _lock:
+        if name not in _backends:
+            if name not in BACKEND_MODULES:
+                raise KeyError(f'Unknown backend: {name}')
+            if name == 'pyplot':
+                # Servers have no display, pick the non-interactive backend
+                # before pyplot is imported for the first time
+                importlib.import_module('matplotlib').use('Agg')
+            _backends[name] = importlib.import_module(BACKEND_MODULES[name])
+        return _backends[name]
+
+
+def is_backend_loaded(name):
+    return name in _backends
+
+
+def loaded_backends():
+    return sorted(_backends)
+
+
+# Models are registered by name with a factory and built once per process on
+# first use
+def register_model(name, factory):
+    with _lock:
+        _model_factories[name] = factory
+        _models.pop(name, None)
+
+
+def get_model(name):
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if name not in _models:
+            if name not in _model_factories:
+                raise KeyError(f'Unknown model: {name}')
+            _models[name] = _model_factories[name]()
+        return _models[name]
+
+
+def is_model_loaded(name):
+    return name in _models
+
+
+# Backends turn raw upload bytes into the analysis dict returned by
+# process_xray_and_highlight. A backend that runs a model exposes
+# predict_batch() and asks the engine for predictions so concurrent uploads
+# share one forward pass.
+class ClassicalBackend:
+    name = 'classical'
+
+    def analyze(self, image_data, predict, **options):
+        return process_xray_and_highlight(image_data, **options)
+
+
+class DenseNetBackend:
+    name = 'densenet121'
+    input_size = 224
+
+    def __init__(self, weights=None):
+        # weights is a path to fine-tuned classifier weights. Without them
+        # the head is untrained and its output says nothing about TB.
+        if not weights:
+            raise ValueError('The densenet121 backend needs fine-tuned weights')
+        self.weights = weights
+        register_model(self.name, self._build)
+
+    def _build(self):
+        tf = load_backend('tensorflow')
+        # Inference runs on CPU, hide any GPU before the first op
+        tf.config.set_visible_devices([], 'GPU')
+        densenet = load_backend('densenet')
+        layers = load_backend('keras_layers')
+        models = load_backend('keras_models')
+
+        base = densenet.DenseNet121(
+            include_top=False,
+            weights=None,
+            input_shape=(self.input_size, self.input_size, 3)
+        )
+        x = layers.GlobalAveragePooling2D()(base.output)
+        output = layers.Dense(1, activation='sigmoid')(x)
+        model = models.Model(inputs=base.input, outputs=output)
+        model.load_weights(self.weights)
+        return model
+
+    def preprocess(self, image_data):
+        nparr = np.frombuffer(image_data, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        img = cv2.resize(img, (self.input_size, self.input_size), interpolation=cv2.INTER_AREA)
+        return load_backend('densenet').preprocess_input(img.astype(np.float32))
+
+    def predict_batch(self, batch):
+        model = get_model(self.name)
+        probabilities = model(np.stack(batch), training=False).numpy()
+        return [float(p[0]) for p in probabilities]
+
+    def analyze(self, image_data, predict, **options):
+        # The classical pipeline still provides the overlay and the region
+        # list, the network replaces the heuristic probability
+        result = process_xray_and_highlight(image_data, **options)
+        tb_probability = predict(self.preprocess(image_data))
+        result['tb_probability'] = tb_probability
+        result['findings'] = build_findings(tb_probability, result['infected_areas'])
+        result['confidence_score'] = confidence_score(tb_probability)
+        return result
+
+
+BACKENDS = {
+    ClassicalBackend.name: ClassicalBackend,
+    DenseNetBackend.name: DenseNetBackend,
+}
+
+
+def uses_model(backend):
+    return hasattr(BACKENDS[backend], 'predict_batch')
+
+
+# predictor, when given, answers predictions instead of the engine's own
+# batcher, e.g. a RemotePredictor talking to the inference server
+class InferenceEngine:
+    def __init__(self, backend, max_batch_size=8, max_wait_ms=10, predictor=None):
+        self.backend = backend
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.predictor = predictor
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    # options (sink, encode_base64) are passed through to the pipeline
+    def analyze(self, image_data, **options):
+        return self.backend.analyze(image_data, self.predict, **options)
+
+    def predict(self, tensor):
+        if self.predictor is not None:
+            return self.predictor(tensor)
+        return self.submit(tensor).result()
+
+    # Queue a prediction and return a Future of it
+    def submit(self, tensor):
+        future = Future()
+        if self.max_batch_size == 1:
+            try:
+                future.set_result(self.backend.predict_batch([tensor])[0])
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._ensure_worker()
+        self._queue.put((tensor, future))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+                self._worker.start()
+
+    # Collect requests until the batch is full or the oldest one has waited
+    # max_wait, then run them as a single forward pass
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                predictions = self.backend.predict_batch([tensor for tensor, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), prediction in zip(items, predictions):
+                future.set_result(prediction)
+
+
+def create_engine(backend='classical', max_batch_size=8, max_wait_ms=10, predictor=None, **options):
+    if backend not in BACKENDS:
+        raise KeyError(f'Unknown inference backend: {backend}')
+    return InferenceEngine(BACKENDS[backend](**options), max_batch_size, max_wait_ms, predictor)
+
+
+# Model serving for process pools: a single server process owns the model and
+# batches the predictions of every pool worker. Workers put (slot, request
+# id, tensor) on the shared requests queue and read the answer from their
+# own responses[slot] queue. None on the requests queue stops the server.
+def serve(engine_options, requests, responses):
+    engine = create_engine(**engine_options)
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        slot, request_id, tensor = item
+        engine.submit(tensor).add_done_callback(partial(_respond, responses[slot], request_id))
+
+
+def _respond(responses, request_id, future):
+    error = future.exception()
+    if error is not None:
+        # Exceptions from the framework do not always pickle
+        responses.put((request_id, None, f'{type(error).__name__}: {error}'))
+    else:
+        responses.put((request_id, future.result(), None))
+
+
+class InferenceError(Exception):
+    pass
+
+
+class RemotePredictor:
+    def __init__(self, requests, responses, slot, timeout=120):
+        self.requests = requests
+        self.responses = responses
+        self.slot = slot
+        self.timeout = timeout
+        self._last_id = 0
+
+    def __call__(self, tensor):
+        self._last_id += 1
+        request_id = self._last_id
+        self.requests.put((self.slot, request_id, tensor))
+
+        # Answers to earlier requests that timed out are skipped
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                response_id, prediction, error = self.responses.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise InferenceError('Timed out waiting for the inference server') from None
+            if response_id == request_id:
+                break
+        if error is not None:
+            raise InferenceError(error)
+        return prediction
@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+from flask import current_app
+
+# JSON encoding for report_data blobs, cache entries and API responses.
+# orjson is used when it is installed, the stdlib json module otherwise, and
+# PULMOSCAN_JSON_BACKEND=orjson|json picks one explicitly. Both backends
+# write numpy scalars and arrays from the analysis as plain numbers and lists.
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class StdlibJSON:
+    name = 'json'
+
+    def dumps(self, obj, sort_keys=False):
+        return json.dumps(obj, default=_default, sort_keys=sort_keys, separators=(',', ':'))
+
+    def dumps_bytes(self, obj, sort_keys=False):
+        return self.dumps(obj, sort_keys).encode()
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonJSON:
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, sort_keys=False):
+        return self.dumps_bytes(obj, sort_keys).decode()
+
+    def dumps_bytes(self, obj, sort_keys=False):
+        option = self._option | (self._orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return self._orjson.dumps(obj, default=_default, option=option)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+BACKENDS = {
+    'orjson': OrjsonJSON,
+    'json': StdlibJSON,
+}
+
+
+def create_backend(name=None):
+    if name:
+        if name not in BACKENDS:
+            raise KeyError(f'Unknown JSON backend: {name}')
+        return BACKENDS[name]()
+    try:
+        return OrjsonJSON()
+    except ImportError:
+        return StdlibJSON()
+
+
+backend = create_backend(os.environ.get('PULMOSCAN_JSON_BACKEND'))
+
+
+def use_backend(name):
+    global backend
+    backend = create_backend(name)
+    return backend
+
+
+def dumps(obj):
+    return backend.dumps(obj)
+
+
+def loads(data):
+    return backend.loads(data)
+
+
+# Drop-in for flask.jsonify that encodes with the selected backend
+def jsonify(*args, **kwargs):
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    data = args[0] if len(args) == 1 else (args or kwargs)
+    body = backend.dumps_bytes(data, sort_keys=current_app.config.get('JSON_SORT_KEYS', True))
+    return current_app.response_class(body + b'\n', mimetype=current_app.config.get('JSONIFY_MIMETYPE', 'application/json'))
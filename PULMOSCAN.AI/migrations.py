@@ -0,0 +1,244 @@
+from datetime import datetime
+
+import blob_store
+import records
+import report_format
+
+# Versioned schema migrations. Each migration runs once, in order, and its
+# version is recorded in schema_version. Schema changes run in a single
+# transaction; Backfill migrations rewrite rows in chunks, committing between
+# them, so a large table is never locked for the whole migration.
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class MigrationError(Exception):
+    pass
+
+
+def _baseline(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS patients (
+            email TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS healthcare_workers (
+            email TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS patient_records (
+            id TEXT PRIMARY KEY,
+            patient_email TEXT,
+            report_type TEXT,
+            report_data TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (patient_email) REFERENCES patients (email)
+        )
+    ''')
+    # Reference counts for content-addressed overlays
+    c.execute(blob_store.SCHEMA)
+
+
+def _patient_records_indexes(c):
+    # Dashboard and pending-report lists filter on status or patient_email
+    # and sort by created_at
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_patient_records_status_created_at
+        ON patient_records (status, created_at)
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_patient_records_patient_email_created_at
+        ON patient_records (patient_email, created_at)
+    ''')
+
+
+def _patient_records_keyset_index(c):
+    # Keyset pages order by (created_at, id). With id in the index neither
+    # the ORDER BY tiebreak nor the cursor comparison needs a sort.
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_patient_records_status_created_at_id
+        ON patient_records (status, created_at, id)
+    ''')
+    c.execute('DROP INDEX IF EXISTS idx_patient_records_status_created_at')
+
+
+def _patient_records_review_columns(c):
+    # Written by /accept_report and /reject_report
+    add_columns(c, 'patient_records', {
+        'healthcare_id': 'TEXT',
+        'healthcare_email': 'TEXT',
+        'updated_at': 'TIMESTAMP',
+    })
+
+
+def _patient_records_summary_columns(c):
+    # Read by list views instead of report_data, see records.py
+    add_columns(c, 'patient_records', {
+        'patient_name': 'TEXT',
+        'tb_probability': 'REAL',
+        'severity': 'REAL',
+        'treatment_duration': 'TEXT',
+        'image_path': 'TEXT',
+    })
+
+
+def _summarize_row(row):
+    return records.summarize(report_format.decode(row[0])) if row[0] else None
+
+
+def _reports_table(c):
+    # X-ray uploads and their background analysis state
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS reports (
+            report_id TEXT PRIMARY KEY,
+            patient_email TEXT,
+            report_type TEXT,
+            status TEXT DEFAULT 'pending',
+            data TEXT,
+            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (patient_email) REFERENCES patients (email)
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reports_patient_email_upload_date
+        ON reports (patient_email, upload_date)
+    ''')
+
+
+def _notifications_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            message TEXT,
+            type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_id_created_at
+        ON notifications (user_id, created_at)
+    ''')
+
+
+# ALTER TABLE ... ADD COLUMN only touches the schema, not the rows, and is
+# skipped for columns that already exist
+def add_columns(c, table, columns):
+    existing = {row[1] for row in c.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns.items():
+        if name not in existing:
+            c.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+# Rewrites the rows of a table in rowid order, chunk_size rows per
+# transaction. transform(row) receives the selected columns and returns the
+# column values to set, or None to leave the row alone. `pending` limits the
+# rows still to do, so an interrupted backfill resumes where it stopped and a
+# second worker running it concurrently only repeats harmless work.
+class Backfill:
+    def __init__(self, table, columns, transform, pending=None):
+        self.table = table
+        self.columns = columns
+        self.transform = transform
+        self.pending = pending
+
+    def run(self, conn, chunk_size=DEFAULT_CHUNK_SIZE):
+        where = f' AND ({self.pending})' if self.pending else ''
+        select = (f"SELECT rowid, {', '.join(self.columns)} FROM {self.table} "
+                  f"WHERE rowid > ?{where} ORDER BY rowid LIMIT ?")
+        last_rowid = 0
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(select, (last_rowid, chunk_size)).fetchall()
+                for rowid, *values in rows:
+                    update = self.transform(values)
+                    if update:
+                        assignments = ', '.join(f'{name} = ?' for name in update)
+                        conn.execute(f'UPDATE {self.table} SET {assignments} WHERE rowid = ?',
+                                     (*update.values(), rowid))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if len(rows) < chunk_size:
+                return
+            last_rowid = rows[-1][0]
+
+
+MIGRATIONS = [
+    (1, 'baseline tables', _baseline),
+    (2, 'patient_records status and patient_email indexes', _patient_records_indexes),
+    (3, 'patient_records review columns', _patient_records_review_columns),
+    (4, 'reports table', _reports_table),
+    (5, 'notifications table', _notifications_table),
+    (6, 'backfill patient_records.updated_at',
+     Backfill('patient_records', ['created_at'], lambda row: {'updated_at': row[0]}, 'updated_at IS NULL')),
+    (7, 'patient_records (status, created_at, id) index', _patient_records_keyset_index),
+    (8, 'patient_records summary columns', _patient_records_summary_columns),
+    (9, 'backfill patient_records summary columns',
+     Backfill('patient_records', ['report_data'], _summarize_row,
+              'report_data IS NOT NULL AND patient_name IS NULL AND tb_probability IS NULL')),
+]
+
+
+def current_version(conn):
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def _record(conn, number, description):
+    conn.execute('INSERT OR IGNORE INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                 (number, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+
+# Safe to call from several workers starting at once: each schema migration
+# takes the write lock and re-checks the version before running. A failing
+# migration raises MigrationError naming it; the ones before it stay applied.
+def run_migrations(conn, chunk_size=DEFAULT_CHUNK_SIZE):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    applied = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= current_version(conn):
+            continue
+
+        if isinstance(migrate, Backfill):
+            try:
+                migrate.run(conn, chunk_size)
+            except Exception as e:
+                raise MigrationError(f'Migration {number} ({description}) failed: {e}') from e
+            _record(conn, number, description)
+            conn.commit()
+            applied.append(number)
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if number <= current_version(conn):
+                conn.rollback()
+                continue
+            migrate(conn.cursor())
+            _record(conn, number, description)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise MigrationError(f'Migration {number} ({description}) failed: {e}') from e
+        applied.append(number)
+    return applied
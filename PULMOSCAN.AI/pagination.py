@@ -0,0 +1,47 @@
+import base64
+import json
+
+# Keyset pagination for lists ordered newest first by (created_at, id). A
+# page is fetched with `(created_at, id) < cursor ... LIMIT n`, which walks
+# the (status, created_at, id) index from the cursor instead of skipping
+# OFFSET rows, so the cost of a page does not depend on how deep it is.
+# Cursors are opaque to clients.
+
+
+def encode_cursor(created_at, record_id):
+    raw = json.dumps([created_at, record_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+# Raises ValueError for anything encode_cursor did not produce
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, record_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {token!r}') from e
+    if not isinstance(created_at, str) or not isinstance(record_id, str):
+        raise ValueError(f'Invalid cursor: {token!r}')
+    return created_at, record_id
+
+
+def page_limit(value, default, maximum):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, maximum)
+
+
+# Splits rows fetched with LIMIT limit + 1 into the page and the cursor for
+# the next one (None on the last page)
+def split_page(rows, limit, created_at_index, id_index):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[created_at_index], last[id_index])
@@ -0,0 +1,36 @@
+import report_format
+
+# Summary columns of patient_records. List views read these instead of
+# parsing the report_data JSON; they are derived from report_data every time
+# it is written (save_report_data) and only detail views load the blob.
+SUMMARY_COLUMNS = ('patient_name', 'tb_probability', 'severity', 'treatment_duration', 'image_path')
+
+
+# Worst infected area, 0 when the X-ray showed none. Reports saved before
+# areas carried a severity store {x, y, radius} only, and get None.
+def _severity(xray_data):
+    if not xray_data:
+        return None
+    areas = xray_data.get('infected_areas') or []
+    severities = [area['severity'] for area in areas if area.get('severity') is not None]
+    if severities:
+        return max(severities)
+    return None if areas else 0.0
+
+
+def summarize(report_data):
+    xray_data = report_data.get('xray_data') or {}
+    return {
+        'patient_name': report_data.get('patient_name'),
+        'tb_probability': xray_data.get('tb_probability'),
+        'severity': _severity(xray_data),
+        'treatment_duration': report_data.get('treatment_duration'),
+        'image_path': xray_data.get('image_path'),
+    }
+
+
+def save_report_data(cursor, record_id, report_data):
+    summary = summarize(report_data)
+    assignments = ', '.join(f'{name} = ?' for name in summary)
+    cursor.execute(f'UPDATE patient_records SET report_data = ?, {assignments} WHERE id = ?',
+                   (report_format.encode(report_data), *summary.values(), record_id))
@@ -0,0 +1,115 @@
+import os
+import struct
+
+import numpy as np
+
+import json_provider
+
+# Storage encoding of report_data. Rows written as JSON text stay readable,
+# and the compact format is opted into with PULMOSCAN_REPORT_FORMAT=packed.
+#
+# A packed value is a BLOB that starts with a format version byte:
+#
+#   version (1 byte) | header length (uint32 LE) | JSON header | float32 areas
+#
+# Every infected_areas list in the report is moved out of the JSON into one
+# little-endian float32 array of (x, y, area, severity) rows, which drops the
+# four repeated keys per area and halves the size of the numbers. The header
+# keeps the rest of the report, with each moved list replaced by
+# {"$areas": <count>}. SQLite stores BLOB values as-is in the existing
+# report_data and data columns, so both encodings live side by side.
+#
+# float32 keeps about 7 significant digits. Values are rounded to that on
+# read, so a severity of 0.9 reads back as 0.9 and not 0.8999999761581421;
+# digits beyond the seventh are lost.
+
+FORMAT_JSON = 'json'
+FORMAT_PACKED = 'packed'
+PACKED_VERSION = 1
+
+AREA_FIELDS = ('x', 'y', 'area', 'severity')
+AREAS_MARKER = '$areas'
+FLOAT32_DIGITS = 7
+
+_header = struct.Struct('<BI')
+
+default_format = os.environ.get('PULMOSCAN_REPORT_FORMAT', FORMAT_JSON)
+
+
+def _packable(areas):
+    return isinstance(areas, list) and all(
+        isinstance(area, dict) and area.keys() == set(AREA_FIELDS) and
+        all(isinstance(area[field], (int, float, np.number)) and not isinstance(area[field], bool)
+            for field in AREA_FIELDS)
+        for area in areas
+    )
+
+
+def _extract_areas(obj, rows):
+    if isinstance(obj, dict):
+        out = {}
+        for key, value in obj.items():
+            if key == 'infected_areas' and _packable(value):
+                out[key] = {AREAS_MARKER: len(value)}
+                rows.extend([area[field] for field in AREA_FIELDS] for area in value)
+            else:
+                out[key] = _extract_areas(value, rows)
+        return out
+    if isinstance(obj, list):
+        return [_extract_areas(value, rows) for value in obj]
+    return obj
+
+
+def _restore_areas(obj, rows):
+    if isinstance(obj, dict):
+        if obj.keys() == {AREAS_MARKER}:
+            count = obj[AREAS_MARKER]
+            areas = [dict(zip(AREA_FIELDS, row)) for row in rows[:count]]
+            del rows[:count]
+            return areas
+        return {key: _restore_areas(value, rows) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_restore_areas(value, rows) for value in obj]
+    return obj
+
+
+def encode(report_data, fmt=None):
+    fmt = fmt or default_format
+    if fmt == FORMAT_JSON:
+        return json_provider.dumps(report_data)
+    if fmt != FORMAT_PACKED:
+        raise ValueError(f'Unknown report format: {fmt}')
+
+    rows = []
+    header = json_provider.backend.dumps_bytes(_extract_areas(report_data, rows))
+    areas = np.asarray(rows, dtype='<f4').reshape(-1, len(AREA_FIELDS))
+    return _header.pack(PACKED_VERSION, len(header)) + header + areas.tobytes()
+
+
+def decode(value):
+    if isinstance(value, str) or value[:1] == b'{':
+        return json_provider.loads(value)
+
+    version, header_length = _header.unpack_from(value)
+    if version != PACKED_VERSION:
+        raise ValueError(f'Unknown report_data format version: {version}')
+    start = _header.size
+    header = json_provider.loads(bytes(value[start:start + header_length]))
+    areas = np.frombuffer(value, dtype='<f4', offset=start + header_length)
+    rows = [[float(f'{value:.{FLOAT32_DIGITS}g}') for value in row]
+            for row in areas.reshape(-1, len(AREA_FIELDS)).tolist()]
+    return _restore_areas(header, rows)
+
+
+# Stored format of a value read from the database
+def format_of(value):
+    if isinstance(value, str) or value[:1] == b'{':
+        return FORMAT_JSON
+    return FORMAT_PACKED
+
+
+# Backfill transform that re-encodes one stored column in the default format
+def repack(column, value):
+    if value is None or format_of(value) == default_format:
+        return None
+    return {column: encode(decode(value))}
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import json_provider
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@lru_cache(maxsize=16)
+def _file_hash(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Content hash of a file such as model weights, recomputed only when its
+# mtime or size changes
+def file_fingerprint(path):
+    st = os.stat(path)
+    return _file_hash(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+# Bounded LRU of analysis results keyed by image content hash plus pipeline
+# version, with an optional on-disk tier shared by every worker process. The
+# disk tier is bounded by disk_max_bytes: reads refresh an entry's mtime and
+# the least recently used entries are deleted after each write.
+class AnalysisResultCache:
+    def __init__(self, max_entries=256, disk_dir=None, disk_max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = json_provider.loads(f.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            # Write to a temp file and rename so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(json_provider.backend.dumps_bytes(value))
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError as e:
+                print(f"Error writing analysis cache entry: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._prune_disk()
+
+    # Delete the least recently used entries until the tier fits in
+    # disk_max_bytes. Other workers may be pruning too, so files can vanish
+    # under us.
+    def _prune_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            total += st.st_size
+        if total <= self.disk_max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.disk_max_bytes:
+                return
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _remember(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
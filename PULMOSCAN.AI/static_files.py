@@ -0,0 +1,195 @@
+import mimetypes
+import os
+import stat
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, request
+from werkzeug.exceptions import NotFound
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import wrap_file
+
+import assets
+
+# Static file serving with HTTP caching. Every response carries an ETag
+# (mtime and size), Last-Modified and Cache-Control, and conditional GETs are
+# answered with 304 before the file is opened. Small files are served from a
+# byte-bounded in-memory cache, larger ones are streamed, and with an offload
+# mode the front-end web server sends the file instead (X-Sendfile for
+# Apache/lighttpd, X-Accel-Redirect for nginx).
+#
+# Fingerprinted build outputs (see assets.py) never change: they are cached
+# as immutable, and their precompressed .br/.gz siblings are served to
+# clients whose Accept-Encoding allows it. Files under uploads/ are patient
+# X-rays: they are only cacheable by the browser (private), and the
+# content-addressed overlays under uploads/objects/ are immutable too.
+
+OFFLOAD_MODES = ('x-sendfile', 'x-accel-redirect')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Preferred first
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+# LRU of small file bodies, bounded by their total size in bytes. Entries are
+# keyed by path and only returned while mtime and size still match.
+class HotFileCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_file_bytes=512 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, version):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(path)
+            return entry[1]
+
+    def put(self, path, version, body):
+        if len(body) > self.max_file_bytes or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+            self._entries[path] = (version, body)
+            self.total_bytes += len(body)
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class StaticFiles:
+    def __init__(self, root, max_age=7 * 24 * 3600, hot_cache=None, offload=None, accel_prefix='/protected-static/',
+                 manifest=None):
+        if offload and offload not in OFFLOAD_MODES:
+            raise ValueError(f'Unknown static file offload mode: {offload}')
+        self.root = root
+        self.max_age = max_age
+        self.hot_cache = hot_cache if hot_cache is not None else HotFileCache()
+        self.offload = offload or None
+        self.accel_prefix = accel_prefix.rstrip('/') + '/'
+        self.manifest = manifest if manifest is not None else assets.load_manifest(root)
+
+    # Fingerprinted path of a logical asset name, the name itself when the
+    # asset has not been built
+    def resolve(self, name):
+        return self.manifest.get(name, name)
+
+    # Load files into the hot cache ahead of the first request, with their
+    # precompressed variants. Names go through the manifest, missing files
+    # are skipped. Returns the number of files loaded.
+    def preload(self, names):
+        loaded = 0
+        for name in names:
+            filename = self.resolve(name)
+            paths = [filename] + [filename + suffix for _, suffix in PRECOMPRESSED]
+            for path in filter(None, (safe_join(self.root, p) for p in paths)):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if self._body(path, st) is not None:
+                    loaded += 1
+        return loaded
+
+    def cache_control(self, filename):
+        if assets.is_fingerprinted(filename):
+            return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        if filename.startswith('uploads/objects/'):
+            return f'private, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        if filename.startswith('uploads/'):
+            return f'private, max-age={self.max_age}'
+        return f'public, max-age={self.max_age}'
+
+    def _headers(self, response, filename, etag, mtime):
+        response.set_etag(etag)
+        response.last_modified = mtime
+        response.headers['Cache-Control'] = self.cache_control(filename)
+        return response
+
+    # File body from the hot cache, read into it when small enough
+    def _body(self, path, st):
+        version = (st.st_mtime_ns, st.st_size)
+        body = self.hot_cache.get(path, version)
+        if body is None and st.st_size <= self.hot_cache.max_file_bytes:
+            with open(path, 'rb') as f:
+                body = f.read()
+            self.hot_cache.put(path, version, body)
+        return body
+
+    # Best precompressed variant the client accepts, as (encoding, file name,
+    # path, stat), and whether the file has any variants at all
+    def _negotiate(self, filename, path):
+        has_variants = False
+        for encoding, suffix in PRECOMPRESSED:
+            try:
+                st = os.stat(path + suffix)
+            except OSError:
+                continue
+            has_variants = True
+            if request.accept_encodings[encoding]:
+                return (encoding, filename + suffix, path + suffix, st), True
+        return None, has_variants
+
+    def serve(self, filename):
+        path = safe_join(self.root, filename)
+        if path is None:
+            raise NotFound()
+        try:
+            st = os.stat(path)
+        except OSError:
+            raise NotFound()
+        if not stat.S_ISREG(st.st_mode):
+            raise NotFound()
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        cache_filename = filename
+        encoding = None
+        vary = False
+        if assets.is_fingerprinted(filename):
+            variant, vary = self._negotiate(filename, path)
+            if variant:
+                encoding, filename, path, st = variant
+
+        etag = f'{st.st_mtime_ns:x}-{st.st_size:x}' + (f'-{encoding}' if encoding else '')
+        mtime = datetime.fromtimestamp(int(st.st_mtime), timezone.utc)
+        response_class = current_app.response_class
+
+        def finish(response):
+            self._headers(response, cache_filename, etag, mtime)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            if vary:
+                response.vary.add('Accept-Encoding')
+            return response
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=mtime):
+            return finish(response_class(status=304))
+
+        if self.offload == 'x-sendfile':
+            response = response_class(mimetype=mimetype)
+            response.headers['X-Sendfile'] = os.path.abspath(path)
+            return finish(response)
+        if self.offload == 'x-accel-redirect':
+            response = response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = self.accel_prefix + filename
+            return finish(response)
+
+        body = self._body(path, st)
+        if body is not None:
+            response = response_class(body, mimetype=mimetype)
+        else:
+            response = response_class(wrap_file(request.environ, open(path, 'rb')), mimetype=mimetype,
+                                      direct_passthrough=True)
+            response.content_length = st.st_size
+        finish(response)
+        return response.make_conditional(request, accept_ranges=True, complete_length=st.st_size)
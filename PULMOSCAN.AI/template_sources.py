@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import threading
+
+from flask import current_app, request
+from werkzeug.exceptions import NotFound
+from werkzeug.http import is_resource_modified
+
+# Raw Jinja template sources served to clients (/get_html_template and
+# friends). The sources live in templates/sources/ and are read through the
+# app's Jinja loader, so they are file-backed like the rendered templates.
+# Each one is held in memory with a content ETag and a gzip copy computed
+# once, and reloaded when the loader reports the file changed. Responses
+# must be revalidated, which the ETag turns into a 304 on repeat fetches.
+
+SOURCES_DIR = 'sources'
+CACHE_CONTROL = 'no-cache'
+
+
+class TemplateSources:
+    def __init__(self, env, names):
+        self.env = env
+        self.names = frozenset(names)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        source, _, uptodate = self.env.loader.get_source(self.env, f'{SOURCES_DIR}/{name}.html')
+        body = source.encode()
+        etag = hashlib.sha256(body).hexdigest()[:16]
+        return body, gzip.compress(body, compresslevel=9, mtime=0), etag, uptodate
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None or (entry[3] is not None and not entry[3]()):
+            with self._lock:
+                entry = self._entries[name] = self._load(name)
+        return entry
+
+    # Load every source ahead of the first request
+    def preload(self):
+        for name in self.names:
+            self._entry(name)
+
+    def response(self, name):
+        if name not in self.names:
+            raise NotFound()
+        body, gzipped, etag, _ = self._entry(name)
+        if request.accept_encodings['gzip']:
+            body, etag, encoding = gzipped, f'{etag}-gzip', 'gzip'
+        else:
+            encoding = None
+
+        response_class = current_app.response_class
+        if not is_resource_modified(request.environ, etag=etag):
+            response = response_class(status=304)
+        else:
+            response = response_class(body, mimetype='text/html')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,67 @@
+import importlib
+import os
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+# The app modules are imported top-level, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import records  # noqa: E402
+
+
+# app.py opens pulmoscan.db and its upload and cache folders relative to the
+# working directory, so the whole session runs in a scratch directory
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        module = importlib.import_module('app')
+        module.app.config['TESTING'] = True
+        yield module
+    finally:
+        os.chdir(cwd)
+
+
+# Empty tables and cache for every test
+@pytest.fixture
+def app_db(app_module):
+    conn = app_module.create_connection()
+    for table in ('patients', 'healthcare_workers', 'patient_records', 'reports', 'notifications', 'blob_refs'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.commit()
+    app_module.cache.clear()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(app_module, app_db):
+    return app_module.app.test_client()
+
+
+def add_user(conn, table, email, name, password='secret'):
+    conn.execute(f'INSERT INTO {table} (email, name, password) VALUES (?, ?, ?)',
+                 (email, name, generate_password_hash(password)))
+    conn.commit()
+
+
+def add_record(conn, record_id, patient_email, status='pending', created_at='2025-01-01 00:00:00'):
+    report_data = {
+        'id': record_id,
+        'patient_email': patient_email,
+        'patient_name': patient_email.split('@')[0],
+        'xray_data': {'image_path': f'/static/uploads/{record_id}.jpg', 'tb_probability': 0.5, 'infected_areas': []},
+    }
+    conn.execute('INSERT INTO patient_records (id, patient_email, report_type, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                 (record_id, patient_email, 'xray', status, created_at))
+    records.save_report_data(conn.cursor(), record_id, report_data)
+    conn.commit()
+
+
+def login(client, email, password='secret'):
+    response = client.post('/login', data={'email': email, 'password': password})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,103 @@
+import io
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import analysis_jobs
+import report_format
+from conftest import add_user
+from test_xray_pipeline import film
+
+
+@pytest.fixture
+def jobs(app_module, app_db):
+    queue = analysis_jobs.AnalysisQueue(app_module.app.config['DATABASE'], app_module.overlay_store, max_workers=1,
+                                        db_pragmas=app_module.app.config['DB_PRAGMAS'])
+    add_user(app_db, 'patients', 'patient@example.com', 'Patient')
+    yield queue
+    queue.shutdown()
+
+
+def add_report(conn, report_id, **data):
+    report_data = dict({'report_id': report_id, 'analysis_status': analysis_jobs.PENDING}, **data)
+    conn.execute('INSERT INTO reports (report_id, patient_email, report_type, status, data, upload_date) '
+                 'VALUES (?, ?, ?, ?, ?, ?)', (report_id, 'patient@example.com', 'xray', 'pending',
+                                               report_format.encode(report_data), '2025-01-01 00:00:00'))
+    conn.commit()
+
+
+def analysis_state(conn, report_id):
+    (data,) = conn.execute('SELECT data FROM reports WHERE report_id = ?', (report_id,)).fetchone()
+    report_data = report_format.decode(data)
+    return report_data['analysis_status'], report_data.get('analysis_error')
+
+
+def crash_worker(jobs):
+    return jobs._get_executor().submit(os._exit, 1)
+
+
+def test_crashed_worker_fails_its_pool_and_a_new_one_takes_over(jobs, app_db):
+    add_report(app_db, 'RPT1')
+    add_report(app_db, 'RPT2')
+
+    crashed = crash_worker(jobs)
+    lost = jobs.submit('RPT1', film(300))
+    with pytest.raises(BrokenProcessPool):
+        crashed.result(timeout=60)
+    with pytest.raises(BrokenProcessPool):
+        lost.result(timeout=60)
+    status, error = analysis_state(app_db, 'RPT1')
+    assert status == analysis_jobs.FAILED and error
+
+    jobs.submit('RPT2', film(300)).result(timeout=60)
+    assert analysis_state(app_db, 'RPT2') == (analysis_jobs.DONE, None)
+
+
+def test_report_fails_when_the_job_cannot_be_queued(jobs, app_db, monkeypatch):
+    add_report(app_db, 'RPT1')
+
+    def broken():
+        raise OSError('no more processes')
+    monkeypatch.setattr(jobs, '_get_executor', broken)
+    with pytest.raises(OSError):
+        jobs.submit('RPT1', film(300))
+    assert analysis_state(app_db, 'RPT1') == (analysis_jobs.FAILED, 'Could not queue the analysis: no more processes')
+
+
+def test_requeue_unfinished_analyses_from_stored_uploads(app_module, jobs, app_db):
+    digest, _, _ = app_module.upload_store.write(lambda sink: sink.write(film(300)))
+    add_report(app_db, 'RPT1', upload_hash=digest)
+    add_report(app_db, 'RPT2', analysis_status=analysis_jobs.RUNNING, upload_hash=digest)
+    add_report(app_db, 'RPT3')
+    add_report(app_db, 'RPT4', analysis_status=analysis_jobs.DONE)
+
+    assert analysis_jobs.requeue_unfinished(app_db, jobs, app_module.upload_store) == (2, 1)
+    assert analysis_state(app_db, 'RPT1') == (analysis_jobs.DONE, None)
+    assert analysis_state(app_db, 'RPT2') == (analysis_jobs.DONE, None)
+    assert analysis_state(app_db, 'RPT3')[0] == analysis_jobs.FAILED
+    assert analysis_state(app_db, 'RPT4') == (analysis_jobs.DONE, None)
+
+
+def test_upload_keeps_the_film_for_requeueing(app_module, jobs, client, app_db):
+    with client.session_transaction() as session:
+        session['email'] = 'patient@example.com'
+    data = film(320)
+    try:
+        response = client.post('/upload_report', data={'xray': (io.BytesIO(data), 'film.png')})
+        assert response.status_code == 200
+        report_id = response.get_json()['report_id']
+
+        deadline = time.monotonic() + 60
+        while analysis_state(app_db, report_id)[0] in (analysis_jobs.PENDING, analysis_jobs.RUNNING):
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+    finally:
+        app_module.get_analysis_queue().shutdown()
+
+    (stored,) = app_db.execute('SELECT data FROM reports WHERE report_id = ?', (report_id,)).fetchone()
+    report_data = report_format.decode(stored)
+    assert report_data['analysis_status'] == analysis_jobs.DONE
+    with open(app_module.upload_store.path(report_data['upload_hash']), 'rb') as f:
+        assert f.read() == data
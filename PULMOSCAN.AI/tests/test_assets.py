@@ -0,0 +1,17 @@
+import assets
+
+
+def test_build_fingerprints_and_precompresses(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'styles.css').write_text('body { color: #333; }\n' * 100)
+    (tmp_path / 'uploads').mkdir()
+    (tmp_path / 'uploads' / 'xray.jpg').write_bytes(b'patient upload')
+
+    manifest = assets.build(str(tmp_path))
+
+    assert list(manifest) == ['css/styles.css']
+    built = manifest['css/styles.css']
+    assert assets.is_fingerprinted(built)
+    assert (tmp_path / (built + '.gz')).exists()
+    assert assets.load_manifest(str(tmp_path)) == manifest
+    assert not assets.is_fingerprinted(f'{assets.BUILD_DIR}/{assets.MANIFEST_NAME}')
@@ -0,0 +1,60 @@
+import os
+import shutil
+import sqlite3
+
+import blob_store
+import migrations
+import report_format
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The shipped records point at their overlays as static/uploads\<name>
+def test_migrate_uploads_repoints_baseline_records(tmp_path):
+    shutil.copyfile(os.path.join(APP_DIR, 'pulmoscan.db'), tmp_path / 'pulmoscan.db')
+    upload_folder = tmp_path / 'uploads'
+    shutil.copytree(os.path.join(APP_DIR, 'static', 'uploads'), upload_folder,
+                    ignore=shutil.ignore_patterns('objects'))
+    (upload_folder / 'unreferenced.jpg').write_bytes(b'not an overlay of any report')
+
+    conn = sqlite3.connect(tmp_path / 'pulmoscan.db')
+    migrations.run_migrations(conn)
+    legacy_names = {path.replace('\\', '/').rsplit('/', 1)[-1]
+                    for (path,) in conn.execute('SELECT image_path FROM patient_records WHERE image_path IS NOT NULL')}
+    uploaded_names = {p.name for p in upload_folder.glob('*.jpg')}
+    store = blob_store.BlobStore(str(upload_folder / 'objects'), '/static/uploads/objects')
+    moved, unique = blob_store.migrate_uploads(conn, store, str(upload_folder), '/static/uploads')
+
+    rows = conn.execute('SELECT report_data, image_path FROM patient_records').fetchall()
+    referenced = {}
+    for data, image_path in rows:
+        xray_data = report_format.decode(data).get('xray_data')
+        if not xray_data:
+            continue
+        assert xray_data['image_path'] == image_path == store.url(xray_data['image_hash'])
+        assert store.exists(xray_data['image_hash'])
+        referenced[xray_data['image_hash']] = referenced.get(xray_data['image_hash'], 0) + 1
+
+    assert moved == len(legacy_names) > 0
+    assert unique == len(referenced)
+    assert dict(conn.execute('SELECT hash, refcount FROM blob_refs')) == referenced
+    assert {p.name for p in upload_folder.glob('*.jpg')} == uploaded_names - legacy_names
+    assert 'unreferenced.jpg' in uploaded_names - legacy_names
+
+    # Nothing left to repoint on a second run
+    assert blob_store.migrate_uploads(conn, store, str(upload_folder), '/static/uploads') == (0, 0)
+
+
+def test_partial_writes_stay_outside_the_store(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path / 'static' / 'objects'), '/static/objects', tmp_dir=str(tmp_path / 'tmp'))
+    seen = []
+
+    def produce(sink):
+        sink.write(b'overlay')
+        seen.extend(os.listdir(tmp_path / 'tmp'))
+
+    digest, size, _ = store.write(produce)
+    assert len(seen) == 1
+    assert size == len(b'overlay') and store.exists(digest)
+    assert os.listdir(tmp_path / 'tmp') == []
+    assert not (tmp_path / 'static' / 'objects' / 'tmp').exists()
@@ -0,0 +1,45 @@
+import fakeredis
+from flask_caching.backends.filesystemcache import FileSystemCache
+from flask_caching.backends.rediscache import RedisCache
+
+import cache_tiers
+
+
+# Two workers sharing one L2: a version stamp written by one is seen by the
+# other at once, while its L1 copy of an ordinary key lives on until it
+# expires
+def assert_shared_invalidation(first, second):
+    first.set('data_version/reports', 'v1')
+    first.set('dashboard/v1', 'old page')
+    assert second.get('dashboard/v1') == 'old page'
+
+    second.set('data_version/reports', 'v2')
+    assert first.get('data_version/reports') == 'v2'
+
+    second.delete('dashboard/v1')
+    assert first.get('dashboard/v1') == 'old page'
+    first.local.clear()
+    assert first.get('dashboard/v1') is None
+
+
+def tiered(shared):
+    return cache_tiers.TieredCache(shared, shared_only_prefixes=['data_version/'])
+
+
+def test_filesystem_l2_invalidation(tmp_path):
+    assert_shared_invalidation(tiered(FileSystemCache(str(tmp_path))), tiered(FileSystemCache(str(tmp_path))))
+
+
+def test_redis_l2_invalidation():
+    server = fakeredis.FakeServer()
+    assert_shared_invalidation(tiered(RedisCache(fakeredis.FakeRedis(server=server))),
+                               tiered(RedisCache(fakeredis.FakeRedis(server=server))))
+
+
+def test_redis_client_factory():
+    cache = cache_tiers.TieredCache.factory(None, {
+        'CACHE_SHARED_TYPE': 'redis',
+        'CACHE_REDIS_CLIENT_FACTORY': 'fakeredis:FakeRedis',
+    }, [], {})
+    cache.set('dashboard/v1', 'page')
+    assert cache.shared.get('dashboard/v1') == 'page'
@@ -0,0 +1,89 @@
+import gzip
+
+import brotli
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Request, Response
+
+import compression
+
+PAGE = '<html>' + 'pulmoscan ' * 500 + '</html>'
+
+
+@Request.application
+def app(request):
+    if request.path == '/small':
+        return Response('<p>hi</p>', mimetype='text/html')
+    if request.path == '/encoded':
+        return Response(gzip.compress(PAGE.encode()), mimetype='text/html', headers={'Content-Encoding': 'gzip'})
+    if request.path == '/image':
+        return Response(b'\x89PNG' * 1000, mimetype='image/png')
+    if request.path == '/stream':
+        return Response((PAGE for _ in range(100)), mimetype='text/html')
+    response = Response(PAGE, mimetype='text/html')
+    response.set_etag('page')
+    return response
+
+
+@pytest.fixture
+def client():
+    middleware = compression.CompressionMiddleware(app, min_size=500, stream_threshold=64 * 1024,
+                                                   cache_paths=['/'])
+    return Client(middleware, Response)
+
+
+def get(client, path, accept_encoding=None, method='GET'):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    return client.open(path, method=method, headers=headers)
+
+
+def test_brotli_preferred(client):
+    response = get(client, '/', 'gzip, br')
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data).decode() == PAGE
+    assert response.headers['Content-Length'] == str(len(response.data))
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"page"'
+
+
+def test_gzip(client):
+    response = get(client, '/', 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == PAGE
+
+
+@pytest.mark.parametrize('accept_encoding', [None, 'identity', 'gzip;q=0'])
+def test_identity_still_varies(client, accept_encoding):
+    response = get(client, '/', accept_encoding)
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == PAGE
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_head_passes_through(client):
+    response = get(client, '/', 'gzip, br', method='HEAD')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Content-Length'] == str(len(PAGE))
+
+
+@pytest.mark.parametrize('path', ['/small', '/encoded', '/image'])
+def test_skipped_responses(client, path):
+    plain = get(client, path)
+    response = get(client, path, 'gzip, br')
+    assert response.headers.get('Content-Encoding') == plain.headers.get('Content-Encoding')
+    assert response.data == plain.data
+
+
+def test_large_bodies_are_streamed(client):
+    response = get(client, '/stream', 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data).decode() == PAGE * 100
+
+
+def test_cached_paths_reuse_compressed_body(client):
+    first = get(client, '/', 'gzip')
+    middleware = client.application
+    cached = middleware._cache[('/', 'gzip')][1]
+    assert get(client, '/', 'gzip').data == first.data == cached
+    assert middleware._cache[('/', 'gzip')][1] is cached
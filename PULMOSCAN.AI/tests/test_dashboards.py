@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import add_record, add_user, login
+
+ACCEPTED_SECTION = 'Manage your accepted patients'
+
+
+def pending_and_accepted(client):
+    response = client.get('/healthcare_dashboard')
+    assert response.status_code == 200
+    pending, accepted = response.get_data(as_text=True).split(ACCEPTED_SECTION)
+    return pending, accepted
+
+
+def card(record_id):
+    return f'data-record-id="{record_id}"'
+
+
+def test_patient_dashboards_are_cached_per_user(app_module, app_db):
+    add_user(app_db, 'patients', 'alice@example.com', 'Alice Example')
+    add_user(app_db, 'patients', 'bob@example.com', 'Bob Example')
+    alice = login(app_module.app.test_client(), 'alice@example.com')
+    bob = login(app_module.app.test_client(), 'bob@example.com')
+
+    # Twice each, the second read comes from the cache
+    for _ in range(2):
+        page = alice.get('/patient_dashboard').get_data(as_text=True)
+        assert 'Alice Example' in page and 'Bob Example' not in page
+        page = bob.get('/patient_dashboard').get_data(as_text=True)
+        assert 'Bob Example' in page and 'Alice Example' not in page
+
+
+@pytest.fixture
+def doctor(client, app_db):
+    add_user(app_db, 'healthcare_workers', 'doctor@example.com', 'Doctor')
+    add_user(app_db, 'patients', 'patient@example.com', 'Patient')
+    add_record(app_db, 'RPT1', 'patient@example.com', created_at='2025-01-01 00:00:01')
+    add_record(app_db, 'RPT2', 'patient@example.com', created_at='2025-01-01 00:00:02')
+    return login(client, 'doctor@example.com')
+
+
+def test_accept_updates_cached_dashboard(doctor):
+    pending, accepted = pending_and_accepted(doctor)
+    assert card('RPT1') in pending and card('RPT1') not in accepted
+
+    assert doctor.post('/accept_report', json={'report_id': 'RPT1'}).get_json()['success']
+    pending, accepted = pending_and_accepted(doctor)
+    assert card('RPT1') not in pending and card('RPT1') in accepted
+
+
+def test_reject_updates_cached_dashboard(doctor):
+    pending, _ = pending_and_accepted(doctor)
+    assert card('RPT2') in pending
+
+    assert doctor.post('/reject_report', json={'report_id': 'RPT2'}).get_json()['success']
+    pending, accepted = pending_and_accepted(doctor)
+    assert card('RPT2') not in pending and card('RPT2') not in accepted
+    assert card('RPT1') in pending
@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import inference
+
+
+class CountingBackend:
+    name = 'counting'
+    batches = []
+
+    def predict_batch(self, batch):
+        CountingBackend.batches.append(len(batch))
+        time.sleep(0.01)
+        return [tensor * 2 for tensor in batch]
+
+
+@pytest.fixture
+def counting_backend(monkeypatch):
+    CountingBackend.batches = []
+    monkeypatch.setitem(inference.BACKENDS, CountingBackend.name, CountingBackend)
+    return CountingBackend
+
+
+# The server and its workers run as threads here; the queues have the same
+# interface as the multiprocessing ones the analysis pool uses
+def test_concurrent_predictions_share_forward_passes(counting_backend):
+    workers = 8
+    requests = queue.Queue()
+    responses = [queue.Queue() for _ in range(workers)]
+    server = threading.Thread(target=inference.serve, args=(
+        {'backend': 'counting', 'max_batch_size': workers, 'max_wait_ms': 50}, requests, responses))
+    server.start()
+
+    results = {}
+    start = threading.Barrier(workers)
+
+    def worker(slot):
+        engine = inference.create_engine('counting', predictor=inference.RemotePredictor(requests, responses[slot], slot))
+        start.wait()
+        results[slot] = engine.predict(slot)
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    requests.put(None)
+    server.join()
+
+    assert results == {slot: slot * 2 for slot in range(workers)}
+    assert sum(counting_backend.batches) == workers
+    assert len(counting_backend.batches) < workers
+
+
+def test_remote_errors_reach_the_caller(counting_backend, monkeypatch):
+    def fail(self, batch):
+        raise RuntimeError('out of memory')
+    monkeypatch.setattr(CountingBackend, 'predict_batch', fail)
+    requests, responses = queue.Queue(), queue.Queue()
+    server = threading.Thread(target=inference.serve, args=({'backend': 'counting'}, requests, [responses]))
+    server.start()
+
+    with pytest.raises(inference.InferenceError, match='RuntimeError: out of memory'):
+        inference.RemotePredictor(requests, responses, 0)(1)
+    requests.put(None)
+    server.join()
+
+
+def test_densenet_requires_weights():
+    with pytest.raises(ValueError):
+        inference.create_engine('densenet121')
@@ -0,0 +1,49 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import migrations
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DB = os.path.join(APP_DIR, 'pulmoscan.db')
+
+
+def baseline_copy(tmp_path):
+    path = str(tmp_path / 'pulmoscan.db')
+    shutil.copyfile(BASELINE_DB, path)
+    return sqlite3.connect(path)
+
+
+# The shipped database predates schema_version and stores infected areas as
+# {x, y, radius} without a severity
+def test_migrations_upgrade_baseline_db(tmp_path):
+    conn = baseline_copy(tmp_path)
+    applied = migrations.run_migrations(conn, chunk_size=5)
+    assert applied == [number for number, _, _ in migrations.MIGRATIONS]
+
+    rows = conn.execute('SELECT patient_name, tb_probability, severity, image_path FROM patient_records').fetchall()
+    assert rows
+    xray_rows = [row for row in rows if row[3] is not None]
+    assert xray_rows
+    for patient_name, tb_probability, severity, _ in xray_rows:
+        assert patient_name
+        assert tb_probability is not None
+        assert severity is None
+
+    assert migrations.run_migrations(conn) == []
+
+
+def test_failing_backfill_names_the_migration(tmp_path, monkeypatch):
+    conn = baseline_copy(tmp_path)
+
+    def fail(row):
+        raise ValueError('bad report_data')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:8] + [
+        (9, 'backfill patient_records summary columns', migrations.Backfill('patient_records', ['report_data'], fail)),
+    ])
+    with pytest.raises(migrations.MigrationError, match=r'Migration 9 \(backfill patient_records summary columns\)'):
+        migrations.run_migrations(conn)
+    assert migrations.current_version(conn) == 8
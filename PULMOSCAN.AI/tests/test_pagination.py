@@ -0,0 +1,65 @@
+import pytest
+
+import pagination
+from conftest import add_record, add_user, login
+
+
+def test_cursor_round_trip():
+    token = pagination.encode_cursor('2025-01-01 00:00:00', 'RPT1')
+    assert pagination.decode_cursor(token) == ('2025-01-01 00:00:00', 'RPT1')
+
+
+@pytest.mark.parametrize('token', ['zzz', pagination.encode_cursor('a', 'b')[:-2], 'WzEsMl0'])
+def test_invalid_cursor(token):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(token)
+
+
+def test_split_page():
+    rows = [('2025-01-03', 'c'), ('2025-01-02', 'b'), ('2025-01-01', 'a')]
+    assert pagination.split_page(rows, 3, 0, 1) == (rows, None)
+    page, cursor = pagination.split_page(rows, 2, 0, 1)
+    assert page == rows[:2]
+    assert pagination.decode_cursor(cursor) == ('2025-01-02', 'b')
+
+
+@pytest.fixture
+def pending_reports(client, app_db):
+    add_user(app_db, 'healthcare_workers', 'doctor@example.com', 'Doctor')
+    add_user(app_db, 'patients', 'patient@example.com', 'Patient')
+    # Rows sharing a created_at are ordered by id
+    created = ['2025-01-01 00:00:00'] * 4 + ['2025-01-02 00:00:00'] * 3 + ['2025-01-03 00:00:00']
+    for i, created_at in enumerate(created):
+        add_record(app_db, f'RPT{i}', 'patient@example.com', created_at=created_at)
+    add_record(app_db, 'RPT-accepted', 'patient@example.com', status='accepted')
+    login(client, 'doctor@example.com')
+    return sorted(((created_at, f'RPT{i}') for i, created_at in enumerate(created)), reverse=True)
+
+
+def test_pending_reports_pages(client, pending_reports):
+    seen = []
+    cursor = None
+    for _ in range(len(pending_reports)):
+        query = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+        body = client.get('/get_pending_reports', query_string=query).get_json()
+        assert body['success']
+        assert len(body['reports']) <= 3
+        seen.extend((report['date'], report['id']) for report in body['reports'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == pending_reports
+    assert cursor is None
+
+
+def test_exact_last_page_has_no_cursor(client, pending_reports):
+    body = client.get('/get_pending_reports', query_string={'limit': len(pending_reports)}).get_json()
+    assert len(body['reports']) == len(pending_reports)
+    assert body['next_cursor'] is None
+
+
+@pytest.mark.parametrize('query', [{'cursor': 'zzz'}, {'limit': 'x'}, {'limit': 0}])
+def test_bad_page_parameters(client, pending_reports, query):
+    response = client.get('/get_pending_reports', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
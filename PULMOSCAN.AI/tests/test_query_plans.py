@@ -0,0 +1,20 @@
+import sqlite3
+
+import pytest
+
+import db
+import migrations
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'pulmoscan.db')
+    migrations.run_migrations(conn)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes(app_module, conn):
+    assert app_module.HOT_QUERIES
+    for name, (sql, params) in app_module.HOT_QUERIES.items():
+        assert db.full_scan_steps(conn, sql, params) == [], name
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+import report_format
+
+REPORT = {
+    'id': 'RPT1',
+    'patient_name': 'Patient',
+    'xray_data': {
+        'image_path': '/static/uploads/objects/ab/cd/abcd.jpg',
+        'tb_probability': 0.8991222457994487,
+        'infected_areas': [
+            {'x': 50.5, 'y': 55.75, 'area': 16933.0, 'severity': 0.9},
+            {'x': np.float64(12.25), 'y': 7, 'area': 120.5, 'severity': 0.3},
+        ],
+    },
+    'sputum_data': None,
+    'history': [{'infected_areas': [{'x': 1, 'y': 2, 'area': 3, 'severity': 0.1}]}],
+}
+
+
+def test_packed_round_trip():
+    packed = report_format.encode(REPORT, report_format.FORMAT_PACKED)
+    assert isinstance(packed, bytes)
+    assert report_format.format_of(packed) == report_format.FORMAT_PACKED
+
+    decoded = report_format.decode(packed)
+    assert decoded == json.loads(json.dumps(REPORT, default=float))
+    assert decoded['xray_data']['infected_areas'][0]['severity'] == 0.9
+
+
+def test_packed_is_smaller():
+    areas = [{'x': i * 1.5, 'y': i * 2.5, 'area': i * 10.0, 'severity': i / 100} for i in range(100)]
+    report = {'xray_data': {'infected_areas': areas}}
+    assert len(report_format.encode(report, report_format.FORMAT_PACKED)) < len(report_format.encode(report, 'json')) / 2
+
+
+def test_float32_precision():
+    report = {'xray_data': {'infected_areas': [{'x': 50.49019607843137, 'y': 0.0, 'area': 1.0, 'severity': 0.1}]}}
+    area = report_format.decode(report_format.encode(report, report_format.FORMAT_PACKED))['xray_data']['infected_areas'][0]
+    assert area['x'] == pytest.approx(50.49019607843137, rel=1e-6)
+
+
+# Rows written before the packed format, as text or as bytes
+@pytest.mark.parametrize('stored', [
+    json.dumps({'xray_data': {'infected_areas': [{'x': 87, 'y': 73, 'radius': 20}]}}),
+    json.dumps({'xray_data': {'infected_areas': [{'x': 87, 'y': 73, 'radius': 20}]}}).encode(),
+])
+def test_json_rows_still_read(stored):
+    assert report_format.format_of(stored) == report_format.FORMAT_JSON
+    assert report_format.decode(stored) == {'xray_data': {'infected_areas': [{'x': 87, 'y': 73, 'radius': 20}]}}
+
+
+# Areas that do not have exactly the packed fields stay in the JSON header
+def test_unpackable_areas_are_kept():
+    report = {'xray_data': {'infected_areas': [{'x': 87, 'y': 73, 'radius': 20}]}}
+    assert report_format.decode(report_format.encode(report, report_format.FORMAT_PACKED)) == report
+
+
+def test_repack_skips_rows_in_the_default_format(monkeypatch):
+    monkeypatch.setattr(report_format, 'default_format', report_format.FORMAT_PACKED)
+    stored = json.dumps(REPORT, default=float)
+    repacked = report_format.repack('report_data', stored)['report_data']
+    assert report_format.format_of(repacked) == report_format.FORMAT_PACKED
+    assert report_format.repack('report_data', repacked) is None
+    assert report_format.repack('report_data', None) is None
@@ -0,0 +1,38 @@
+import os
+
+import result_cache
+
+
+def entry_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.json'))
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    value = {'tb_probability': 0.5, 'infected_areas': [{'x': 1.0, 'y': 2.0, 'area': 3.0, 'severity': 0.5}] * 20}
+    cache = result_cache.AnalysisResultCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=10 ** 9)
+    cache.put('a', value)
+    entry_size = os.path.getsize(tmp_path / 'a.json')
+
+    cache = result_cache.AnalysisResultCache(max_entries=1, disk_dir=str(tmp_path),
+                                             disk_max_bytes=3 * entry_size)
+    cache.put('b', value)
+    cache.put('c', value)
+    # Age every entry, then read 'a' so it becomes the most recently used
+    for i, name in enumerate(('a', 'b', 'c')):
+        os.utime(tmp_path / f'{name}.json', (1000 + i, 1000 + i))
+    reader = result_cache.AnalysisResultCache(disk_dir=str(tmp_path), disk_max_bytes=3 * entry_size)
+    assert reader.get('a') == value
+
+    cache.put('d', value)
+    assert entry_files(tmp_path) == ['a.json', 'c.json', 'd.json']
+    assert sum(os.path.getsize(tmp_path / name) for name in entry_files(tmp_path)) <= 3 * entry_size
+
+
+def test_file_fingerprint_follows_content(tmp_path):
+    weights = tmp_path / 'weights.pth'
+    weights.write_bytes(b'first')
+    first = result_cache.file_fingerprint(str(weights))
+    assert result_cache.file_fingerprint(str(weights)) == first
+
+    weights.write_bytes(b'second weights')
+    assert result_cache.file_fingerprint(str(weights)) != first
@@ -0,0 +1,86 @@
+import pytest
+from flask import Flask
+
+import static_files
+
+
+@pytest.fixture
+def static_root(tmp_path):
+    root = tmp_path / 'static'
+    (root / 'css').mkdir(parents=True)
+    (root / 'css' / 'styles.css').write_text('body { color: #333; }\n')
+    (root / 'uploads').mkdir()
+    (root / 'uploads' / 'xray.jpg').write_bytes(b'\xff\xd8' + b'x' * 2048)
+    (tmp_path / 'secret.txt').write_text('not public')
+    return root
+
+
+@pytest.fixture
+def static(static_root):
+    return static_files.StaticFiles(str(static_root), max_age=60,
+                                    hot_cache=static_files.HotFileCache(max_bytes=4096, max_file_bytes=1024),
+                                    manifest={})
+
+
+@pytest.fixture
+def client(static):
+    app = Flask(__name__, static_folder=None)
+    app.add_url_rule('/static/<path:filename>', 'static', static.serve)
+    return app.test_client()
+
+
+def test_etag_and_304(client):
+    response = client.get('/static/css/styles.css')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+    assert response.headers['Last-Modified']
+    etag = response.headers['ETag']
+
+    response = client.get('/static/css/styles.css', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_uploads_are_private(client):
+    response = client.get('/static/uploads/xray.jpg')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'].startswith('private')
+
+
+@pytest.mark.parametrize('path', ['/static/../secret.txt', '/static/..%2fsecret.txt', '/static/css/../../secret.txt',
+                                  '/static/missing.css', '/static/css'])
+def test_not_found(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_small_files_are_cached_and_large_ones_streamed(client, static, static_root):
+    client.get('/static/css/styles.css')
+    client.get('/static/uploads/xray.jpg')
+    assert len(static.hot_cache) == 1
+    assert static.hot_cache.total_bytes == (static_root / 'css' / 'styles.css').stat().st_size
+
+
+def test_hot_cache_byte_bound():
+    cache = static_files.HotFileCache(max_bytes=1000, max_file_bytes=400)
+    for i in range(5):
+        cache.put(f'/f{i}', (i, 300), b'x' * 300)
+    assert cache.total_bytes == 900
+    assert cache.get('/f0', (0, 300)) is None
+    assert cache.get('/f4', (4, 300)) is not None
+
+    # Least recently used goes first
+    cache.get('/f2', (2, 300))
+    cache.put('/f5', (5, 300), b'x' * 300)
+    assert cache.get('/f2', (2, 300)) is not None
+    assert cache.get('/f3', (3, 300)) is None
+
+    cache.put('/big', (0, 500), b'x' * 500)
+    assert cache.get('/big', (0, 500)) is None
+    assert cache.total_bytes <= 1000
+
+
+def test_hot_cache_ignores_stale_versions():
+    cache = static_files.HotFileCache()
+    cache.put('/f', (1, 3), b'old')
+    assert cache.get('/f', (2, 3)) is None
@@ -0,0 +1,71 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask
+
+import template_sources
+
+SOURCE = '<h1>Welcome, {{ patient.name }}</h1>\n' * 50
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / 'sources').mkdir()
+    (tmp_path / 'sources' / 'register.html').write_text(SOURCE)
+    return tmp_path
+
+
+@pytest.fixture
+def client(templates):
+    app = Flask(__name__, template_folder=str(templates), static_folder=None)
+    sources = template_sources.TemplateSources(app.jinja_env, ['register'])
+    sources.preload()
+    app.add_url_rule('/source/<name>', 'source', sources.response)
+    return app.test_client()
+
+
+def test_source_served_raw(client):
+    response = client.get('/source/register')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/html'
+    assert response.get_data(as_text=True) == SOURCE
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_repeat_fetch_is_304(client):
+    etag = client.get('/source/register').headers['ETag']
+    response = client.get('/source/register', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+def test_gzip(client):
+    plain = client.get('/source/register')
+    response = client.get('/source/register', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == SOURCE
+    assert response.headers['ETag'] != plain.headers['ETag']
+
+    repeat = client.get('/source/register', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert repeat.status_code == 304
+
+
+def test_changed_file_gets_a_new_etag(client, templates):
+    etag = client.get('/source/register').headers['ETag']
+    path = templates / 'sources' / 'register.html'
+    path.write_text(SOURCE + '<footer></footer>\n')
+    mtime = os.stat(path).st_mtime + 10
+    os.utime(path, (mtime, mtime))
+
+    response = client.get('/source/register', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).endswith('<footer></footer>\n')
+
+
+def test_unknown_source(client):
+    assert client.get('/source/secret').status_code == 404
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+import xray_pipeline
+
+
+# A film with separate lesions, a ring whose hole holds a bright island
+# (nested contours) and some noise
+def film(size=900):
+    rng = np.random.default_rng(0)
+    img = rng.normal(60, 12, (size, size)).clip(0, 255).astype(np.uint8)
+    cv2.ellipse(img, (200, 220), (90, 50), 20, 0, 360, 210, -1)
+    cv2.circle(img, (600, 300), 130, 230, -1)
+    cv2.circle(img, (600, 300), 80, 40, -1)
+    cv2.circle(img, (600, 300), 35, 250, -1)
+    cv2.rectangle(img, (150, 600), (420, 780), 190, -1)
+    cv2.circle(img, (700, 700), 60, 175, -1)
+    _, encoded = cv2.imencode('.png', cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    return encoded.tobytes()
+
+
+# The per-contour loop region_intensities replaced: a full-frame mask and
+# cv2.mean for every region, and the heatmap drawn contour by contour
+def per_mask_intensities(image, contours, hierarchy, indices):
+    labels = np.zeros(image.shape[:2], np.uint8)
+    means = []
+    for index in indices:
+        mask = np.zeros(image.shape[:2], np.uint8)
+        cv2.drawContours(mask, [contours[index]], -1, 255, -1)
+        means.append(cv2.mean(image, mask=mask)[0])
+        cv2.drawContours(labels, [contours[index]], -1, 1, -1)
+    return labels, means
+
+
+@pytest.mark.parametrize('resolution', [None, 'preview'])
+def test_matches_per_mask_loop(monkeypatch, resolution):
+    data = film()
+    result = xray_pipeline.process_xray_and_highlight(data, resolution=resolution)
+
+    monkeypatch.setattr(xray_pipeline, 'region_intensities', per_mask_intensities)
+    expected = xray_pipeline.process_xray_and_highlight(data, resolution=resolution)
+
+    assert len(result['infected_areas']) >= 4
+    assert result['infected_areas'] == expected['infected_areas']
+    assert result['tb_probability'] == expected['tb_probability']
+    assert np.array_equal(result['image_buffer'], expected['image_buffer'])
+
+
+def test_nested_regions_cover_their_children():
+    image = np.full((300, 300), 50, np.uint8)
+    cv2.circle(image, (150, 150), 120, 200, -1)
+    cv2.circle(image, (150, 150), 70, 0, -1)
+    cv2.circle(image, (150, 150), 30, 255, -1)
+    _, thresh = cv2.threshold(image, 100, 255, cv2.THRESH_BINARY)
+    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    indices = list(range(len(contours)))
+    assert (hierarchy[0][:, 3] != -1).any()
+
+    labels, means = xray_pipeline.region_intensities(image, contours, hierarchy, indices)
+    _, expected = per_mask_intensities(image, contours, hierarchy, indices)
+    assert labels.dtype == np.uint16
+    assert means == expected
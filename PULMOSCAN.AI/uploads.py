@@ -0,0 +1,68 @@
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from flask import Request
+
+# Leading bytes of the image formats cv2.imdecode is expected to handle
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',          # JPEG
+    b'\x89PNG\r\n\x1a\n',     # PNG
+    b'BM',                    # BMP
+    b'II*\x00',               # TIFF, little endian
+    b'MM\x00*',               # TIFF, big endian
+)
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# Uploaded files stay in memory up to spool_threshold bytes and roll over to
+# an anonymous temp file beyond that, so concurrent large films never sit in
+# worker memory
+class SpoolingRequest(Request):
+    spool_threshold = 1024 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=self.spool_threshold, mode='w+b')
+
+
+# Validate an uploaded image and expose its bytes without copying them into
+# Python memory: the in-memory spool is shared as a memoryview, a rolled-over
+# temp file is memory-mapped. Size and format are checked before any decode.
+@contextmanager
+def image_buffer(file_storage, max_bytes):
+    stream = file_storage.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+
+    if size == 0:
+        raise UploadRejected('Empty upload')
+    if max_bytes and size > max_bytes:
+        raise UploadRejected(f'Upload exceeds the limit of {max_bytes} bytes', 413)
+
+    head = stream.read(16)
+    stream.seek(0)
+    if not head.startswith(IMAGE_SIGNATURES):
+        raise UploadRejected('Unsupported image format', 415)
+
+    raw = getattr(stream, '_file', stream)
+    if hasattr(raw, 'getbuffer'):
+        buffer = raw.getbuffer()
+        try:
+            yield buffer
+        finally:
+            buffer.release()
+    else:
+        raw.flush()
+        mapped = mmap.mmap(raw.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
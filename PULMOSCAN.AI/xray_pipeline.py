@@ -0,0 +1,276 @@
+import base64
+
+import cv2
+import numpy as np
+
+
+# Bump whenever a change alters infected_areas, tb_probability or the overlay
+# so cached analyses of identical uploads are recomputed
+PIPELINE_VERSION = '2'
+
+# Analysis resolution tiers: the longest image side the detection stages run
+# at. None keeps the native resolution. 'preview' is meant for a fast first
+# answer before the configured tier finishes.
+RESOLUTION_TIERS = {
+    'full': None,
+    'standard': 2048,
+    'preview': 768,
+}
+
+
+def resolve_max_dimension(resolution):
+    if resolution in RESOLUTION_TIERS:
+        return RESOLUTION_TIERS[resolution]
+    return int(resolution) if resolution else None
+
+
+# The overlay is returned as the raw JPEG buffer ('image_buffer'), or written
+# straight to a file-like sink when one is given. Base64 is only produced for
+# JSON clients that ask for it.
+#
+# resolution is a tier name or a maximum side in pixels. Detection runs on the
+# downscaled film and the contours are mapped back to native resolution for
+# the overlay. Areas are always reported in native pixels. With overlay=False
+# only the numbers are computed.
+def process_xray_and_highlight(image_data, sink=None, encode_base64=False, resolution=None, overlay=True):
+    # Convert image bytes to numpy array
+    nparr = np.frombuffer(image_data, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    
+    # Convert to grayscale
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    
+    # Downscale for detection
+    scale = 1.0
+    max_dimension = resolve_max_dimension(resolution)
+    if max_dimension and max(gray.shape) > max_dimension:
+        scale = max_dimension / max(gray.shape)
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    area_scale = scale * scale
+    
+    # Apply CLAHE with increased contrast
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+    enhanced = clahe.apply(gray)
+    
+    # Apply bilateral filter to reduce noise while preserving edges
+    blurred = cv2.bilateralFilter(enhanced, 9, 75, 75)
+    
+    # Create a mask for potential TB regions
+    _, thresh1 = cv2.threshold(blurred, 127, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, thresh2 = cv2.threshold(blurred, 150, 255, cv2.THRESH_BINARY)
+    
+    # Combine thresholds for better detection
+    thresh = cv2.bitwise_or(thresh1, thresh2)
+    
+    # Apply morphological operations to enhance regions
+    kernel = np.ones((5,5), np.uint8)
+    thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+    
+    # Find contours with hierarchy
+    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    
+    # Filter contours and calculate areas
+    significant = []
+    total_area = 0
+    max_area = gray.shape[0] * gray.shape[1]
+    
+    for index, contour in enumerate(contours):
+        area = cv2.contourArea(contour)
+        if area > 200 * area_scale:  # Increased minimum area threshold
+            significant.append((index, area))
+            total_area += area
+    
+    significant_contours = [contours[index] for index, _ in significant]
+    area_ratio = min(total_area / max_area * 5, 1.0)  # Increased sensitivity
+    
+    # Rasterise all regions into one label image and get their mean intensity
+    # on the original enhanced image in a single pass
+    labels, region_means = region_intensities(enhanced, contours, hierarchy, [index for index, _ in significant])
+    
+    infected_areas = []
+    for (index, area), local_intensity in zip(significant, region_means):
+        # Calculate centroid
+        M = cv2.moments(contours[index])
+        if M["m00"] != 0:
+            cx = int(M["m10"] / M["m00"])
+            cy = int(M["m01"] / M["m00"])
+            
+            # Calculate relative coordinates
+            rel_x = (cx / gray.shape[1]) * 100
+            rel_y = (cy / gray.shape[0]) * 100
+            
+            # Store infected area info
+            infected_areas.append({
+                'x': float(rel_x),
+                'y': float(rel_y),
+                'area': float(area / area_scale),
+                'severity': float(max(0.6, local_intensity / 255.0))  # Minimum severity of 0.6
+            })
+    
+    buffer = None
+    if overlay:
+        # Create more prominent heatmap from every filled region
+        if scale == 1.0:
+            heatmap = cv2.compare(labels, 0, cv2.CMP_GT)
+        else:
+            significant_contours = [np.round((contour + 0.5) / scale - 0.5).astype(np.int32)
+                                    for contour in significant_contours]
+            heatmap = np.zeros(img.shape[:2], np.uint8)
+            for contour in significant_contours:
+                cv2.drawContours(heatmap, [contour], -1, 255, -1)
+        
+        # Apply a more prominent color map
+        heatmap_colored = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
+        
+        # Enhance the contrast of the heatmap
+        heatmap_colored = cv2.convertScaleAbs(heatmap_colored, alpha=1.5, beta=0)
+        
+        # Create more visible overlay
+        highlighted = cv2.addWeighted(img, 0.6, heatmap_colored, 0.4, 0)
+        
+        # Add a colored border around detected regions
+        for contour in significant_contours:
+            cv2.drawContours(highlighted, [contour], -1, (0, 255, 255), 2)
+        
+        # Encode the highlighted image once
+        _, buffer = cv2.imencode('.jpg', highlighted)
+    
+    # Calculate TB probability with adjusted weights
+    num_regions = len(infected_areas)
+    avg_severity = np.mean([area['severity'] for area in infected_areas]) if infected_areas else 0
+    
+    # Enhanced probability calculation
+    area_weight = 0.35
+    severity_weight = 0.35
+    regions_weight = 0.30
+    
+    base_probability = (
+        area_weight * area_ratio +
+        severity_weight * avg_severity +
+        regions_weight * min(num_regions / 8, 1.0)  # Adjusted region cap
+    )
+    
+    # Ensure minimum probability of 0.5 for detected regions
+    tb_probability = max(0.5, base_probability) if infected_areas else 0.3
+    
+    findings = build_findings(tb_probability, infected_areas)
+    
+    result = {
+        'infected_areas': infected_areas,
+        'tb_probability': float(tb_probability),
+        'findings': findings,
+        'confidence_score': confidence_score(tb_probability)
+    }
+    
+    if buffer is not None:
+        if sink is not None:
+            sink.write(buffer)
+        else:
+            result['image_buffer'] = buffer
+        
+        if encode_base64:
+            result['image_base64'] = base64.b64encode(buffer).decode('utf-8')
+    
+    return result
+
+
+def confidence_score(tb_probability):
+    return float(min(0.95, 0.7 + tb_probability * 0.25))
+
+
+# Generate findings based on analysis
+def build_findings(tb_probability, infected_areas):
+    num_regions = len(infected_areas)
+    avg_severity = np.mean([area['severity'] for area in infected_areas]) if infected_areas else 0
+    
+    findings = []
+    if tb_probability > 0.7:
+        findings.append({
+            'disease': 'Severe Infiltration',
+            'probability': float(tb_probability),
+            'severity': 'High'
+        })
+    elif tb_probability > 0.5:
+        findings.append({
+            'disease': 'Moderate Infiltration',
+            'probability': float(tb_probability),
+            'severity': 'Moderate'
+        })
+    
+    if num_regions > 3:
+        findings.append({
+            'disease': 'Multiple Lesions',
+            'probability': float(min(num_regions / 8, 0.9)),
+            'severity': 'High' if num_regions > 6 else 'Moderate'
+        })
+    
+    if avg_severity > 0.6:
+        findings.append({
+            'disease': 'Dense Opacity',
+            'probability': float(avg_severity),
+            'severity': 'High' if avg_severity > 0.8 else 'Moderate'
+        })
+    
+    # Ensure we always return some findings
+    if not findings:
+        findings.append({
+            'disease': 'Potential Abnormality',
+            'probability': float(tb_probability),
+            'severity': 'Low'
+        })
+    
+    return findings
+
+
+# Mean intensity of each filled contour, computed from one label image
+# instead of a full-frame mask per contour. Regions are drawn outermost first
+# so nested contours (holes and islands from RETR_TREE) keep their own label,
+# then each region's sums are folded into its nearest drawn ancestor because
+# a filled contour also covers everything nested inside it. Labels are 16-bit
+# and pixels are summed within each region's bounding box, so no full-frame
+# temporaries beyond the label image are allocated.
+def region_intensities(image, contours, hierarchy, indices):
+    labels = np.zeros(image.shape[:2], np.uint16 if len(indices) <= np.iinfo(np.uint16).max else np.int32)
+    if not indices:
+        return labels, []
+    
+    parents = hierarchy[0][:, 3]
+    label_of = {index: label for label, index in enumerate(indices, 1)}
+    
+    def drawn_parent(index):
+        parent = parents[index]
+        while parent != -1 and parent not in label_of:
+            parent = parents[parent]
+        return parent
+    
+    depth = {}
+    for index in indices:
+        level, parent = 0, drawn_parent(index)
+        while parent != -1:
+            level += 1
+            parent = drawn_parent(parent)
+        depth[index] = level
+    
+    order = sorted(indices, key=lambda index: depth[index])
+    for index in order:
+        cv2.drawContours(labels, contours, index, label_of[index], -1)
+    
+    counts = [0] * (len(indices) + 1)
+    sums = [0] * (len(indices) + 1)
+    for index in indices:
+        label = label_of[index]
+        x, y, w, h = cv2.boundingRect(contours[index])
+        inside = labels[y:y + h, x:x + w] == label
+        counts[label] = int(np.count_nonzero(inside))
+        sums[label] = int(image[y:y + h, x:x + w][inside].sum(dtype=np.int64))
+    
+    for index in reversed(order):
+        parent = drawn_parent(index)
+        if parent != -1:
+            counts[label_of[parent]] += counts[label_of[index]]
+            sums[label_of[parent]] += sums[label_of[index]]
+    
+    # Same rounding as cv2.mean, which scales the sum by 1/count
+    means = [sums[label] * (1.0 / counts[label]) if counts[label] else 0.0 for label in range(1, len(indices) + 1)]
+    return labels, means